@@ -1,15 +1,38 @@
-from crewai import Agent, LLM
-import os
+from crewai import Agent
+from llm_provider import build_llm
+from progress import CREW_VERBOSE
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
 
+_llm = None
+_llm_lock = threading.Lock()
+_local = threading.local()
+
 def get_llm():
-    return LLM(
-        model="gemini/gemini-3-flash-preview",
-        api_key=os.getenv("GEMINI_API_KEY"),
-        temperature=0.7
-    )
+    """
+    Returns the process-wide LLM so every agent reuses one provider HTTP client.
+    It is wrapped with response caching, rate limiting and retries (see llm_provider.py).
+    """
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                _llm = build_llm()
+    return _llm
+
+def get_agents():
+    """
+    Returns this thread's agent roster, building it on first use.
+    Each worker thread keeps its own Agents since they hold per-run executor state;
+    only the per-ticket Tasks need to be created for every ticket.
+    """
+    agents = getattr(_local, "agents", None)
+    if agents is None:
+        agents = create_agents()
+        _local.agents = agents
+    return agents
 
 def create_agents():
     llm = get_llm()
@@ -22,7 +45,7 @@ def create_agents():
         detecting the tone and urgency.""",
         allow_delegation=False,
         llm=llm,
-        verbose=True
+        verbose=CREW_VERBOSE
     )
     
     support_analyst = Agent(
@@ -32,7 +55,7 @@ def create_agents():
         You can quickly identify if a ticket is about a payment failure, password reset, or a general query.""",
         allow_delegation=False,
         llm=llm,
-        verbose=True
+        verbose=CREW_VERBOSE
     )
     
     sre_analyst = Agent(
@@ -42,7 +65,7 @@ def create_agents():
         "slow loading", or "video buffering" to determine if the platform's reliability is affected.""",
         allow_delegation=False,
         llm=llm,
-        verbose=True
+        verbose=CREW_VERBOSE
     )
     
     backend_analyst = Agent(
@@ -52,7 +75,7 @@ def create_agents():
         incorrect calculations, or API errors that aren't platform-wide infrastructure issues.""",
         allow_delegation=False,
         llm=llm,
-        verbose=True
+        verbose=CREW_VERBOSE
     )
     
     tech_lead = Agent(
@@ -63,17 +86,11 @@ def create_agents():
         1. The Category of the ticket.
         2. The Severity (P0, P1, P2) and Priority (High, Medium, Low).
         3. Which Manager to assign the ticket to based on their expertise.
-        
-        Available Managers:
-        1. Amit Patel (Support Lead) - General queries, billing.
-        2. Anjali Singh (QA Lead) - Bugs, UI issues.
-        3. Priya Sharma (Backend Lead) - Server logic, DB issues.
-        4. Rajesh Kumar (SRE Lead) - Infrastructure, performance, video playback.
-        5. Vikram Reddy (Security Lead) - Access, data privacy.
+        The current roster of available managers is listed in each assignment task.
         """,
         allow_delegation=True,
         llm=llm,
-        verbose=True
+        verbose=CREW_VERBOSE
     )
     
     return [triage_lead, support_analyst, sre_analyst, backend_analyst, tech_lead]
@@ -0,0 +1,280 @@
+import os
+import time
+import threading
+import duckdb
+import pandas as pd
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from database import get_supabase_client
+
+load_dotenv()
+
+ANALYTICS_DB_PATH = os.getenv("ANALYTICS_DB_PATH", "analytics.duckdb")
+ANALYTICS_SYNC_INTERVAL = int(os.getenv("ANALYTICS_SYNC_INTERVAL", "300"))
+# Log ids and NOW() are taken when a transaction starts, not when it commits, so a row can
+# appear behind a watermark that has already moved past it. Each sync re-reads this much
+# behind every watermark, and a periodic full pass catches anything slower than that.
+ANALYTICS_SYNC_OVERLAP_IDS = int(os.getenv("ANALYTICS_SYNC_OVERLAP_IDS", "1000"))
+ANALYTICS_SYNC_OVERLAP_SECONDS = float(os.getenv("ANALYTICS_SYNC_OVERLAP_SECONDS", "600"))
+ANALYTICS_FULL_SYNC_HOURS = float(os.getenv("ANALYTICS_FULL_SYNC_HOURS", "24"))
+SYNC_PAGE_SIZE = 1000
+
+TICKET_COLUMNS = ["ticket_id", "user_id", "title", "category", "severity", "priority",
+                  "status", "assigned_to", "created_at", "resolved_at"]
+LOG_COLUMNS = ["id", "ticket_id", "action", "timestamp"]
+MANAGER_COLUMNS = ["id", "name", "role", "department", "is_active"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tickets (
+    ticket_id VARCHAR PRIMARY KEY,
+    user_id VARCHAR,
+    title VARCHAR,
+    category VARCHAR,
+    severity VARCHAR,
+    priority VARCHAR,
+    status VARCHAR,
+    assigned_to INTEGER,
+    created_at TIMESTAMPTZ,
+    resolved_at TIMESTAMPTZ
+);
+CREATE TABLE IF NOT EXISTS ticket_logs (
+    id BIGINT PRIMARY KEY,
+    ticket_id VARCHAR,
+    action VARCHAR,
+    "timestamp" TIMESTAMPTZ
+);
+CREATE TABLE IF NOT EXISTS managers (
+    id INTEGER PRIMARY KEY,
+    name VARCHAR,
+    role VARCHAR,
+    department VARCHAR,
+    is_active BOOLEAN
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    name VARCHAR PRIMARY KEY,
+    value VARCHAR
+);
+"""
+
+_conn = None
+_conn_lock = threading.Lock()
+_sync_lock = threading.Lock()
+
+
+def get_connection():
+    """
+    Returns a cursor on the shared DuckDB replica (one cursor per caller/thread).
+    """
+    global _conn
+    with _conn_lock:
+        if _conn is None:
+            _conn = duckdb.connect(ANALYTICS_DB_PATH)
+            _conn.execute(_SCHEMA)
+        return _conn.cursor()
+
+
+def _get_state(con, name, default=None):
+    row = con.execute("SELECT value FROM sync_state WHERE name = ?", [name]).fetchone()
+    return row[0] if row else default
+
+
+def _set_state(con, name, value):
+    con.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?)", [name, str(value)])
+
+
+def _id_overlap(watermark):
+    return None if watermark is None else int(watermark) - ANALYTICS_SYNC_OVERLAP_IDS
+
+
+def _time_overlap(watermark):
+    if watermark is None:
+        return None
+    return (datetime.fromisoformat(watermark) - timedelta(seconds=ANALYTICS_SYNC_OVERLAP_SECONDS)).isoformat()
+
+
+def _fetch_after(table, columns, key, watermark, extra=None):
+    """
+    Pages through rows with key > watermark in key order.
+    """
+    client = get_supabase_client()
+    rows = []
+    while True:
+        query = client.table(table).select(", ".join(columns))
+        if extra is not None:
+            query = extra(query)
+        if watermark is not None:
+            query = query.gt(key, watermark)
+        page = query.order(key).limit(SYNC_PAGE_SIZE).execute().data
+        rows.extend(page)
+        if len(page) < SYNC_PAGE_SIZE:
+            return rows
+        watermark = page[-1][key]
+
+
+def _fetch_tickets_by_id(ticket_ids):
+    client = get_supabase_client()
+    rows = []
+    ticket_ids = list(ticket_ids)
+    for i in range(0, len(ticket_ids), 200):
+        chunk = ticket_ids[i:i + 200]
+        rows.extend(client.table("tickets").select(", ".join(TICKET_COLUMNS)).in_("ticket_id", chunk).execute().data)
+    return rows
+
+
+def _upsert(con, table, columns, rows):
+    if not rows:
+        return 0
+    df = pd.DataFrame(rows, columns=columns)
+    for col in ("created_at", "resolved_at", "timestamp"):
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], utc=True, format="ISO8601")
+    con.register("sync_batch", df)
+    quoted = ", ".join(f'"{c}"' for c in columns)
+    con.execute(f"INSERT OR REPLACE INTO {table} ({quoted}) SELECT {quoted} FROM sync_batch")
+    con.unregister("sync_batch")
+    return len(df)
+
+
+def sync_replica():
+    """
+    Incrementally mirrors Supabase into the local DuckDB replica. Rows are
+    upserted by primary key, so re-reading the overlap behind each watermark
+    only refreshes rows already held.
+
+    - ticket_logs: rows with id above the stored watermark, less ANALYTICS_SYNC_OVERLAP_IDS
+    - tickets: rows created or resolved after the stored watermarks, less
+      ANALYTICS_SYNC_OVERLAP_SECONDS, plus any ticket that received a new log
+      entry (every state change is logged, so this also picks up assignments and re-opens)
+    - managers: small, refreshed in full
+
+    Every ANALYTICS_FULL_SYNC_HOURS the watermarks are ignored and everything is re-read.
+    """
+    with _sync_lock:
+        con = get_connection()
+        full = time.time() - float(_get_state(con, "last_full_sync", 0)) >= ANALYTICS_FULL_SYNC_HOURS * 3600
+        state = (lambda name: None) if full else (lambda name: _get_state(con, name))
+        logs = _fetch_after("ticket_logs", LOG_COLUMNS, "id", _id_overlap(state("ticket_logs.id")))
+        created = _fetch_after("tickets", TICKET_COLUMNS, "created_at", _time_overlap(state("tickets.created_at")))
+        resolved = _fetch_after("tickets", TICKET_COLUMNS, "resolved_at", _time_overlap(state("tickets.resolved_at")),
+                                extra=lambda q: q.not_.is_("resolved_at", "null"))
+
+        fetched = {t['ticket_id']: t for t in created + resolved}
+        touched = {log['ticket_id'] for log in logs} - fetched.keys()
+        for t in _fetch_tickets_by_id(touched):
+            fetched[t['ticket_id']] = t
+
+        managers = get_supabase_client().table("managers").select(", ".join(MANAGER_COLUMNS)).execute().data
+
+        con.execute("BEGIN TRANSACTION")
+        try:
+            synced = {
+                "tickets": _upsert(con, "tickets", TICKET_COLUMNS, list(fetched.values())),
+                "ticket_logs": _upsert(con, "ticket_logs", LOG_COLUMNS, logs),
+                "managers": _upsert(con, "managers", MANAGER_COLUMNS, managers),
+            }
+            if logs:
+                _set_state(con, "ticket_logs.id", logs[-1]['id'])
+            if created:
+                _set_state(con, "tickets.created_at", created[-1]['created_at'])
+            if resolved:
+                _set_state(con, "tickets.resolved_at", resolved[-1]['resolved_at'])
+            _set_state(con, "last_sync", time.time())
+            if full:
+                _set_state(con, "last_full_sync", time.time())
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        return synced
+
+
+def sync_if_stale(max_age=ANALYTICS_SYNC_INTERVAL):
+    con = get_connection()
+    last_sync = float(_get_state(con, "last_sync", 0))
+    if time.time() - last_sync >= max_age:
+        return sync_replica()
+    return None
+
+
+def export_parquet(directory):
+    """
+    Writes the replica tables to Parquet files for offline analysis.
+    """
+    os.makedirs(directory, exist_ok=True)
+    con = get_connection()
+    for table in ("tickets", "ticket_logs", "managers"):
+        con.execute(f"COPY {table} TO '{os.path.join(directory, table)}.parquet' (FORMAT PARQUET)")
+
+
+# --- Heavy aggregations served from the replica ---
+
+def mttr_by_manager():
+    return get_connection().execute("""
+        SELECT m.name AS manager,
+               COUNT(*) AS resolved_tickets,
+               ROUND(AVG(EPOCH(t.resolved_at - t.created_at)) / 3600, 2) AS mttr_hours
+        FROM tickets t
+        JOIN managers m ON m.id = t.assigned_to
+        WHERE t.resolved_at IS NOT NULL
+        GROUP BY m.name
+        ORDER BY mttr_hours
+    """).df()
+
+
+def backlog_aging():
+    return get_connection().execute("""
+        SELECT CASE
+                   WHEN age < INTERVAL 1 DAY THEN '< 1 day'
+                   WHEN age < INTERVAL 3 DAY THEN '1-3 days'
+                   WHEN age < INTERVAL 7 DAY THEN '3-7 days'
+                   ELSE '> 7 days'
+               END AS age_bucket,
+               COALESCE(severity, 'Unrated') AS severity,
+               COUNT(*) AS tickets
+        FROM (SELECT severity, now() - created_at AS age FROM tickets WHERE status <> 'Resolved')
+        GROUP BY ALL
+        ORDER BY MIN(age)
+    """).df()
+
+
+def severity_trend(months=12):
+    return get_connection().execute("""
+        SELECT DATE_TRUNC('month', created_at) AS month,
+               COALESCE(severity, 'Unrated') AS severity,
+               COUNT(*) AS tickets
+        FROM tickets
+        WHERE created_at >= now() - to_months(?)
+        GROUP BY ALL
+        ORDER BY month
+    """, [months]).df()
+
+
+def lifecycle_percentiles(days=30):
+    """
+    p50/p95 time to first assignment and to resolution (hours) for tickets created in the last `days` days.
+    """
+    return get_connection().execute("""
+        WITH recent AS (
+            SELECT ticket_id, created_at, resolved_at FROM tickets WHERE created_at >= now() - to_days(?)
+        ),
+        assigned AS (
+            SELECT ticket_id, MIN("timestamp") AS assigned_at
+            FROM ticket_logs
+            WHERE action = 'Ticket Assigned'
+            GROUP BY ticket_id
+        ),
+        durations AS (
+            SELECT 'Time to Assignment' AS stage, EPOCH(a.assigned_at - r.created_at) / 3600 AS hours
+            FROM recent r JOIN assigned a USING (ticket_id)
+            UNION ALL
+            SELECT 'Time to Resolution' AS stage, EPOCH(r.resolved_at - r.created_at) / 3600 AS hours
+            FROM recent r WHERE r.resolved_at IS NOT NULL
+        )
+        SELECT stage,
+               COUNT(*) AS tickets,
+               ROUND(quantile_cont(hours, 0.5), 2) AS p50_hours,
+               ROUND(quantile_cont(hours, 0.95), 2) AS p95_hours
+        FROM durations
+        GROUP BY stage
+        ORDER BY stage
+    """, [days]).df()
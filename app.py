@@ -5,12 +5,22 @@ os.environ["CREWAI_TELEMETRY_OPTOUT"] = "true"
 import streamlit as st
 from dotenv import load_dotenv
 from database import init_db
+from job_queue import start_workers
+from ticket_events import start_listener
+from email_service import start_email_sender
+from metrics import start_metrics_server
 
 load_dotenv()
 
 # Initialize Database at the very beginning
 init_db()
 
+# Start the background AI worker pool, ticket change listener, email sender and metrics endpoint (once per process)
+start_workers()
+start_listener()
+start_email_sender()
+start_metrics_server()
+
 # Page configuration
 st.set_page_config(
     page_title="Trugen AI Support",
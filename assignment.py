@@ -0,0 +1,196 @@
+import os
+import re
+import json
+from typing import Literal
+from pydantic import BaseModel, Field, ValidationError, ValidationInfo, field_validator
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# How many times the Tech Lead is re-asked (with the validation error) before the run fails
+ASSIGNMENT_REPAIR_ATTEMPTS = int(os.getenv("ASSIGNMENT_REPAIR_ATTEMPTS", "2"))
+
+CATEGORIES = ("Payments", "Technical", "Access", "Infrastructure", "General")
+
+
+class TicketAssignment(BaseModel):
+    """
+    The Tech Lead's decision. Case slips ("p1", "high") are normalized; when
+    validated with context={"manager_ids": {...}} the manager must be active.
+    """
+
+    category: Literal["Payments", "Technical", "Access", "Infrastructure", "General"]
+    severity: Literal["P0", "P1", "P2"]
+    priority: Literal["High", "Medium", "Low"]
+    manager_id: int
+    reason: str = Field(min_length=1)
+
+    @field_validator("category", "priority", mode="before")
+    @classmethod
+    def _title_case(cls, value):
+        return value.strip().title() if isinstance(value, str) else value
+
+    @field_validator("severity", mode="before")
+    @classmethod
+    def _upper_case(cls, value):
+        return value.strip().upper() if isinstance(value, str) else value
+
+    @field_validator("manager_id")
+    @classmethod
+    def _active_manager(cls, value, info: ValidationInfo):
+        manager_ids = (info.context or {}).get("manager_ids")
+        if manager_ids and value not in manager_ids:
+            raise ValueError(f"{value} is not an active manager; choose one of {sorted(manager_ids)}")
+        return value
+
+
+class JsonObjectScanner:
+    """
+    Incremental extractor for top-level JSON objects embedded in LLM text
+    (prose, markdown fences, streamed chunks). Braces inside strings are
+    ignored and balanced spans that are not valid JSON are skipped. Nested
+    spans are remembered so finish() can recover objects that a stray,
+    never-closed "{" swallowed, in the same single pass.
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._open = []
+        self._closed = []
+
+    def feed(self, chunk):
+        """
+        Consumes more text and returns the objects completed by it.
+        """
+        objects = []
+        for char in chunk:
+            if self._depth == 0:
+                if char == "{":
+                    self._buffer = [char]
+                    self._depth = 1
+                    self._open = [0]
+                    self._closed = []
+                continue
+
+            self._buffer.append(char)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+                self._open.append(len(self._buffer) - 1)
+            elif char == "}":
+                self._depth -= 1
+                start = self._open.pop()
+                if self._depth:
+                    # (start, end, enclosing brace) for finish()
+                    self._closed.append((start, len(self._buffer), self._open[-1]))
+                else:
+                    parsed = _loads_lenient("".join(self._buffer))
+                    if isinstance(parsed, dict):
+                        objects.append(parsed)
+                    self._buffer = []
+        return objects
+
+    def finish(self):
+        """
+        Ends the input. If an object is still open, returns the complete objects
+        directly inside its never-closed braces, as if scanning resumed after them.
+        """
+        if self._depth == 0:
+            return []
+        text = "".join(self._buffer)
+        unclosed = set(self._open)
+        objects = []
+        for start, end, parent in self._closed:
+            if parent in unclosed:
+                parsed = _loads_lenient(text[start:end])
+                if isinstance(parsed, dict):
+                    objects.append(parsed)
+        self._buffer, self._depth, self._in_string, self._escaped = [], 0, False, False
+        return objects
+
+
+def _loads_lenient(candidate):
+    for text in (candidate, re.sub(r",\s*([}\]])", r"\1", candidate)):
+        try:
+            return json.loads(text, strict=False)
+        except ValueError:
+            continue
+    return None
+
+
+def extract_json_objects(text):
+    """
+    Returns every JSON object found in the text, in order of appearance.
+    """
+    scanner = JsonObjectScanner()
+    # A stray unbalanced "{" in prose swallows the rest; finish() recovers what it hid
+    return scanner.feed(text) + scanner.finish()
+
+
+def parse_assignment(text, manager_ids=None):
+    """
+    Returns the last object in the text that validates as a TicketAssignment.
+    Raises ValueError describing why nothing matched.
+    """
+    objects = extract_json_objects(text)
+    if not objects:
+        raise ValueError("No JSON object found in the response.")
+
+    error = None
+    for candidate in reversed(objects):
+        try:
+            return TicketAssignment.model_validate(candidate, context={"manager_ids": manager_ids})
+        except ValidationError as e:
+            error = error or e
+    raise ValueError(_describe(error))
+
+
+def validate_assignment(data, manager_ids=None):
+    """
+    Validates an assignment that did not come from the Tech Lead (a reused or
+    fast-path decision) against the same rules. Raises ValueError.
+    """
+    try:
+        return TicketAssignment.model_validate(data, context={"manager_ids": manager_ids})
+    except ValidationError as e:
+        raise ValueError(_describe(e))
+
+
+def _describe(error):
+    return "; ".join(f"{'.'.join(str(p) for p in e['loc']) or 'object'}: {e['msg']}" for e in error.errors())
+
+
+def active_manager_ids():
+    from database import get_managers
+
+    try:
+        managers = get_managers()
+        return set(int(m) for m in managers["id"]) if not managers.empty else None
+    except Exception as e:
+        print(f"⚠️ Could not load active managers, skipping manager validation: {e}")
+        return None
+
+
+def validate_assignment_output(output):
+    """
+    CrewAI guardrail for the assignment task. On failure CrewAI re-runs only
+    this task, giving the agent the error so it can repair its answer.
+    """
+    try:
+        assignment = parse_assignment(output.raw, active_manager_ids())
+    except ValueError as e:
+        return False, f"Return the assignment as one JSON object in the requested format. Problem: {e}"
+    output.pydantic = assignment
+    output.raw = assignment.model_dump_json()
+    return True, output
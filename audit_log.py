@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import queue
+import atexit
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+try:
+    import fcntl
+except ImportError:  # Windows: the spool is only guarded within this process
+    fcntl = None
+
+load_dotenv()
+
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "50"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0"))
+AUDIT_SPOOL_PATH = os.getenv("AUDIT_SPOOL_PATH", "audit_spool.jsonl")
+# Entries the database refused outright (e.g. a deleted ticket_id); kept for inspection, never retried
+AUDIT_DEAD_LETTER_PATH = os.getenv("AUDIT_DEAD_LETTER_PATH", "audit_rejected.jsonl")
+
+# Client errors that are not about the rows themselves, so the batch is spooled and retried
+_RETRYABLE_STATUSES = (401, 403, 408, 429)
+
+
+def is_rejection(error):
+    """
+    True when the database refused the rows themselves (a 4xx such as a foreign
+    key violation or a NUL byte in details), so retrying them cannot succeed.
+    Connection errors and 5xx responses are not rejections.
+    """
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return 400 <= status < 500 and status not in _RETRYABLE_STATUSES
+    code = str(getattr(error, "code", None) or "")
+    # PostgREST passes the Postgres SQLSTATE through: 22 data exceptions, 23 constraint
+    # violations, 42 unknown columns; PGRST1xx/2xx are malformed requests
+    return code[:2] in ("22", "23", "42") or code.startswith(("PGRST1", "PGRST2"))
+
+
+class AuditWriter:
+    """
+    Buffers ticket_logs rows and writes them in bulk from a single background
+    thread. A single FIFO writer keeps per-ticket ordering, and each entry is
+    timestamped when it is queued rather than when it is flushed.
+
+    If the database cannot be reached the unwritten entries are kept in a local spool
+    file, which is replayed (in order, before any newer entries) on the next flush.
+    The spool is locked while it is read and rewritten, so processes sharing it do
+    not lose or duplicate entries. Rows the database rejects are isolated by
+    splitting the batch and moved to a dead-letter file, so one bad row cannot
+    hold back the rest.
+    """
+
+    def __init__(self, insert_rows, on_flush=None, batch_size=AUDIT_BATCH_SIZE,
+                 flush_interval=AUDIT_FLUSH_INTERVAL, spool_path=AUDIT_SPOOL_PATH,
+                 dead_letter_path=AUDIT_DEAD_LETTER_PATH):
+        self.insert_rows = insert_rows
+        self.on_flush = on_flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_path = spool_path
+        self.dead_letter_path = dead_letter_path
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._closed = threading.Event()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.close)
+
+    def write(self, ticket_id, action, details):
+        entry = {
+            "ticket_id": ticket_id,
+            "action": action,
+            "details": details,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        }
+        if self._closed.is_set():
+            # Late writes after shutdown go straight through
+            self._flush_batch([entry])
+            return
+        self._ensure_started()
+        self._queue.put(entry)
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                item = False
+            if isinstance(item, dict):
+                batch.append(item)
+            if item is None or isinstance(item, threading.Event) \
+                    or len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                if batch:
+                    self._flush_batch(batch)
+                    batch = []
+                deadline = time.monotonic() + self.flush_interval
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is None:
+                return
+
+    def _read_spool(self):
+        if not os.path.exists(self.spool_path):
+            return []
+        with open(self.spool_path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _write_spool(self, entries):
+        with open(self.spool_path, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+
+    def _dead_letter(self, rejected):
+        with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            for entry, error in rejected:
+                f.write(json.dumps(dict(entry, error=str(error))) + "\n")
+
+    @contextmanager
+    def _spool_lock(self):
+        with self._flush_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.spool_path + ".lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _insert(self, rows, written, rejected):
+        """
+        Inserts rows in order, appending them to `written` or, with the error, to
+        `rejected`. A rejected batch is split in half until the bad rows are found.
+        Raises on connection errors and 5xx responses.
+        """
+        try:
+            self.insert_rows(rows)
+            written.extend(rows)
+        except Exception as e:
+            if not is_rejection(e):
+                raise
+            if len(rows) == 1:
+                rejected.append((rows[0], e))
+                return
+            middle = len(rows) // 2
+            self._insert(rows[:middle], written, rejected)
+            self._insert(rows[middle:], written, rejected)
+
+    def _flush_batch(self, batch):
+        with self._spool_lock():
+            spooled = self._read_spool()
+            pending = spooled + batch
+            written, rejected = [], []
+            try:
+                for i in range(0, len(pending), self.batch_size):
+                    self._insert(pending[i:i + self.batch_size], written, rejected)
+            except Exception as e:
+                print(f"⚠️ Audit log insert failed, spooling {len(pending) - len(written) - len(rejected)} entries: {e}")
+            if rejected:
+                print(f"❌ Database rejected {len(rejected)} audit entries, moved to {self.dead_letter_path}: {rejected[0][1]}")
+                self._dead_letter(rejected)
+            # Rows are handled in order, so everything after the first unhandled one is still pending
+            remaining = pending[len(written) + len(rejected):]
+            if remaining:
+                self._write_spool(remaining)
+            elif spooled:
+                os.remove(self.spool_path)
+            if written and self.on_flush:
+                self.on_flush(written)
+
+    def flush(self, timeout=10):
+        """
+        Blocks until everything queued so far has been written (or spooled).
+        """
+        if self._thread is None or self._closed.is_set():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self, timeout=10):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
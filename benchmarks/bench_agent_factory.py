@@ -0,0 +1,56 @@
+"""
+Per-ticket setup overhead of rebuilding the agent roster (create_agents)
+versus reusing the cached per-thread roster (get_agents). No LLM calls are
+made; only object construction and crew assembly are timed.
+
+    uv run python benchmarks/bench_agent_factory.py --tickets 50
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GEMINI_API_KEY", "bench-key")
+os.environ.setdefault("CREWAI_TELEMETRY_OPTOUT", "true")
+
+import agents
+from ticket_processor import build_crew
+
+
+def _measure(get_roster, tickets, mode):
+    samples = []
+    for i in range(tickets):
+        start = time.perf_counter()
+        roster = get_roster()
+        build_crew(roster, f"Video won't play #{i}", "Buffering forever on every title.", mode=mode)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickets", type=int, default=50)
+    parser.add_argument("--mode", default="parallel")
+    args = parser.parse_args()
+
+    # Warm up imports and the cached roster
+    _measure(agents.get_agents, 2, args.mode)
+
+    def rebuild():
+        # Original behaviour: fresh LLM client and five fresh Agents per ticket
+        agents._llm = None
+        return agents.create_agents()
+
+    before = _measure(rebuild, args.tickets, args.mode)
+    after = _measure(agents.get_agents, args.tickets, args.mode)
+
+    for label, samples in (("create_agents per ticket", before), ("cached roster", after)):
+        print(f"{label:<26} mean={statistics.mean(samples) * 1000:8.2f}ms  "
+              f"p50={statistics.median(samples) * 1000:8.2f}ms")
+    print(f"overhead saved per ticket: {(statistics.mean(before) - statistics.mean(after)) * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Outbox delivery throughput against a local SMTP stand-in: a fresh SMTP
+connection per message (the old send_resolution_email behaviour) versus the
+background sender reusing one session.
+
+    uv run python benchmarks/bench_email_outbox.py --messages 500 --connect-latency-ms 20
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import aiosmtpd  # noqa: F401
+except ImportError:
+    sys.exit("This benchmark needs aiosmtpd from the dev group: uv sync && uv run python benchmarks/bench_email_outbox.py")
+
+from smtp_stub import start_smtp_stub
+
+
+def _with_connect_latency(sender_cls, delay):
+    """
+    SMTPSender whose connection setup costs extra time, standing in for the
+    TCP + STARTTLS + AUTH round trips of a remote server.
+    """
+    class Sender(sender_cls):
+        def _connect(self):
+            time.sleep(delay)
+            return super()._connect()
+    return Sender
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--connect-latency-ms", type=float, default=20.0,
+                        help="Simulated connect/STARTTLS/login cost per new session")
+    args = parser.parse_args()
+
+    os.environ["EMAIL_OUTBOX_PATH"] = os.path.join(tempfile.mkdtemp(), "outbox.db")
+    import email_service
+
+    controller, handler = start_smtp_stub(args.port)
+    Sender = _with_connect_latency(email_service.SMTPSender, args.connect_latency_ms / 1000)
+    smtp_kwargs = {"host": "127.0.0.1", "port": args.port, "user": "", "password": "", "starttls": False}
+    context = {"ticket_id": "TRU-BENCH", "ticket_title": "Benchmark", "resolution_notes": "Done."}
+    try:
+        # Old behaviour: connect, send, quit for every message
+        start = time.perf_counter()
+        for i in range(args.messages):
+            sender = Sender(**smtp_kwargs)
+            sender.send(email_service.build_message(f"user{i}@example.com", "ticket_resolved", context))
+            sender.close()
+        per_message = time.perf_counter() - start
+
+        # Outbox: queue everything, then drain over one reused session
+        for i in range(args.messages):
+            email_service.queue_email(f"user{i}@example.com", "ticket_resolved", context, ticket_id="TRU-BENCH")
+        sessions_before = handler.sessions
+        outbox_sender = email_service.EmailSender(
+            smtp=Sender(**smtp_kwargs))
+        start = time.perf_counter()
+        while outbox_sender.send_batch():
+            pass
+        pooled = time.perf_counter() - start
+        outbox_sender.smtp.close()
+
+        print(f"messages delivered: {len(handler.messages)}  outbox: {email_service.get_outbox_stats()}")
+        print(f"connection per message: {per_message:.2f}s  ({args.messages / per_message:.0f} msg/s)")
+        print(f"outbox, reused session: {pooled:.2f}s  ({args.messages / pooled:.0f} msg/s, "
+              f"{handler.sessions - sessions_before} SMTP session(s))")
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Per-call latency of a fresh create_client() versus the pooled client in
+database.py, measured against the local PostgREST stand-in.
+
+    uv run python benchmarks/bench_supabase_client.py --calls 500
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from postgrest_stub import start_stub_server
+
+
+def _report(label, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<24} mean={statistics.mean(samples) * 1000:7.3f}ms  "
+          f"p50={statistics.median(samples) * 1000:7.3f}ms  p95={p95 * 1000:7.3f}ms")
+
+
+def _measure(get_client, calls):
+    samples = []
+    for i in range(calls):
+        start = time.perf_counter()
+        get_client().table("ticket_logs").insert(
+            {"ticket_id": "TRU-BENCH", "action": "Benchmark", "details": str(i)}
+        ).execute()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=300)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server()
+    os.environ["SUPABASE_URL"] = base_url
+    os.environ["SUPABASE_KEY"] = "bench-key"
+
+    import database
+    from supabase import create_client
+
+    # Warm up imports and the pool before timing
+    _measure(database.get_supabase_client, 10)
+
+    before = _measure(lambda: create_client(database.SUPABASE_URL, database.SUPABASE_KEY), args.calls)
+    after = _measure(database.get_supabase_client, args.calls)
+
+    _report("create_client per call", before)
+    _report("pooled client", after)
+    print(f"speedup (mean): {statistics.mean(before) / statistics.mean(after):.1f}x")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
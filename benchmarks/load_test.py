@@ -0,0 +1,367 @@
+"""
+End-to-end load test of the ticket pipeline:
+create_ticket_with_new_id -> process_ticket (-> update_ticket_assignment) -> resolve_ticket
+-> resolution email, driven by synthetic tickets against the local PostgREST
+stand-in, the fake LLM and (with aiosmtpd installed) the SMTP stub.
+
+Reports throughput, per-stage latency percentiles and process resource use for
+each concurrency level. Save a run with --json and pass it as --baseline to a
+later run to fail on throughput or p95 regressions.
+
+    uv run python benchmarks/load_test.py --tickets 200 --concurrency 1,4,8 \\
+        --llm-latency-ms 400 --llm-jitter-ms 200 --llm-error-rate 0.02 --json baseline.json
+    uv run python benchmarks/load_test.py --baseline baseline.json --max-regression 0.2
+
+--supabase-env runs against SUPABASE_URL/SUPABASE_KEY from .env instead (e.g. a
+local `supabase start` stack with the schema and migrations applied).
+"""
+import os
+import sys
+import json
+import time
+import random
+import resource
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from postgrest_stub import start_stub_server
+
+MANAGERS = [
+    {"id": 1, "name": "Amit Patel", "role": "Support Lead", "department": "Customer Support",
+     "skill_group": "support", "expertise": "General queries, billing", "is_active": True},
+    {"id": 2, "name": "Anjali Singh", "role": "QA Lead", "department": "Quality Assurance",
+     "skill_group": "qa", "expertise": "Bugs, UI issues", "is_active": True},
+    {"id": 3, "name": "Priya Sharma", "role": "Backend Lead", "department": "Backend Engineering",
+     "skill_group": "backend", "expertise": "Server logic, DB issues", "is_active": True},
+    {"id": 4, "name": "Rajesh Kumar", "role": "SRE Lead", "department": "Infrastructure/SRE",
+     "skill_group": "sre", "expertise": "Infrastructure, performance, video playback", "is_active": True},
+    {"id": 5, "name": "Vikram Reddy", "role": "Security Lead", "department": "Security",
+     "skill_group": "security", "expertise": "Access, data privacy", "is_active": True},
+    # Synthetic second members so the load test exercises rebalancing within a group
+    {"id": 6, "name": "Load Test SRE 2", "role": "SRE Engineer", "department": "Infrastructure/SRE",
+     "skill_group": "sre", "expertise": "Infrastructure, performance", "is_active": True},
+    {"id": 7, "name": "Load Test Support 2", "role": "Support Engineer", "department": "Customer Support",
+     "skill_group": "support", "expertise": "General queries, billing", "is_active": True},
+]
+
+# (title, description) templates per kind; "vague" tickets give the rules nothing to go on
+TEMPLATES = {
+    "payments": [("Charged twice for {plan}", "My card was charged twice for the {plan} plan on {day}. Please refund."),
+                 ("Refund not received", "I requested a refund for invoice {num} {days} days ago and still see nothing.")],
+    "access": [("Can't log in", "Password reset email never arrives and my account is locked since {day}."),
+               ("2FA codes rejected", "Every 2FA code is rejected when I try to log in from {device}.")],
+    "infrastructure": [("Video keeps buffering", "Lessons buffer every few seconds on {device}, site is very slow."),
+                       ("Server error on dashboard", "Getting a 502 server error and timeout loading the dashboard.")],
+    "backend": [("Progress not saving", "My course progress is not saving after I finish module {num}."),
+                ("Wrong score shown", "The quiz score is calculated incorrectly, shows {num}% instead of 100%.")],
+    "vague": [("Something is off", "Since {day} things behave strangely for me on {device}, not sure why."),
+              ("Need help", "Hi, I have a question about my {plan} subscription and what happens next.")],
+}
+# Free-text context customers add around the actual problem, so distinct tickets don't look like duplicates
+DETAILS = [
+    "I am on the {plan} plan through my employer.", "This started right after the last update.",
+    "My colleague sees the same thing on {device}.", "I already cleared the cache and restarted.",
+    "It worked fine until {day}.", "We have a deadline coming up so this is urgent.",
+    "Order reference {num}-{days}.", "I contacted support by chat before but got no answer.",
+    "Attaching nothing since I can't take screenshots here.", "Happens roughly {days} times a day.",
+    "Our team of {num} people depends on this.", "Tried from home and from the office network.",
+]
+FILLERS = {
+    "plan": ["Pro", "Team", "Annual", "Starter"], "day": ["Monday", "yesterday", "last week", "the 3rd"],
+    "device": ["Chrome", "Safari on iPhone", "the Android app", "Firefox"], "num": ["12", "48", "7", "1093"],
+    "days": ["3", "10", "21"],
+}
+
+
+def synthetic_tickets(count, duplicate_rate=0.1, seed=42):
+    """
+    Yields (title, description) pairs; duplicate_rate of them repeat an earlier ticket,
+    as happens during an outage.
+    """
+    rng = random.Random(seed)
+    issued = []
+    for i in range(count):
+        if issued and rng.random() < duplicate_rate:
+            yield rng.choice(issued)
+            continue
+        title, description = rng.choice(TEMPLATES[rng.choice(list(TEMPLATES))])
+        fill = {k: rng.choice(v) for k, v in FILLERS.items()}
+        details = " ".join(rng.sample(DETAILS, 3)).format(**fill)
+        ticket = (title.format(**fill), f"{description.format(**fill)} {details} Customer #{rng.randrange(10 ** 6)}.")
+        issued.append(ticket)
+        yield ticket
+
+
+def _configure(args, base_url):
+    """
+    Points the app at the stand-ins. Must run before any project module is imported.
+    """
+    workdir = tempfile.mkdtemp(prefix="load-test-")
+    env = {
+        "CREWAI_TELEMETRY_OPTOUT": "true",
+        "LLM_PROVIDER": "fake",
+        "LLM_CACHE_ENABLED": "false",
+        "LLM_REQUESTS_PER_MINUTE": str(args.llm_rpm),
+        "LLM_BACKOFF_BASE_SECONDS": str(args.llm_backoff),
+        "LLM_BACKOFF_MAX_SECONDS": str(max(args.llm_backoff * 8, 1)),
+        "FAKE_LLM_LATENCY_MS": str(args.llm_latency_ms),
+        "FAKE_LLM_LATENCY_JITTER_MS": str(args.llm_jitter_ms),
+        "FAKE_LLM_ERROR_RATE": str(args.llm_error_rate),
+        "TRIAGE_PIPELINE_MODE": args.mode,
+        "AUDIT_SPOOL_PATH": os.path.join(workdir, "audit_spool.jsonl"),
+        "EMAIL_OUTBOX_PATH": os.path.join(workdir, "outbox.db"),
+        "EMAIL_POLL_INTERVAL": "0.05",
+        "SMTP_SERVER": "127.0.0.1",
+        "SMTP_PORT": str(args.smtp_port),
+        "SMTP_USER": "",
+        "SMTP_PASSWORD": "",
+        "SMTP_STARTTLS": "false",
+        "METRICS_ENABLED": "true",
+    }
+    if args.crew_only:
+        env.update(FAST_PATH_ENABLED="false", DEDUP_ENABLED="false")
+    if base_url:
+        env.update(SUPABASE_URL=base_url, SUPABASE_KEY="load-test-key")
+    os.environ.update(env)
+
+
+def _percentile(samples, q):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, max(0, int(round(q * len(samples))) - 1))]
+
+
+def _counter_totals(name, label):
+    """
+    Sums a registered counter by one label, e.g. tickets_processed_total by path.
+    """
+    import metrics
+
+    totals = {}
+    metric = metrics.get_metric(name)
+    index = metric.labelnames.index(label)
+    for _, key, _, value in metric.samples():
+        totals[key[index]] = totals.get(key[index], 0) + value
+    return totals
+
+
+def _delta(after, before):
+    return {k: v - before.get(k, 0) for k, v in after.items() if v - before.get(k, 0)}
+
+
+def run_ticket(number, title, description, stages, errors, lock):
+    from database import create_ticket_with_new_id, resolve_ticket
+    from ticket_processor import process_ticket
+    from email_service import queue_resolution_email
+
+    email = f"load{number}@example.com"
+    timings = {}
+    try:
+        started = time.perf_counter()
+        ticket_id = create_ticket_with_new_id(email, title, description, name=f"Load User {number}", email=email)
+        timings["create"] = time.perf_counter() - started
+
+        mark = time.perf_counter()
+        process_ticket({"ticket_id": ticket_id, "title": title, "description": description})
+        timings["triage"] = time.perf_counter() - mark
+
+        mark = time.perf_counter()
+        resolve_ticket(ticket_id, "Resolved by the load test.")
+        queue_resolution_email(email, ticket_id, title, "Resolved by the load test.")
+        timings["resolve"] = time.perf_counter() - mark
+        timings["end_to_end"] = time.perf_counter() - started
+    except Exception as e:
+        with lock:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+        return
+    with lock:
+        for stage, elapsed in timings.items():
+            stages.setdefault(stage, []).append(elapsed)
+
+
+def run_level(concurrency, tickets):
+    from database import flush_audit_log
+    import dedup_cache
+
+    # Each level starts cold so earlier levels' tickets don't turn into duplicate hits
+    dedup_cache._cache = dedup_cache.SimilarityCache()
+    stages, errors, lock = {}, {}, threading.Lock()
+    paths_before = _counter_totals("tickets_processed_total", "path")
+    rebalanced_before = sum(_counter_totals("assignments_rebalanced_total", "skill_group").values())
+    db_before = sum(_counter_totals("supabase_requests_total", "method").values())
+    llm_before = sum(_counter_totals("llm_requests_total", "outcome").values())
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for number, (title, description) in enumerate(tickets):
+            pool.submit(run_ticket, number, title, description, stages, errors, lock)
+    elapsed = time.perf_counter() - started
+    peak_threads = threading.active_count()
+    flush_audit_log()
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+
+    completed = len(stages.get("end_to_end", []))
+    cpu = (usage.ru_utime - usage_before.ru_utime) + (usage.ru_stime - usage_before.ru_stime)
+    return {
+        "concurrency": concurrency,
+        "tickets": len(tickets),
+        "completed": completed,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "tickets_per_min": round(completed / elapsed * 60, 1),
+        "latency_ms": {
+            stage: {q: round(_percentile(samples, p) * 1000, 1) for q, p in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))}
+            for stage, samples in stages.items()
+        },
+        "paths": _delta(_counter_totals("tickets_processed_total", "path"), paths_before),
+        "rebalanced": sum(_counter_totals("assignments_rebalanced_total", "skill_group").values()) - rebalanced_before,
+        "db_requests_per_ticket": round(
+            (sum(_counter_totals("supabase_requests_total", "method").values()) - db_before) / max(completed, 1), 1),
+        "llm_calls_per_ticket": round(
+            (sum(_counter_totals("llm_requests_total", "outcome").values()) - llm_before) / max(completed, 1), 2),
+        "cpu_percent": round(cpu / elapsed * 100, 1),
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),
+        "threads": peak_threads,
+    }
+
+
+def drain_emails(timeout=60):
+    """
+    Waits for the background sender to empty the outbox; returns (sent, seconds).
+    """
+    from email_service import get_outbox_stats
+
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        stats = get_outbox_stats()
+        if not stats.get("queued", 0) and not stats.get("leased", 0):
+            break
+        time.sleep(0.05)
+    return get_outbox_stats().get("sent", 0), time.perf_counter() - started
+
+
+def print_report(results):
+    header = (f"{'conc':>4} {'done':>6} {'err':>4} {'tickets/min':>11} {'e2e p50':>9} {'e2e p95':>9} {'e2e p99':>9} "
+              f"{'triage p95':>10} {'db p95*':>8} {'cpu%':>6} {'rss MB':>7} {'db/tkt':>6} {'llm/tkt':>7}")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        lat = r["latency_ms"]
+        e2e, triage = lat.get("end_to_end", {}), lat.get("triage", {})
+        db_p95 = max(lat.get("create", {}).get("p95", 0), lat.get("resolve", {}).get("p95", 0))
+        print(f"{r['concurrency']:>4} {r['completed']:>6} {sum(r['errors'].values()):>4} {r['tickets_per_min']:>11} "
+              f"{e2e.get('p50', 0):>9} {e2e.get('p95', 0):>9} {e2e.get('p99', 0):>9} {triage.get('p95', 0):>10} "
+              f"{db_p95:>8} {r['cpu_percent']:>6} {r['peak_rss_mb']:>7} {r['db_requests_per_ticket']:>6} "
+              f"{r['llm_calls_per_ticket']:>7}")
+    print("Latencies in ms. db p95* = slower of the create and resolve stages.")
+    for r in results:
+        paths = ", ".join(f"{path} {n:g}" for path, n in sorted(r["paths"].items()))
+        errors = ", ".join(f"{name} {n}" for name, n in r["errors"].items()) or "none"
+        print(f"  concurrency {r['concurrency']}: paths [{paths}], rebalanced {r['rebalanced']:g}, errors [{errors}]")
+
+
+def check_regressions(results, baseline_path, max_regression):
+    """
+    Returns the levels whose throughput dropped, or whose end-to-end p95 grew,
+    by more than max_regression compared to the baseline run.
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {level["concurrency"]: level for level in json.load(f)["levels"]}
+    failures = []
+    for r in results:
+        base = baseline.get(r["concurrency"])
+        if base is None:
+            continue
+        if r["tickets_per_min"] < base["tickets_per_min"] * (1 - max_regression):
+            failures.append(f"concurrency {r['concurrency']}: throughput {r['tickets_per_min']}/min "
+                            f"vs baseline {base['tickets_per_min']}/min")
+        p95, base_p95 = r["latency_ms"]["end_to_end"]["p95"], base["latency_ms"]["end_to_end"]["p95"]
+        if p95 > base_p95 * (1 + max_regression):
+            failures.append(f"concurrency {r['concurrency']}: e2e p95 {p95}ms vs baseline {base_p95}ms")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickets", type=int, default=100, help="Tickets per concurrency level")
+    parser.add_argument("--concurrency", default="1,4,8", help="Comma-separated worker counts")
+    parser.add_argument("--mode", default="parallel", choices=["sequential", "parallel", "fast"])
+    parser.add_argument("--crew-only", action="store_true", help="Disable the fast path and duplicate cache")
+    parser.add_argument("--duplicate-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--llm-jitter-ms", type=float, default=100)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Share of LLM calls failing with a 429")
+    parser.add_argument("--llm-rpm", type=float, default=100000, help="Client-side LLM rate limit")
+    parser.add_argument("--llm-backoff", type=float, default=0.05, help="Retry backoff base in seconds")
+    parser.add_argument("--db-latency-ms", type=float, default=5, help="Added to every stub response")
+    parser.add_argument("--supabase-env", action="store_true", help="Use SUPABASE_URL/KEY instead of the stub")
+    parser.add_argument("--smtp-port", type=int, default=8025)
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--baseline", help="Results file from an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    server = base_url = None
+    if not args.supabase_env:
+        server, base_url = start_stub_server(latency=args.db_latency_ms / 1000)
+        server.store["managers"] = [dict(m) for m in MANAGERS]
+    _configure(args, base_url)
+
+    smtp = None
+    try:
+        from smtp_stub import start_smtp_stub
+        smtp = start_smtp_stub(args.smtp_port)
+    except ImportError:
+        print("⚠️ aiosmtpd not installed; resolution emails stay in the outbox (install the dev group: uv sync).")
+
+    # Importing the pipeline registers its metrics, which the report reads
+    import ticket_processor  # noqa: F401
+    import email_service
+    if smtp:
+        email_service.start_email_sender()
+
+    # Warm up imports, agents and connection pools outside the measured runs
+    run_level(1, list(synthetic_tickets(2, 0, seed=args.seed + 1)))
+
+    levels = [int(c) for c in args.concurrency.split(",")]
+    print(f"🤖 {args.tickets} tickets per level, mode={args.mode}, LLM {args.llm_latency_ms:g}±"
+          f"{args.llm_jitter_ms:g}ms with {args.llm_error_rate:.0%} errors, concurrency {levels}")
+    results = []
+    for level in levels:
+        tickets = list(synthetic_tickets(args.tickets, args.duplicate_rate, seed=args.seed + level))
+        results.append(run_level(level, tickets))
+        print(f"   concurrency {level}: {results[-1]['tickets_per_min']} tickets/min")
+
+    print()
+    print_report(results)
+    if smtp:
+        sent, seconds = drain_emails()
+        controller, handler = smtp
+        print(f"📧 {sent} resolution emails delivered ({len(handler.messages)} received by the stub, "
+              f"{handler.sessions} SMTP sessions), outbox drained {seconds:.1f}s after the last run")
+        controller.stop()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "levels": results}, f, indent=2)
+        print(f"💾 Results written to {args.json}")
+    if server:
+        server.shutdown()
+
+    if args.baseline:
+        failures = check_regressions(results, args.baseline, args.max_regression)
+        if failures:
+            print("❌ Regression against " + args.baseline + ":\n  " + "\n  ".join(failures))
+            sys.exit(1)
+        print(f"✅ Within {args.max_regression:.0%} of {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Minimal local PostgREST stand-in for benchmarks.
+
+Serves /rest/v1/<table>, the manager load view and the ticket RPCs from supabase_schema.sql over
+HTTP/1.1 keep-alive and keeps rows in memory, so client overhead and the
+ticket pipeline can be measured without a Supabase project.
+"""
+import json
+import time
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qsl
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _table(self):
+        path = urlparse(self.path).path
+        return path.rstrip("/").split("/")[-1]
+
+    def _params(self):
+        return parse_qsl(urlparse(self.path).query)
+
+    def _filters(self):
+        filters = []
+        for k, v in self._params():
+            negate = v.startswith("not.")
+            op, _, text = (v[4:] if negate else v).partition(".")
+            if op in _OPERATORS:
+                filters.append((k, op, text, negate))
+        return filters
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"null") if length else None
+
+    def _matches(self, row, filters):
+        return all(_OPERATORS[op](row.get(k), v) != negate for k, op, v, negate in filters)
+
+    def _send(self, status, payload):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        body = json.dumps(payload, default=str).encode()
+        count = len(payload) if isinstance(payload, list) else 0
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Content-Range", f"0-{max(count - 1, 0)}/{count}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        store = self.server.store
+        with self.server.lock:
+            view = _VIEWS.get(self._table())
+            source = view(store) if view else store.get(self._table(), [])
+            rows = [r for r in source if self._matches(r, self._filters())]
+        params = dict(self._params())
+        if "order" in params:
+            column, _, direction = params["order"].partition(".")
+            rows.sort(key=lambda r: _sort_key(r.get(column)), reverse=direction.startswith("desc"))
+        if "limit" in params:
+            rows = rows[:int(params["limit"])]
+        self._send(200, rows)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_POST(self):
+        if "/rpc/" in urlparse(self.path).path:
+            rpc = _RPCS.get(self._table())
+            if rpc is None:
+                self._send(404, {"message": f"function {self._table()} not found"})
+                return
+            with self.server.lock:
+                result = rpc(self.server, self._read_body() or {})
+            self._send(200, result)
+            return
+        rows = self._read_body() or []
+        if isinstance(rows, dict):
+            rows = [rows]
+        with self.server.lock:
+            _insert(self.server, self._table(), rows)
+        self._send(201, rows)
+
+    def do_PATCH(self):
+        changes = self._read_body() or {}
+        filters = self._filters()
+        with self.server.lock:
+            updated = [r for r in self.server.store.get(self._table(), []) if self._matches(r, filters)]
+            for row in updated:
+                row.update(changes)
+        self._send(200, updated)
+
+
+def _as_text(value):
+    # PostgREST filters spell booleans and nulls in lower case
+    return json.dumps(value) if isinstance(value, bool) or value is None else str(value)
+
+
+def _sort_key(value):
+    return (value is None, value if isinstance(value, (int, float)) else str(value))
+
+
+def _compare(value, text):
+    # Numeric columns (ids) compare as numbers, everything else as text
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value - float(text)
+    return (str(value) > text) - (str(value) < text)
+
+
+_OPERATORS = {
+    "eq": lambda value, text: _as_text(value) == text,
+    "gt": lambda value, text: value is not None and _compare(value, text) > 0,
+    "lt": lambda value, text: value is not None and _compare(value, text) < 0,
+    "is": lambda value, text: _as_text(value) == text,
+    "in": lambda value, text: _as_text(value) in [v.strip('"') for v in text.strip("()").split(",")],
+}
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _insert(server, table, rows):
+    for row in rows:
+        if table == "ticket_logs":
+            server.next_log_id += 1
+            row.setdefault("id", server.next_log_id)
+            row.setdefault("timestamp", _now())
+        server.store.setdefault(table, []).append(row)
+
+
+def _update_ticket(server, ticket_id, **changes):
+    for row in server.store.get("tickets", []):
+        if row["ticket_id"] == ticket_id:
+            row.update(changes)
+
+
+def _create_ticket_tx(server, args):
+    if args.get("p_user_name") is not None or args.get("p_user_email") is not None:
+        users = server.store.setdefault("users", [])
+        users[:] = [u for u in users if u["id"] != args["p_user_id"]]
+        users.append({"id": args["p_user_id"], "name": args.get("p_user_name"),
+                      "email": args.get("p_user_email"), "phone": args.get("p_user_phone")})
+    _insert(server, "tickets", [{
+        "ticket_id": args["p_ticket_id"], "user_id": args["p_user_id"], "title": args["p_title"],
+        "description": args["p_description"], "category": args.get("p_category"), "status": "Open",
+        "created_at": _now(),
+    }])
+    _insert(server, "ticket_logs", [{"ticket_id": args["p_ticket_id"], "action": "Ticket Created",
+                                     "details": f"Ticket raised by user {args['p_user_id']}"}])
+
+
+def _assign_ticket_tx(server, args):
+    _update_ticket(server, args["p_ticket_id"], category=args["p_category"], severity=args["p_severity"],
+                   priority=args["p_priority"], assigned_to=args["p_assigned_to"],
+                   assignment_reason=args["p_reason"], status="Assigned")
+    _insert(server, "ticket_logs", [{"ticket_id": args["p_ticket_id"], "action": "Ticket Assigned",
+                                     "details": f"Assigned to manager ID {args['p_assigned_to']}."}])
+
+
+def _assignee_if(server, ticket_id, resolved):
+    for row in server.store.get("tickets", []):
+        if row["ticket_id"] == ticket_id and (row.get("status") == "Resolved") == resolved:
+            return row.get("assigned_to")
+    return None
+
+
+def _resolve_ticket_tx(server, args):
+    released = _assignee_if(server, args["p_ticket_id"], resolved=False)
+    _update_ticket(server, args["p_ticket_id"], status="Resolved", resolved_at=_now(),
+                   resolution_notes=args["p_notes"])
+    _insert(server, "ticket_logs", [{"ticket_id": args["p_ticket_id"], "action": "Ticket Resolved",
+                                     "details": args["p_notes"]}])
+    return released
+
+
+def _reopen_ticket_tx(server, args):
+    reclaimed = _assignee_if(server, args["p_ticket_id"], resolved=True)
+    _update_ticket(server, args["p_ticket_id"], status="Open", resolved_at=None)
+    _insert(server, "ticket_logs", [{"ticket_id": args["p_ticket_id"], "action": "Ticket Re-opened",
+                                     "details": "User re-opened the ticket."}])
+    return reclaimed
+
+
+def _claim_ticket_id_node(server, args):
+    server.next_node = (server.next_node + 1) % 1000
+    return server.next_node
+
+
+_RPCS = {
+    "create_ticket_tx": _create_ticket_tx,
+    "assign_ticket_tx": _assign_ticket_tx,
+    "resolve_ticket_tx": _resolve_ticket_tx,
+    "reopen_ticket_tx": _reopen_ticket_tx,
+    "claim_ticket_id_node": _claim_ticket_id_node,
+}
+
+
+def _manager_open_ticket_counts(store):
+    open_tickets = {}
+    for row in store.get("tickets", []):
+        if row.get("status") != "Resolved" and row.get("assigned_to") is not None:
+            open_tickets[row["assigned_to"]] = open_tickets.get(row["assigned_to"], 0) + 1
+    return [{"manager_id": m["id"], "name": m["name"], "role": m["role"], "department": m.get("department"),
+             "skill_group": m.get("skill_group") or m.get("department"), "expertise": m.get("expertise"),
+             "open_tickets": open_tickets.get(m["id"], 0)}
+            for m in store.get("managers", []) if m.get("is_active", True)]
+
+
+_VIEWS = {
+    "manager_open_ticket_counts": _manager_open_ticket_counts,
+}
+
+
+def start_stub_server(host="127.0.0.1", port=0, latency=0.0):
+    """
+    Starts the stand-in on a background thread and returns (server, base_url).
+    `latency` (seconds) is added to every response to mimic a remote database.
+    """
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.store = {}
+    server.next_log_id = 0
+    server.next_node = -1
+    server.latency = latency
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
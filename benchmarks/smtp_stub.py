@@ -0,0 +1,48 @@
+"""
+Local SMTP stand-in (aiosmtpd) that accepts and counts messages in memory,
+for exercising the email outbox without a real mail server. Recipients in
+`refuse` get a permanent 550, like a mailbox that does not exist.
+"""
+import threading
+
+
+class CountingHandler:
+    def __init__(self, latency=0.0, refuse=()):
+        self.latency = latency
+        self.refuse = set(refuse)
+        self.messages = []
+        self.sessions = 0
+        self._lock = threading.Lock()
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        with self._lock:
+            self.sessions += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.refuse:
+            return "550 5.1.1 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.latency:
+            import asyncio
+            await asyncio.sleep(self.latency)
+        with self._lock:
+            self.messages.append((envelope.mail_from, list(envelope.rcpt_tos), envelope.content))
+        return "250 Message accepted for delivery"
+
+
+def start_smtp_stub(port=8025, latency=0.0, refuse=()):
+    """
+    Starts the stub on 127.0.0.1:port and returns (controller, handler).
+    Call controller.stop() when done.
+    """
+    from aiosmtpd.controller import Controller
+
+    handler = CountingHandler(latency, refuse)
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    return controller, handler
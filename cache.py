@@ -0,0 +1,130 @@
+import os
+import time
+import threading
+import functools
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+READ_CACHE_ENABLED = os.getenv("READ_CACHE_ENABLED", "true").lower() == "true"
+
+_registry = {}
+
+
+def _freeze(value):
+    # Streamlit widgets hand back lists; make them usable as cache keys
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def make_key(args, kwargs):
+    return _freeze(args) + (_freeze(kwargs),) if kwargs else _freeze(args)
+
+
+class TTLCache:
+    """
+    Size-bounded LRU cache whose entries expire after `ttl` seconds.
+    """
+
+    def __init__(self, name, ttl, maxsize=128):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and time.monotonic() - entry[1] <= self.ttl:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return True, entry[0]
+            if entry is not None:
+                del self._data[key]
+                self.evictions += 1
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "cache": self.name,
+                "ttl_s": self.ttl,
+                "entries": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+def cached(name, ttl, maxsize=128):
+    """
+    Caches a read function's result per argument tuple. The cache is
+    registered under `name` so write paths can invalidate it.
+    """
+    cache = TTLCache(name, ttl, maxsize)
+    _registry[name] = cache
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not READ_CACHE_ENABLED:
+                return func(*args, **kwargs)
+            key = make_key(args, kwargs)
+            hit, value = cache.get(key)
+            if hit:
+                return value
+            value = func(*args, **kwargs)
+            cache.set(key, value)
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+def invalidate(*names):
+    """
+    Clears the named caches, or every cache when no names are given.
+    """
+    for name in names or list(_registry):
+        cache = _registry.get(name)
+        if cache is not None:
+            cache.clear()
+
+
+def invalidate_key(name, *args, **kwargs):
+    cache = _registry.get(name)
+    if cache is not None:
+        cache.discard(make_key(args, kwargs))
+
+
+def get_cache_stats():
+    return [cache.stats() for cache in _registry.values()]
@@ -1,16 +1,132 @@
 import os
-from datetime import datetime
-from supabase import create_client, Client
+import threading
+from datetime import datetime, timedelta, timezone
+import httpx
+from supabase import create_client, Client, ClientOptions
 from dotenv import load_dotenv
 import pandas as pd
+from cache import cached, invalidate, invalidate_key
+from audit_log import AuditWriter
+from ticket_ids import parse_ticket_id, next_ticket_id
+import metrics
+import ticket_events
+import manager_workload
 
 load_dotenv()
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+SUPABASE_POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "20"))
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "10"))
+SUPABASE_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", "60"))
+SUPABASE_HTTP2 = os.getenv("SUPABASE_HTTP2", "true").lower() == "true"
+AUDIT_LOG_ASYNC = os.getenv("AUDIT_LOG_ASYNC", "true").lower() == "true"
+TICKET_LOG_PAGE_SIZE = int(os.getenv("TICKET_LOG_PAGE_SIZE", "50"))
+
+_client = None
+_client_lock = threading.Lock()
+
+SUPABASE_REQUESTS = metrics.counter(
+    "supabase_requests_total", "Supabase REST requests by method, table/RPC and status", ("method", "resource", "status"))
+SUPABASE_REQUEST_SECONDS = metrics.histogram(
+    "supabase_request_seconds", "Supabase REST request latency", ("method", "resource"))
+TIME_TO_RESOLUTION = metrics.histogram(
+    "ticket_time_to_resolution_seconds", "Ticket creation to resolution", buckets=metrics.TICKET_AGE_BUCKETS)
+
+def _http2_available():
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+class InstrumentedTransport(httpx.BaseTransport):
+    """
+    Times every request to Supabase, labelled by table or RPC name.
+    """
+
+    def __init__(self, transport):
+        self.transport = transport
+
+    def handle_request(self, request):
+        method = request.method
+        resource = request.url.path.removeprefix("/rest/v1/") or "/"
+        status = "error"
+        try:
+            with SUPABASE_REQUEST_SECONDS.time(method=method, resource=resource):
+                response = self.transport.handle_request(request)
+            status = str(response.status_code)
+            return response
+        finally:
+            SUPABASE_REQUESTS.inc(method=method, resource=resource, status=status)
+
+    def close(self):
+        self.transport.close()
+
+def _create_http_client() -> httpx.Client:
+    transport = httpx.HTTPTransport(
+        http2=SUPABASE_HTTP2 and _http2_available(),
+        limits=httpx.Limits(
+            max_connections=SUPABASE_POOL_SIZE,
+            max_keepalive_connections=SUPABASE_POOL_SIZE,
+            keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY,
+        ),
+    )
+    return httpx.Client(transport=InstrumentedTransport(transport), timeout=httpx.Timeout(SUPABASE_TIMEOUT))
+
+def create_supabase_client() -> Client:
+    """
+    Builds a Supabase client backed by a keep-alive httpx connection pool.
+    """
+    options = ClientOptions(httpx_client=_create_http_client(), postgrest_client_timeout=SUPABASE_TIMEOUT)
+    return create_client(SUPABASE_URL, SUPABASE_KEY, options=options)
 
 def get_supabase_client() -> Client:
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
+    """
+    Returns the process-wide Supabase client. The underlying httpx pool is
+    thread-safe, so the same client is shared by the portals and workers.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = create_supabase_client()
+    return _client
+
+# Caches holding ticket lists or aggregates that any ticket state change makes stale
+TICKET_LIST_CACHES = (
+    "ticket_page", "status_counts", "category_severity_counts",
+    "open_tickets_by_manager", "daily_ticket_volume",
+)
+
+def _invalidate_ticket(ticket_id):
+    invalidate(*TICKET_LIST_CACHES)
+    invalidate_key("ticket", ticket_id)
+    ticket_events.publish(ticket_id, "ticket")
+
+def _on_ticket_event(ticket_id, kind):
+    # Changes can also arrive from other processes via LISTEN/NOTIFY.
+    # New log entries leave the ticket row alone; timelines fetch them incrementally.
+    if kind != "log":
+        invalidate(*TICKET_LIST_CACHES)
+        invalidate_key("ticket", ticket_id)
+
+ticket_events.subscribe(_on_ticket_event)
+
+# Seed roster, one lead per skill group. Managers are read from the table at runtime
+# (manager_workload.py), so staff are added per skill group in the table (see README).
+DEFAULT_MANAGERS = [
+    {"id": 1, "name": "Amit Patel", "role": "Support Lead", "department": "Customer Support",
+     "skill_group": "support", "expertise": "General queries, billing"},
+    {"id": 2, "name": "Anjali Singh", "role": "QA Lead", "department": "Quality Assurance",
+     "skill_group": "qa", "expertise": "Bugs, UI issues"},
+    {"id": 3, "name": "Priya Sharma", "role": "Backend Lead", "department": "Backend Engineering",
+     "skill_group": "backend", "expertise": "Server logic, DB issues"},
+    {"id": 4, "name": "Rajesh Kumar", "role": "SRE Lead", "department": "Infrastructure/SRE",
+     "skill_group": "sre", "expertise": "Infrastructure, performance, video playback"},
+    {"id": 5, "name": "Vikram Reddy", "role": "Security Lead", "department": "Security",
+     "skill_group": "security", "expertise": "Access, data privacy"},
+]
 
 def init_db():
     """
@@ -23,87 +139,342 @@ def init_db():
         # Check if managers table has data
         response = client.table("managers").select("id", count="exact").execute()
         if response.count == 0:
-            managers = [
-                {"id": 1, "name": "Amit Patel", "role": "Support Lead", "department": "Customer Support"},
-                {"id": 2, "name": "Anjali Singh", "role": "QA Lead", "department": "Quality Assurance"},
-                {"id": 3, "name": "Priya Sharma", "role": "Backend Lead", "department": "Backend Engineering"},
-                {"id": 4, "name": "Rajesh Kumar", "role": "SRE Lead", "department": "Infrastructure/SRE"},
-                {"id": 5, "name": "Vikram Reddy", "role": "Security Lead", "department": "Security"}
-            ]
-            client.table("managers").insert(managers).execute()
+            client.table("managers").insert(DEFAULT_MANAGERS).execute()
     except Exception as e:
         print(f"⚠️ Error initializing/seeding database: {e}")
 
-def add_user(user_id, name, email, phone):
+def get_user_tiers(user_ids):
+    """
+    Returns {user_id: tier} for the given users (see migrations/0005_user_tier.sql).
+    """
     client = get_supabase_client()
-    client.table("users").upsert({"id": user_id, "name": name, "email": email, "phone": phone}).execute()
+    response = client.table("users").select("id, tier").in_("id", list(user_ids)).execute()
+    return {row['id']: row['tier'] for row in response.data}
 
-def create_ticket(ticket_id, user_id, title, description, category=None):
+def create_ticket(ticket_id, user_id, title, description, category=None, name=None, email=None, phone=None):
+    """
+    Creates the ticket and its "Ticket Created" log in one transaction.
+    When name/email are given the user is upserted in the same transaction.
+    """
     client = get_supabase_client()
-    client.table("tickets").insert({
-        "ticket_id": ticket_id,
-        "user_id": user_id,
-        "title": title,
-        "description": description,
-        "category": category,
-        "status": "Open"
+    client.rpc("create_ticket_tx", {
+        "p_ticket_id": ticket_id,
+        "p_user_id": user_id,
+        "p_title": title,
+        "p_description": description,
+        "p_category": category,
+        "p_user_name": name,
+        "p_user_email": email,
+        "p_user_phone": phone
     }).execute()
-    log_action(ticket_id, "Ticket Created", f"Ticket raised by user {user_id}")
+    _invalidate_ticket(ticket_id)
+
+def is_unique_violation(error):
+    # PostgREST passes the Postgres SQLSTATE through as the error code
+    return getattr(error, "code", None) == "23505"
+
+def claim_ticket_id_node():
+    """
+    The next ticket ID node from the database sequence (migrations/0009_ticket_id_nodes.sql).
+    """
+    client = get_supabase_client()
+    return client.rpc("claim_ticket_id_node", {}).execute().data
+
+def create_ticket_with_new_id(user_id, title, description, category=None, name=None, email=None, phone=None,
+                              attempts=3):
+    """
+    Creates a ticket under a freshly generated ID and returns the ID. A node
+    set twice in TICKET_ID_NODE, or a fallback node, can clash, so a duplicate
+    ID is retried.
+    """
+    for attempt in range(1, attempts + 1):
+        ticket_id = next_ticket_id()
+        try:
+            create_ticket(ticket_id, user_id, title, description, category, name, email, phone)
+            return ticket_id
+        except Exception as e:
+            if not is_unique_violation(e) or attempt == attempts:
+                raise
+            print(f"⚠️ Ticket ID {ticket_id} already taken (shared TICKET_ID_NODE?); retrying with a new ID.")
 
 def update_ticket_assignment(ticket_id, category, severity, priority, assigned_to_id, reason):
     client = get_supabase_client()
-    client.table("tickets").update({
-        "category": category,
-        "severity": severity,
-        "priority": priority,
-        "assigned_to": assigned_to_id,
-        "assignment_reason": reason,
-        "status": "Assigned"
-    }).eq("ticket_id", ticket_id).execute()
-    log_action(ticket_id, "Ticket Assigned", f"Assigned to manager ID {assigned_to_id}. Reason: {reason[:100]}...")
+    client.rpc("assign_ticket_tx", {
+        "p_ticket_id": ticket_id,
+        "p_category": category,
+        "p_severity": severity,
+        "p_priority": priority,
+        "p_assigned_to": assigned_to_id,
+        "p_reason": reason
+    }).execute()
+    _invalidate_ticket(ticket_id)
 
 def resolve_ticket(ticket_id, notes):
     client = get_supabase_client()
-    client.table("tickets").update({
-        "status": "Resolved",
-        "resolved_at": datetime.now().isoformat(),
-        "resolution_notes": notes
-    }).eq("ticket_id", ticket_id).execute()
-    log_action(ticket_id, "Ticket Resolved", notes)
+    # Returns the manager whose open-ticket count dropped (migrations/0006_manager_workload.sql)
+    released = client.rpc("resolve_ticket_tx", {"p_ticket_id": ticket_id, "p_notes": notes}).execute().data
+    _invalidate_ticket(ticket_id)
+    if isinstance(released, int):
+        manager_workload.ticket_released(released)
+    parsed = parse_ticket_id(ticket_id)
+    if parsed:
+        TIME_TO_RESOLUTION.observe((datetime.now(timezone.utc) - parsed[0]).total_seconds())
 
-def log_action(ticket_id, action, details):
+def reopen_ticket(ticket_id):
     client = get_supabase_client()
-    client.table("ticket_logs").insert({
-        "ticket_id": ticket_id,
-        "action": action,
-        "details": details
-    }).execute()
+    reclaimed = client.rpc("reopen_ticket_tx", {"p_ticket_id": ticket_id}).execute().data
+    _invalidate_ticket(ticket_id)
+    if isinstance(reclaimed, int):
+        manager_workload.ticket_reopened(reclaimed)
+
+def bulk_import_tickets(users, tickets):
+    """
+    Upserts users and inserts tickets in two bulk requests. Tickets that already
+    exist are skipped, so re-running a chunk after an interruption is safe.
+    Returns the tickets that were actually inserted.
+    """
+    client = get_supabase_client()
+    # Only send the fields the export has, so a sparse row never blanks an existing user's details.
+    # A bulk request must use the same columns for every row, hence one upsert per column set.
+    by_columns = {}
+    for user in users:
+        present = {k: v for k, v in user.items() if v is not None}
+        by_columns.setdefault(tuple(sorted(present)), []).append(present)
+    for rows in by_columns.values():
+        client.table("users").upsert(rows, on_conflict="id").execute()
+    response = client.table("tickets").upsert(tickets, on_conflict="ticket_id", ignore_duplicates=True).execute()
+    inserted = response.data or []
+    if inserted:
+        _insert_logs([{"ticket_id": t['ticket_id'], "action": "Ticket Imported",
+                       "details": "Imported from a legacy helpdesk export"} for t in inserted])
+        invalidate(*TICKET_LIST_CACHES)
+    return inserted
 
-def get_all_tickets():
+def get_tickets_by_ids(ticket_ids, columns="ticket_id, user_id, title"):
     client = get_supabase_client()
-    # Join with managers using Supabase select syntax
-    response = client.table("tickets").select("*, managers(name)").execute()
-    df = pd.DataFrame(response.data)
+    return client.table("tickets").select(columns).in_("ticket_id", list(ticket_ids)).execute().data
+
+def get_unassigned_tickets(page_size=1000):
+    """
+    Yields open tickets with no assignment yet, paging through them by ticket_id.
+    """
+    client = get_supabase_client()
+    cursor = None
+    while True:
+        query = client.table("tickets").select("ticket_id, user_id, title, description") \
+            .eq("status", "Open").is_("assigned_to", "null")
+        if cursor is not None:
+            query = query.gt("ticket_id", cursor)
+        page = query.order("ticket_id").limit(page_size).execute().data
+        yield from page
+        if len(page) < page_size:
+            return
+        cursor = page[-1]['ticket_id']
+
+def _insert_logs(rows):
+    client = get_supabase_client()
+    client.table("ticket_logs").insert(rows).execute()
+
+def _on_logs_flushed(rows):
+    for ticket_id in {row['ticket_id'] for row in rows}:
+        ticket_events.publish(ticket_id, "log")
+
+_audit_writer = AuditWriter(_insert_logs, on_flush=_on_logs_flushed)
+
+def log_action(ticket_id, action, details):
+    """
+    Queues an audit entry; the background writer bulk-inserts it into ticket_logs.
+    """
+    if AUDIT_LOG_ASYNC:
+        _audit_writer.write(ticket_id, action, details)
+    else:
+        _insert_logs([{"ticket_id": ticket_id, "action": action, "details": details}])
+        ticket_events.publish(ticket_id, "log")
+
+def flush_audit_log(timeout=10):
+    _audit_writer.flush(timeout)
+
+TICKET_LIST_COLUMNS = "ticket_id, title, status, severity, priority, assigned_to, created_at, managers(name)"
+
+def _add_manager_name(df):
     if not df.empty and 'managers' in df.columns:
         df['manager_name'] = df['managers'].apply(lambda x: x['name'] if x and 'name' in x else None)
     else:
-         df['manager_name'] = None
+        df['manager_name'] = None
     return df
 
-def get_ticket_details(ticket_id):
+@cached("ticket_page", ttl=30, maxsize=256)
+def query_tickets(statuses=None, severities=None, include_unrated=True, manager_ids=None,
+                  created_from=None, created_to=None, columns=TICKET_LIST_COLUMNS,
+                  cursor=None, page_size=25):
+    """
+    Filtered, keyset-paginated ticket listing executed by PostgREST.
+    Tickets are sorted newest first by (created_at, ticket_id); pass the returned
+    cursor back in to fetch the next page. Returns (DataFrame, next_cursor).
+    """
     client = get_supabase_client()
-    
-    ticket_response = client.table("tickets").select("*, managers(name)").eq("ticket_id", ticket_id).execute()
-    logs_response = client.table("ticket_logs").select("*").eq("ticket_id", ticket_id).order("timestamp", desc=True).execute()
-    
-    ticket_df = pd.DataFrame(ticket_response.data)
+    query = client.table("tickets").select(columns)
+
+    if statuses is not None:
+        query = query.in_("status", list(statuses))
+    if manager_ids is not None:
+        query = query.in_("assigned_to", list(manager_ids))
+    if created_from is not None:
+        query = query.gte("created_at", str(created_from))
+    if created_to is not None:
+        query = query.lt("created_at", str(created_to))
+
+    # Conditions that need OR are combined into a single logic tree
+    or_groups = []
+    if severities is not None:
+        severity_list = ",".join(severities)
+        if include_unrated:
+            or_groups.append(f"or(severity.is.null,severity.in.({severity_list}))")
+        else:
+            query = query.in_("severity", list(severities))
+    if cursor is not None:
+        created_at, ticket_id = cursor
+        or_groups.append(
+            f'or(created_at.lt."{created_at}",and(created_at.eq."{created_at}",ticket_id.lt."{ticket_id}"))'
+        )
+    if or_groups:
+        query = query.or_(f"and({','.join(or_groups)})")
+
+    response = query.order("created_at", desc=True).order("ticket_id", desc=True).limit(page_size + 1).execute()
+
+    rows = response.data
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = (rows[-1]['created_at'], rows[-1]['ticket_id'])
+    return _add_manager_name(pd.DataFrame(rows)), next_cursor
+
+@cached("ticket", ttl=15, maxsize=256)
+def get_ticket(ticket_id):
+    """
+    The ticket row with its manager_name, as a one-row DataFrame (empty if not found).
+    """
+    client = get_supabase_client()
+    response = client.table("tickets").select("*, managers(name)").eq("ticket_id", ticket_id).execute()
+    ticket_df = pd.DataFrame(response.data)
     if not ticket_df.empty and 'managers' in ticket_df.columns:
         ticket_df['manager_name'] = ticket_df['managers'].apply(lambda x: x['name'] if x and 'name' in x else None)
-    
-    logs_df = pd.DataFrame(logs_response.data)
-    return ticket_df, logs_df
+    return ticket_df
+
+def get_ticket_logs(ticket_id, after_id=None, before_id=None, limit=TICKET_LOG_PAGE_SIZE):
+    """
+    Keyset-paged activity log of a ticket, by log id. Ids follow insertion, not event
+    order (buffered audit entries land late), so display by timestamp:
+    - after_id: up to `limit` entries newer than after_id, oldest first
+    - before_id: up to `limit` entries older than before_id, newest first
+    - neither: the newest `limit` entries, newest first
+    """
+    client = get_supabase_client()
+    query = client.table("ticket_logs").select("id, action, details, timestamp").eq("ticket_id", ticket_id)
+    if after_id is not None:
+        return query.gt("id", after_id).order("id").limit(limit).execute().data
+    if before_id is not None:
+        query = query.lt("id", before_id)
+    return query.order("id", desc=True).limit(limit).execute().data
 
+@cached("managers", ttl=300)
 def get_managers():
     client = get_supabase_client()
     response = client.table("managers").select("*").eq("is_active", True).execute()
     return pd.DataFrame(response.data)
+
+def get_stalled_tickets():
+    """
+    Returns open tickets whose AI analysis was started but never completed.
+    """
+    client = get_supabase_client()
+    open_response = client.table("tickets").select("ticket_id, user_id, title, description").eq("status", "Open").execute()
+    open_tickets = {t['ticket_id']: t for t in open_response.data}
+    if not open_tickets:
+        return []
+
+    logs_response = client.table("ticket_logs").select("ticket_id, action") \
+        .in_("ticket_id", list(open_tickets.keys())) \
+        .in_("action", ["AI Analysis Started", "AI Analysis Completed"]).execute()
+    started = {log['ticket_id'] for log in logs_response.data if log['action'] == "AI Analysis Started"}
+    completed = {log['ticket_id'] for log in logs_response.data if log['action'] == "AI Analysis Completed"}
+    return [open_tickets[ticket_id] for ticket_id in started - completed]
+
+def get_manager_skill_groups():
+    """
+    {manager_id: skill_group} for every manager, active or not.
+    """
+    client = get_supabase_client()
+    rows = client.table("managers").select("id, skill_group, department").execute().data
+    return {row["id"]: row.get("skill_group") or row.get("department") for row in rows}
+
+def get_assignment_history(limit=5000, page_size=1000):
+    """
+    Returns the most recent AI/manager-assigned tickets (title, description and
+    the assignment they received), newest first. Used to train and evaluate
+    the fast-path classifier.
+    """
+    client = get_supabase_client()
+    rows = []
+    while len(rows) < limit:
+        start = len(rows)
+        end = min(start + page_size, limit) - 1
+        page = client.table("tickets") \
+            .select("ticket_id, title, description, category, severity, priority, assigned_to") \
+            .not_.is_("assigned_to", "null") \
+            .order("created_at", desc=True).range(start, end).execute().data
+        rows.extend(page)
+        if len(page) < end - start + 1:
+            break
+    return pd.DataFrame(rows, columns=["ticket_id", "title", "description", "category",
+                                       "severity", "priority", "assigned_to"])
+
+# --- Analytics (pre-aggregated by the views in supabase_schema.sql) ---
+
+@cached("status_counts", ttl=30)
+def get_status_counts():
+    client = get_supabase_client()
+    response = client.table("ticket_status_counts").select("status, ticket_count").execute()
+    return {row['status']: row['ticket_count'] for row in response.data}
+
+@cached("category_severity_counts", ttl=60)
+def get_category_severity_counts():
+    client = get_supabase_client()
+    response = client.table("ticket_category_severity_counts").select("category, severity, ticket_count").execute()
+    return pd.DataFrame(response.data, columns=["category", "severity", "ticket_count"])
+
+@cached("open_tickets_by_manager", ttl=30)
+def get_open_tickets_by_manager():
+    client = get_supabase_client()
+    response = client.table("manager_open_ticket_counts").select("manager_id, name, role, open_tickets").execute()
+    return pd.DataFrame(response.data, columns=["manager_id", "name", "role", "open_tickets"])
+
+def get_manager_ids():
+    """
+    Ids of all managers, active or not, since tickets.assigned_to may reference either.
+    """
+    client = get_supabase_client()
+    return {row['id'] for row in client.table("managers").select("id").execute().data}
+
+def get_manager_workload():
+    """
+    Active managers with their skill group, expertise and open-ticket count, uncached.
+    Feeds the in-memory load index in manager_workload.py.
+    """
+    client = get_supabase_client()
+    response = client.table("manager_open_ticket_counts") \
+        .select("manager_id, name, role, department, skill_group, expertise, open_tickets").execute()
+    return response.data
+
+@cached("daily_ticket_volume", ttl=300)
+def get_daily_ticket_volume(days=30):
+    client = get_supabase_client()
+    since = (datetime.now() - timedelta(days=days)).date().isoformat()
+    response = client.table("ticket_daily_volume").select("day, created, resolved").gte("day", since).order("day").execute()
+    return pd.DataFrame(response.data, columns=["day", "created", "resolved"])
+
+@cached("active_manager_count", ttl=300)
+def count_active_managers():
+    client = get_supabase_client()
+    response = client.table("managers").select("id", count="exact", head=True).eq("is_active", True).execute()
+    return response.count or 0
@@ -0,0 +1,127 @@
+import os
+import re
+import time
+import zlib
+import random
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.7"))
+DEDUP_TTL_SECONDS = int(os.getenv("DEDUP_TTL_SECONDS", "1800"))
+DEDUP_MAX_ENTRIES = int(os.getenv("DEDUP_MAX_ENTRIES", "1000"))
+
+NUM_PERMUTATIONS = 64
+SHINGLE_SIZE = 4
+_PRIME = (1 << 61) - 1
+
+_rng = random.Random(1337)
+_HASH_PARAMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERMUTATIONS)]
+
+
+def normalize(title, description):
+    text = f"{title} {description}".lower().replace("'", "")
+    text = re.sub(r"[^a-z0-9 ]+", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def minhash(text):
+    """
+    MinHash signature over character shingles; the fraction of equal slots
+    between two signatures estimates their Jaccard similarity.
+    """
+    if len(text) < SHINGLE_SIZE:
+        shingles = {text}
+    else:
+        shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    hashes = [zlib.crc32(s.encode()) for s in shingles]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _HASH_PARAMS)
+
+
+def similarity(sig_a, sig_b):
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / NUM_PERMUTATIONS
+
+
+class SimilarityCache:
+    """
+    Recently classified tickets keyed by ticket_id, with TTL expiry and LRU
+    eviction. Lookups return the closest entry above the threshold.
+    """
+
+    def __init__(self, threshold=DEDUP_THRESHOLD, ttl=DEDUP_TTL_SECONDS, max_entries=DEDUP_MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expire(self, now):
+        expired = [k for k, (_, _, stored_at) in self._entries.items() if now - stored_at > self.ttl]
+        for ticket_id in expired:
+            del self._entries[ticket_id]
+        self.evictions += len(expired)
+
+    def lookup(self, title, description):
+        """
+        Returns (ticket_id, assignment, score) for the most similar cached ticket,
+        or None.
+        """
+        signature = minhash(normalize(title, description))
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            best = None
+            for ticket_id, (cached_sig, assignment, _) in self._entries.items():
+                score = similarity(signature, cached_sig)
+                if score >= self.threshold and (best is None or score > best[2]):
+                    best = (ticket_id, assignment, score)
+            if best is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best[0])
+            self.hits += 1
+            return best
+
+    def store(self, ticket_id, title, description, assignment):
+        signature = minhash(normalize(title, description))
+        with self._lock:
+            self._entries[ticket_id] = (signature, dict(assignment), time.time())
+            self._entries.move_to_end(ticket_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_cache = SimilarityCache()
+
+
+def find_similar(title, description):
+    if not DEDUP_ENABLED:
+        return None
+    return _cache.lookup(title, description)
+
+
+def remember(ticket_id, title, description, assignment):
+    if DEDUP_ENABLED:
+        _cache.store(ticket_id, title, description, assignment)
+
+
+def get_dedup_stats():
+    return _cache.stats()
@@ -2,57 +2,448 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from string import Template
 from dotenv import load_dotenv
+import metrics
 
 load_dotenv()
 
-def send_resolution_email(user_email, ticket_id, ticket_title, resolution_notes):
-    """
-    Sends an email to the user when their ticket is resolved.
-    SMTP settings are pulled from .env.
-    """
-    smtp_server = os.getenv("SMTP_SERVER")
-    smtp_port = os.getenv("SMTP_PORT")
-    smtp_user = os.getenv("SMTP_USER")
-    smtp_password = os.getenv("SMTP_PASSWORD")
+SMTP_SERVER = os.getenv("SMTP_SERVER")
+SMTP_PORT = os.getenv("SMTP_PORT")
+SMTP_USER = os.getenv("SMTP_USER")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_FROM = os.getenv("SMTP_FROM") or SMTP_USER
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
 
-    if not all([smtp_server, smtp_port, smtp_user, smtp_password]):
-        print(f"⚠️ SMTP settings missing in .env. Skipping email to {user_email}")
-        print(f"DEBUG: Ticket {ticket_id} ('{ticket_title}') resolved with notes: {resolution_notes}")
-        return False
+EMAIL_OUTBOX_PATH = os.getenv("EMAIL_OUTBOX_PATH", "outbox.db")
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "50"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+EMAIL_RETRY_BACKOFF_SECONDS = float(os.getenv("EMAIL_RETRY_BACKOFF_SECONDS", "60"))
+EMAIL_LEASE_SECONDS = int(os.getenv("EMAIL_LEASE_SECONDS", "300"))
+EMAIL_POLL_INTERVAL = float(os.getenv("EMAIL_POLL_INTERVAL", "2.0"))
+# Close the SMTP session after this long without mail; most servers drop idle sessions anyway
+EMAIL_IDLE_SECONDS = float(os.getenv("EMAIL_IDLE_SECONDS", "60"))
+# Sent emails are deleted after this many days; dead ones are kept for inspection
+EMAIL_RETENTION_DAYS = float(os.getenv("EMAIL_RETENTION_DAYS", "7"))
+EMAIL_PURGE_INTERVAL = 3600
 
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = smtp_user
-        msg['To'] = user_email
-        msg['Subject'] = f"Ticket Resolved: {ticket_id} - {ticket_title}"
+SMTP_SEND_SECONDS = metrics.histogram("smtp_send_seconds", "SMTP send latency, including reconnects")
+EMAILS_PROCESSED = metrics.counter("emails_total", "Outbox deliveries by outcome (sent, retry, dead)", ("outcome",))
 
-        body = f"""
+TEMPLATES = {
+    "ticket_resolved": (
+        "Ticket Resolved: $ticket_id - $ticket_title",
+        """
         Hello,
 
         Your support ticket has been resolved.
 
-        Ticket ID: {ticket_id}
-        Title: {ticket_title}
-        
+        Ticket ID: $ticket_id
+        Title: $ticket_title
+
         Resolution Details:
-        {resolution_notes}
+        $resolution_notes
 
         Thank you for your patience!
 
         Best Regards,
         Trugen Support Team
+        """,
+    ),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ticket_id TEXT,
+    recipient TEXT NOT NULL,
+    template TEXT NOT NULL,
+    context TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires_at REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_claim_idx ON outbox (status, available_at);
+"""
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+def smtp_configured():
+    return bool(SMTP_SERVER and SMTP_PORT)
+
+
+def render_email(template, context):
+    """
+    Returns (subject, body) for a template in TEMPLATES.
+    """
+    subject, body = TEMPLATES[template]
+    return Template(subject).safe_substitute(context), Template(body).safe_substitute(context)
+
+
+def build_message(recipient, template, context, sender=None):
+    subject, body = render_email(template, context)
+    msg = MIMEMultipart()
+    msg['From'] = sender or SMTP_FROM or "support@localhost"
+    msg['To'] = recipient
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'plain'))
+    return msg
+
+
+class SMTPSender:
+    """
+    Keeps one authenticated SMTP session open and reuses it for every message,
+    reconnecting when the server has dropped it.
+    """
+
+    def __init__(self, host=None, port=None, user=None, password=None, starttls=SMTP_STARTTLS, timeout=SMTP_TIMEOUT):
+        self.host = host or SMTP_SERVER
+        self.port = int(port or SMTP_PORT)
+        self.user = user if user is not None else SMTP_USER
+        self.password = password if password is not None else SMTP_PASSWORD
+        self.starttls = starttls
+        self.timeout = timeout
+        self._server = None
+        self.last_used = 0.0
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            server.starttls()
+        if self.user and self.password:
+            server.login(self.user, self.password)
+        return server
+
+    @metrics.timed(SMTP_SEND_SECONDS)
+    def send(self, msg):
+        for attempt in (1, 2):
+            if self._server is None:
+                self._server = self._connect()
+            try:
+                self._server.send_message(msg)
+                self.last_used = time.monotonic()
+                return
+            except smtplib.SMTPServerDisconnected:
+                # Idle sessions time out server-side; reconnect once and retry
+                self._server = None
+                if attempt == 2:
+                    raise
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._server = None
+
+
+def _connect():
+    global _schema_ready
+    conn = sqlite3.connect(EMAIL_OUTBOX_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    if not _schema_ready:
+        with _schema_lock:
+            if not _schema_ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                _schema_ready = True
+    return conn
+
+
+def queue_email(recipient, template, context, ticket_id=None):
+    """
+    Persists an email in the outbox for the background sender. Returns the outbox id.
+    """
+    if template not in TEMPLATES:
+        raise ValueError(f"Unknown email template '{template}'")
+    now = time.time()
+    conn = _connect()
+    try:
+        cursor = conn.execute(
+            "INSERT INTO outbox (ticket_id, recipient, template, context, available_at, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (ticket_id, recipient, template, json.dumps(context), now, now, now),
+        )
+        return cursor.lastrowid
+    finally:
+        conn.close()
+
+
+def queue_resolution_email(user_email, ticket_id, ticket_title, resolution_notes):
+    """
+    Queues the "ticket resolved" notification; delivery happens in the background.
+    """
+    if not smtp_configured():
+        print(f"⚠️ SMTP settings missing in .env. Skipping email to {user_email}")
+        print(f"DEBUG: Ticket {ticket_id} ('{ticket_title}') resolved with notes: {resolution_notes}")
+        return None
+    return queue_email(user_email, "ticket_resolved", {
+        "ticket_id": ticket_id, "ticket_title": ticket_title, "resolution_notes": resolution_notes,
+    }, ticket_id=ticket_id)
+
+
+def claim_emails(worker_id, limit=EMAIL_BATCH_SIZE):
+    """
+    Leases up to `limit` due emails (queued, or leased with an expired lease).
+    """
+    now = time.time()
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        rows = conn.execute(
+            "SELECT id, ticket_id, recipient, template, context, attempts FROM outbox "
+            "WHERE (status = 'queued' AND available_at <= ?) "
+            "   OR (status = 'leased' AND lease_expires_at < ?) "
+            "ORDER BY id LIMIT ?",
+            (now, now, limit),
+        ).fetchall()
+        conn.executemany(
+            "UPDATE outbox SET status = 'leased', attempts = attempts + 1, lease_owner = ?, "
+            "lease_expires_at = ?, updated_at = ? WHERE id = ?",
+            [(worker_id, now + EMAIL_LEASE_SECONDS, now, row["id"]) for row in rows],
+        )
+        conn.execute("COMMIT")
+        return [dict(row, context=json.loads(row["context"]), attempts=row["attempts"] + 1) for row in rows]
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def renew_leases(worker_id, email_ids):
+    """
+    Extends this worker's lease on emails it is still holding, so a slow batch does
+    not expire and get sent twice. Returns the ids whose lease was renewed.
+    """
+    if not email_ids:
+        return set()
+    now = time.time()
+    placeholders = ", ".join("?" * len(email_ids))
+    conn = _connect()
+    try:
+        conn.execute(
+            f"UPDATE outbox SET lease_expires_at = ?, updated_at = ? "
+            f"WHERE status = 'leased' AND lease_owner = ? AND id IN ({placeholders})",
+            (now + EMAIL_LEASE_SECONDS, now, worker_id, *email_ids),
+        )
+        rows = conn.execute(
+            f"SELECT id FROM outbox WHERE status = 'leased' AND lease_owner = ? AND id IN ({placeholders})",
+            (worker_id, *email_ids),
+        ).fetchall()
+        return {row["id"] for row in rows}
+    finally:
+        conn.close()
+
+
+def mark_sent(email_id):
+    conn = _connect()
+    try:
+        conn.execute(
+            "UPDATE outbox SET status = 'sent', lease_owner = NULL, lease_expires_at = NULL, "
+            "updated_at = ? WHERE id = ?",
+            (time.time(), email_id),
+        )
+    finally:
+        conn.close()
+
+
+def is_permanent_failure(error):
+    """
+    True for 5xx replies about the message or its recipient (e.g. 550 no such
+    mailbox), which will fail the same way on every retry. Authentication errors
+    are left to retry, since they are fixed in configuration, not per message.
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return False
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+def mark_failed(email_id, attempts, error, permanent=False):
+    """
+    Schedules a retry with exponential backoff, or dead-letters the email once
+    EMAIL_MAX_ATTEMPTS is reached or the failure is permanent. Returns True if dead-lettered.
+    """
+    now = time.time()
+    dead = permanent or attempts >= EMAIL_MAX_ATTEMPTS
+    conn = _connect()
+    try:
+        conn.execute(
+            "UPDATE outbox SET status = ?, lease_owner = NULL, lease_expires_at = NULL, "
+            "available_at = ?, last_error = ?, updated_at = ? WHERE id = ?",
+            ("dead" if dead else "queued", now + EMAIL_RETRY_BACKOFF_SECONDS * (2 ** (attempts - 1)),
+             error, now, email_id),
+        )
+        return dead
+    finally:
+        conn.close()
+
+
+def purge_sent(retention_days=EMAIL_RETENTION_DAYS):
+    """
+    Deletes sent emails older than the retention period. Returns how many were deleted.
+    """
+    conn = _connect()
+    try:
+        cursor = conn.execute(
+            "DELETE FROM outbox WHERE status = 'sent' AND updated_at < ?",
+            (time.time() - retention_days * 86400,),
+        )
+        return cursor.rowcount
+    finally:
+        conn.close()
+
+
+def get_outbox_stats():
+    conn = _connect()
+    try:
+        rows = conn.execute("SELECT status, COUNT(*) AS n FROM outbox GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+    finally:
+        conn.close()
+
+
+metrics.gauge("email_outbox_messages", "Outbox emails by status", ("status",), collect=get_outbox_stats)
+
+
+class EmailSender:
+    """
+    Background thread draining the outbox over a single reused SMTP session.
+    """
+
+    def __init__(self, smtp=None, batch_size=EMAIL_BATCH_SIZE, poll_interval=EMAIL_POLL_INTERVAL, log=None):
+        self.smtp = smtp or SMTPSender()
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.log = log
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._thread = None
+        self._purged_at = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="email-sender", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _log(self, ticket_id, action, details):
+        if self.log and ticket_id:
+            try:
+                self.log(ticket_id, action, details)
+            except Exception as e:
+                print(f"⚠️ Failed to log email delivery for {ticket_id}: {e}")
+
+    def send_batch(self):
+        """
+        Sends one batch of due emails. Returns how many were claimed.
         """
-        msg.attach(MIMEText(body, 'plain'))
-
-        server = smtplib.SMTP(smtp_server, int(smtp_port))
-        server.starttls()
-        server.login(smtp_user, smtp_password)
-        server.send_message(msg)
-        server.quit()
-        
+        batch = claim_emails(self.worker_id, self.batch_size)
+        for i, email in enumerate(batch):
+            # Keep the rest of the batch leased while earlier messages are slow to send
+            held = renew_leases(self.worker_id, [e["id"] for e in batch[i:]])
+            if email["id"] not in held:
+                print(f"⚠️ Lease on email {email['id']} lost to another sender; skipping.")
+                continue
+            try:
+                self.smtp.send(build_message(email["recipient"], email["template"], email["context"]))
+                mark_sent(email["id"])
+                EMAILS_PROCESSED.inc(outcome="sent")
+                self._log(email["ticket_id"], "Email Sent", f"{email['template']} sent to {email['recipient']}.")
+            except Exception as e:
+                # Drop the session so the next message starts from a clean connection
+                self.smtp.close()
+                dead = mark_failed(email["id"], email["attempts"], str(e), permanent=is_permanent_failure(e))
+                EMAILS_PROCESSED.inc(outcome="dead" if dead else "retry")
+                if dead:
+                    self._log(email["ticket_id"], "Email Failed",
+                              f"{email['template']} to {email['recipient']} failed after {email['attempts']} attempts: {e}")
+                print(f"❌ Email {email['id']} to {email['recipient']} failed (attempt {email['attempts']}): {e}")
+        return len(batch)
+
+    def _purge_if_due(self):
+        if time.monotonic() - self._purged_at < EMAIL_PURGE_INTERVAL:
+            return
+        self._purged_at = time.monotonic()
+        try:
+            purged = purge_sent()
+            if purged:
+                print(f"♻️ Purged {purged} sent emails older than {EMAIL_RETENTION_DAYS:g} days from the outbox.")
+        except Exception as e:
+            print(f"⚠️ Could not purge the email outbox: {e}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._purge_if_due()
+            try:
+                claimed = self.send_batch()
+            except Exception as e:
+                print(f"⚠️ Email sender error: {e}")
+                claimed = 0
+            if not claimed:
+                if self.smtp.last_used and time.monotonic() - self.smtp.last_used > EMAIL_IDLE_SECONDS:
+                    self.smtp.close()
+                self._stop.wait(self.poll_interval)
+        self.smtp.close()
+
+
+_sender = None
+_sender_lock = threading.Lock()
+
+
+def start_email_sender():
+    """
+    Starts the process-wide outbox sender once. Safe to call on every Streamlit rerun.
+    """
+    global _sender
+    if not smtp_configured():
+        return None
+    with _sender_lock:
+        if _sender is None:
+            from database import log_action
+            _sender = EmailSender(log=log_action)
+            _sender.start()
+        return _sender
+
+
+def send_resolution_email(user_email, ticket_id, ticket_title, resolution_notes):
+    """
+    Sends an email to the user when their ticket is resolved, immediately and
+    without the outbox. SMTP settings are pulled from .env.
+    """
+    if not smtp_configured():
+        print(f"⚠️ SMTP settings missing in .env. Skipping email to {user_email}")
+        print(f"DEBUG: Ticket {ticket_id} ('{ticket_title}') resolved with notes: {resolution_notes}")
+        return False
+
+    smtp = SMTPSender()
+    try:
+        smtp.send(build_message(user_email, "ticket_resolved", {
+            "ticket_id": ticket_id, "ticket_title": ticket_title, "resolution_notes": resolution_notes,
+        }))
         print(f"✅ Resolution email sent to {user_email}")
         return True
     except Exception as e:
         print(f"❌ Failed to send email: {str(e)}")
         return False
+    finally:
+        smtp.close()
@@ -0,0 +1,343 @@
+"""
+Local pre-classifier that assigns obvious tickets without running the crew.
+
+A keyword rules engine runs first; an optional linear model trained on past
+assignments (scikit-learn, only used when installed and trained) covers what
+the rules are unsure about. Anything not above FAST_PATH_MIN_CONFIDENCE is left
+to the agents.
+
+    uv run --extra fast-path-model python fast_path.py train
+    uv run --extra fast-path-model python fast_path.py evaluate --holdout 0.2
+"""
+import os
+import re
+import json
+import time
+import pickle
+import argparse
+import threading
+import statistics
+from dotenv import load_dotenv
+from manager_workload import get_load_index
+
+load_dotenv()
+
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+# Decisions must score strictly above this. Rules also need FAST_PATH_MIN_SIGNALS distinct keywords,
+# so a single phrase ("refund", "timeout") never skips the crew on its own.
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "0.75"))
+FAST_PATH_MIN_SIGNALS = int(os.getenv("FAST_PATH_MIN_SIGNALS", "2"))
+FAST_PATH_RULES_PATH = os.getenv("FAST_PATH_RULES_PATH")  # JSON list shaped like DEFAULT_RULES
+FAST_PATH_MODEL_PATH = os.getenv("FAST_PATH_MODEL_PATH", "fast_path_model.pkl")
+
+# Keyword weights: 2 for strong phrases, 1 for supporting hints. Rules route to a skill group
+# (managers.skill_group); the manager is picked from the live roster (manager_workload.py).
+DEFAULT_RULES = [
+    {
+        "name": "payments", "category": "Payments", "severity": "P1", "priority": "High", "skill_group": "support",
+        "keywords": {"payment failed": 2, "charged twice": 2, "double charged": 2, "refund": 2,
+                     "billing": 1, "invoice": 1, "payment": 1, "charged": 1, "subscription": 1},
+    },
+    {
+        "name": "access", "category": "Access", "severity": "P2", "priority": "Medium", "skill_group": "security",
+        "keywords": {"password reset": 2, "reset password": 2, "forgot password": 2, "locked out": 2,
+                     "cant log in": 2, "cannot log in": 2, "cant login": 2, "2fa": 1, "otp": 1,
+                     "password": 1, "login": 1, "account locked": 2},
+    },
+    {
+        "name": "security", "category": "Access", "severity": "P0", "priority": "High", "skill_group": "security",
+        "keywords": {"hacked": 2, "data breach": 2, "unauthorized access": 2, "someone else logged": 2,
+                     "privacy": 1, "leaked": 1},
+    },
+    {
+        "name": "infrastructure", "category": "Infrastructure", "severity": "P1", "priority": "High", "skill_group": "sre",
+        "keywords": {"video buffering": 2, "server error": 2, "timeout": 2, "timed out": 2, "outage": 2,
+                     "site is down": 2, "502": 2, "503": 2, "buffering": 1, "slow loading": 1, "slow": 1,
+                     "cdn": 1, "playback": 1},
+    },
+    {
+        "name": "backend", "category": "Technical", "severity": "P1", "priority": "Medium", "skill_group": "backend",
+        "keywords": {"not saving": 2, "data not saved": 2, "incorrect calculation": 2, "wrong total": 2,
+                     "api error": 2, "500 error": 2, "database": 1, "sync": 1, "missing data": 1},
+    },
+    {
+        "name": "ui", "category": "Technical", "severity": "P2", "priority": "Low", "skill_group": "qa",
+        "keywords": {"button not working": 2, "layout broken": 2, "typo": 2, "display issue": 2,
+                     "ui": 1, "button": 1, "dark mode": 1, "alignment": 1},
+    },
+]
+
+
+def normalize(text):
+    return re.sub(r"\s+", " ", re.sub(r"['’]", "", (text or "").lower())).strip()
+
+
+class RuleEngine:
+    """
+    Scores every rule by the summed weight of its keywords found in the ticket.
+    Confidence grows with the winning score and shrinks when other rules also match.
+    A keyword found only as part of a longer matched one ("payment" in
+    "payment failed") is not counted separately.
+    """
+
+    def __init__(self, rules, min_signals=FAST_PATH_MIN_SIGNALS):
+        self.min_signals = min_signals
+        self.rules = []
+        for rule in rules:
+            patterns = [(k, re.compile(r"\b" + re.escape(normalize(k)) + r"\b"), w) for k, w in rule["keywords"].items()]
+            self.rules.append((rule, patterns))
+
+    def score(self, title, description):
+        text = normalize(f"{title} {description}")
+        scores = []
+        for rule, patterns in self.rules:
+            hits = [(k, w) for k, p, w in patterns if p.search(text)]
+            hits = [(k, w) for k, w in hits if not any(k != other and normalize(k) in normalize(other) for other, _ in hits)]
+            scores.append((sum(w for _, w in hits), rule, hits))
+        return sorted(scores, key=lambda s: s[0], reverse=True)
+
+    def classify(self, title, description):
+        scores = self.score(title, description)
+        if not scores or not scores[0][0]:
+            return None
+        best, rule, hits = scores[0]
+        if len(hits) < self.min_signals:
+            return None
+        manager_id = rule.get("manager_id") or get_load_index().least_loaded(rule["skill_group"])
+        if manager_id is None:
+            return None
+        runner_up = scores[1][0] if len(scores) > 1 else 0
+        confidence = (1 - 0.5 ** best) * best / (best + runner_up)
+        keywords = ", ".join(k for k, _ in hits)
+        return {
+            "category": rule["category"],
+            "severity": rule["severity"],
+            "priority": rule["priority"],
+            "manager_id": manager_id,
+            "skill_group": rule.get("skill_group"),
+            "reason": f"Fast-path rule '{rule['name']}' matched: {keywords}.",
+            "confidence": round(confidence, 3),
+            "source": "rules",
+        }
+
+
+class LinearRoutingModel:
+    """
+    Two TF-IDF + logistic regression heads trained on past assignments: one
+    predicts category and manager, the other severity and priority.
+    """
+
+    def __init__(self, route=None, grade=None):
+        from sklearn.pipeline import make_pipeline
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        def head():
+            return make_pipeline(
+                TfidfVectorizer(analyzer="char_wb", ngram_range=(3, 5), min_df=2, sublinear_tf=True),
+                LogisticRegression(max_iter=1000, class_weight="balanced"),
+            )
+
+        self.route = route or head()
+        self.grade = grade or head()
+
+    def fit(self, history):
+        texts = [normalize(f"{t} {d}") for t, d in zip(history["title"], history["description"])]
+        self.route.fit(texts, [f"{c}|{int(m)}" for c, m in zip(history["category"], history["assigned_to"])])
+        self.grade.fit(texts, [f"{s}|{p}" for s, p in zip(history["severity"], history["priority"])])
+        return self
+
+    def classify(self, title, description):
+        text = [normalize(f"{title} {description}")]
+        route_proba = self.route.predict_proba(text)[0]
+        grade_proba = self.grade.predict_proba(text)[0]
+        route_idx, grade_idx = route_proba.argmax(), grade_proba.argmax()
+        category, manager_id = self.route.classes_[route_idx].rsplit("|", 1)
+        severity, priority = self.grade.classes_[grade_idx].split("|", 1)
+        confidence = float(min(route_proba[route_idx], grade_proba[grade_idx]))
+        return {
+            "category": category,
+            "severity": severity,
+            "priority": priority,
+            "manager_id": int(manager_id),
+            "reason": f"Fast-path model routed this like similar past {category} tickets.",
+            "confidence": round(confidence, 3),
+            "source": "model",
+        }
+
+
+def load_rules(path=FAST_PATH_RULES_PATH):
+    if not path:
+        return DEFAULT_RULES
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def train_model(history, path=FAST_PATH_MODEL_PATH):
+    """
+    Fits the linear model on a get_assignment_history() frame and saves it to `path`.
+    """
+    history = history.dropna(subset=["category", "severity", "priority", "assigned_to"])
+    model = LinearRoutingModel().fit(history)
+    if path:
+        with open(path, "wb") as f:
+            # Only the sklearn pipelines are pickled, so the file loads whether this ran as a script or a module
+            pickle.dump({"route": model.route, "grade": model.grade}, f)
+    return model
+
+
+def load_model(path=FAST_PATH_MODEL_PATH):
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            return LinearRoutingModel(**pickle.load(f))
+    except ImportError:
+        print("⚠️ scikit-learn is not installed; the fast-path model is disabled (rules only).")
+    except Exception as e:
+        print(f"⚠️ Could not load fast-path model from {path}: {e}")
+    return None
+
+
+class FastPathClassifier:
+    def __init__(self, rules=None, model=None, min_confidence=FAST_PATH_MIN_CONFIDENCE):
+        self.rules = RuleEngine(rules if rules is not None else load_rules())
+        self.model = model
+        self.min_confidence = min_confidence
+
+    def candidates(self, title, description):
+        decision = self.rules.classify(title, description)
+        if decision:
+            yield decision
+        if self.model is not None:
+            yield self.model.classify(title, description)
+
+    def classify(self, title, description):
+        """
+        Returns a confident assignment dict, or None to escalate to the crew.
+        """
+        for decision in self.candidates(title, description):
+            if decision["confidence"] > self.min_confidence:
+                return decision
+        return None
+
+
+_classifier = None
+_classifier_lock = threading.Lock()
+
+
+def get_classifier():
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = FastPathClassifier(model=load_model())
+    return _classifier
+
+
+def classify(title, description):
+    if not FAST_PATH_ENABLED:
+        return None
+    return get_classifier().classify(title, description)
+
+
+def evaluate(classifier, history, skill_groups):
+    """
+    Replays historical tickets through the classifier. A decision is correct when
+    it routes to the skill group of the historical assignee (`skill_groups` maps
+    manager id to group); which manager in the group the rules pick depends on the
+    current load, so comparing manager ids would not measure the rules. Precision
+    is measured on the tickets it chose to assign; recall counts escalated tickets as misses.
+    """
+    latencies = []
+    per_group = {}
+    covered = correct = 0
+    for row in history.itertuples():
+        start = time.perf_counter()
+        decision = classifier.classify(row.title, row.description)
+        latencies.append((time.perf_counter() - start) * 1e6)
+
+        actual = skill_groups.get(int(row.assigned_to))
+        per_group.setdefault(actual, {"actual": 0, "predicted": 0, "correct": 0})["actual"] += 1
+        if decision is None:
+            continue
+        covered += 1
+        predicted = decision.get("skill_group") or skill_groups.get(decision["manager_id"])
+        per_group.setdefault(predicted, {"actual": 0, "predicted": 0, "correct": 0})["predicted"] += 1
+        if predicted == actual:
+            correct += 1
+            per_group[actual]["correct"] += 1
+
+    total = len(history)
+    latencies.sort()
+    return {
+        "tickets": total,
+        "coverage": covered / total if total else 0.0,
+        "precision": correct / covered if covered else 0.0,
+        "recall": correct / total if total else 0.0,
+        "latency_p50_us": statistics.median(latencies) if latencies else 0.0,
+        "latency_p95_us": latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+        "per_skill_group": {
+            g: {
+                "precision": c["correct"] / c["predicted"] if c["predicted"] else 0.0,
+                "recall": c["correct"] / c["actual"] if c["actual"] else 0.0,
+                "support": c["actual"],
+            }
+            for g, c in sorted(per_group.items(), key=lambda item: str(item[0]))
+        },
+    }
+
+
+def _print_report(label, report):
+    print(f"\n== {label} ==")
+    print(f"tickets {report['tickets']}  coverage {report['coverage']:.1%}  "
+          f"precision {report['precision']:.1%}  recall {report['recall']:.1%}  "
+          f"latency p50 {report['latency_p50_us']:.0f}us p95 {report['latency_p95_us']:.0f}us")
+    for group, g in report["per_skill_group"].items():
+        print(f"  {group or 'unknown'}: precision {g['precision']:.1%}  recall {g['recall']:.1%}  (n={g['support']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or evaluate the fast-path ticket classifier.")
+    parser.add_argument("command", choices=["train", "evaluate"])
+    parser.add_argument("--limit", type=int, default=5000, help="Historical tickets to load")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Newest fraction kept out of model training")
+    parser.add_argument("--min-confidence", type=float, default=FAST_PATH_MIN_CONFIDENCE)
+    args = parser.parse_args()
+
+    from database import get_assignment_history, get_manager_skill_groups
+
+    history = get_assignment_history(limit=args.limit).dropna(
+        subset=["category", "severity", "priority", "assigned_to"])
+    if history.empty:
+        print("❌ No assigned tickets to learn from yet.")
+        return
+
+    if args.command == "train":
+        train_model(history)
+        print(f"✅ Trained fast-path model on {len(history)} tickets -> {FAST_PATH_MODEL_PATH}")
+        return
+
+    # History is newest first, so the holdout is the most recent tickets.
+    # Includes deactivated managers, who still appear as historical assignees.
+    skill_groups = get_manager_skill_groups()
+    split = int(len(history) * args.holdout)
+    test, train = history.iloc[:split], history.iloc[split:]
+    _print_report("rules", evaluate(FastPathClassifier(model=None, min_confidence=args.min_confidence),
+                                    test, skill_groups))
+    try:
+        model = train_model(train, path=None)
+    except ImportError:
+        print("\n⚠️ scikit-learn is not installed; skipping the model evaluation.")
+        return
+    except ValueError as e:
+        print(f"\n⚠️ Not enough history to train the model: {e}")
+        return
+    _print_report("model", evaluate(FastPathClassifier(rules=[], model=model, min_confidence=args.min_confidence),
+                                    test, skill_groups))
+    _print_report("rules + model", evaluate(FastPathClassifier(model=model, min_confidence=args.min_confidence),
+                                            test, skill_groups))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,505 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from dotenv import load_dotenv
+import metrics
+from triage_priority import LANES, prioritize
+
+load_dotenv()
+
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "jobs.db")
+WORKER_POOL_SIZE = int(os.getenv("WORKER_POOL_SIZE", "4"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BACKOFF_SECONDS = float(os.getenv("JOB_RETRY_BACKOFF_SECONDS", "30"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+# Waiting this long raises a job's priority by one point, so low-priority tickets are not starved
+JOB_AGING_SECONDS = float(os.getenv("JOB_AGING_SECONDS", "120"))
+# Max workers per lane, e.g. "normal:3,low:1"; unset lanes use the defaults from parse_lane_limits().
+# Normal and low together never get more than WORKER_POOL_SIZE - 1 workers (see non_high_capacity()).
+JOB_LANE_LIMITS = os.getenv("JOB_LANE_LIMITS", "")
+# Finished jobs are deleted after this many days; failed ones are kept so recovery does not retry them
+JOB_RETENTION_DAYS = float(os.getenv("JOB_RETENTION_DAYS", "7"))
+JOB_PURGE_INTERVAL = 3600
+
+JOB_WAIT_SECONDS = metrics.histogram(
+    "job_queue_wait_seconds", "Time from queueing (or retry) until a worker picks the job up", ("lane",),
+    buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ticket_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    lane TEXT NOT NULL DEFAULT 'normal',
+    priority REAL NOT NULL DEFAULT 0,
+    claim_rank REAL NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires_at REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim_idx ON jobs (status, available_at);
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_active_ticket_idx
+    ON jobs (ticket_id) WHERE status IN ('queued', 'leased');
+"""
+
+# Columns added after the first release, for queue files created by older versions
+_ADDED_COLUMNS = {
+    "lane": "TEXT NOT NULL DEFAULT 'normal'",
+    "priority": "REAL NOT NULL DEFAULT 0",
+    "claim_rank": "REAL NOT NULL DEFAULT 0",
+}
+
+# Needs claim_rank, so it is created after the columns are added
+_RANK_INDEX = "CREATE INDEX IF NOT EXISTS jobs_rank_idx ON jobs (status, claim_rank DESC, id)"
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+def parse_lane_limits(pool_size=WORKER_POOL_SIZE, spec=JOB_LANE_LIMITS):
+    """
+    Per-lane worker limits. By default high can use every worker, normal all
+    but one and low a quarter. These are per-lane caps only; the pool also
+    caps normal + low combined (see non_high_capacity()).
+    """
+    limits = {"high": pool_size, "normal": max(1, pool_size - 1), "low": max(1, pool_size // 4)}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        lane, _, limit = part.partition(":")
+        if lane.strip() not in limits:
+            raise ValueError(f"Unknown lane '{lane}' in JOB_LANE_LIMITS. Expected one of {LANES}.")
+        limits[lane.strip()] = int(limit)
+    return limits
+
+
+def non_high_capacity(pool_size):
+    """
+    Workers normal and low lane jobs may hold between them. One worker is kept
+    for the high lane so a P0 never waits behind background work; a single-worker
+    pool cannot reserve one.
+    """
+    return max(1, pool_size - 1)
+
+
+def claim_rank(priority, created_at):
+    """
+    Claim order for a job. The aged priority, priority + (now - created_at) / JOB_AGING_SECONDS,
+    differs from this by now / JOB_AGING_SECONDS, which is the same for every row, so
+    ordering by the stored rank gives the same order and can use an index.
+    """
+    return priority - created_at / JOB_AGING_SECONDS
+
+
+def _connect():
+    global _schema_ready
+    conn = sqlite3.connect(JOB_QUEUE_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    if not _schema_ready:
+        with _schema_lock:
+            if not _schema_ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                existing = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+                for column, definition in _ADDED_COLUMNS.items():
+                    if column not in existing:
+                        conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+                if "claim_rank" not in existing:
+                    conn.execute("UPDATE jobs SET claim_rank = priority - created_at / ?", (JOB_AGING_SECONDS,))
+                conn.execute(_RANK_INDEX)
+                _schema_ready = True
+    return conn
+
+
+def enqueue_ticket(ticket_data):
+    """
+    Queues a ticket for AI analysis in the lane picked by its pre-score.
+    Returns False if the ticket already has a queued or running job.
+    """
+    lane, score = prioritize([ticket_data])[0]
+    now = time.time()
+    conn = _connect()
+    try:
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO jobs (ticket_id, payload, lane, priority, claim_rank, available_at, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (ticket_data["ticket_id"], json.dumps(ticket_data), lane, score, claim_rank(score, now), now, now, now),
+        )
+        return cursor.rowcount == 1
+    finally:
+        conn.close()
+
+
+def enqueue_tickets(tickets):
+    """
+    Queues many tickets in one transaction. Returns how many were newly queued.
+    """
+    priorities = prioritize(tickets)
+    now = time.time()
+    conn = _connect()
+    try:
+        conn.execute("BEGIN")
+        before = conn.total_changes
+        conn.executemany(
+            "INSERT OR IGNORE INTO jobs (ticket_id, payload, lane, priority, claim_rank, available_at, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(t["ticket_id"], json.dumps(t), lane, score, claim_rank(score, now), now, now, now)
+             for t, (lane, score) in zip(tickets, priorities)],
+        )
+        conn.execute("COMMIT")
+        return conn.total_changes - before
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def _dead_letter_expired(conn, now):
+    """
+    Marks jobs whose lease expired on their last allowed attempt as 'failed',
+    e.g. because the worker crashed on the ticket every time. Returns their
+    (ticket_id, attempts).
+    """
+    rows = conn.execute(
+        "SELECT id, ticket_id, attempts FROM jobs "
+        "WHERE status = 'leased' AND lease_expires_at < ? AND attempts >= ?",
+        (now, JOB_MAX_ATTEMPTS),
+    ).fetchall()
+    conn.executemany(
+        "UPDATE jobs SET status = 'failed', lease_owner = NULL, lease_expires_at = NULL, "
+        "last_error = 'Lease expired on the final attempt', updated_at = ? WHERE id = ?",
+        [(now, row["id"]) for row in rows],
+    )
+    return [(row["ticket_id"], row["attempts"]) for row in rows]
+
+
+def claim_job(worker_id, lanes=LANES):
+    """
+    Leases the runnable job (queued, or leased with an expired lease) with the
+    highest priority, aged by time waiting, from the given lanes. Jobs whose
+    lease expired on their last attempt are dead-lettered instead of re-run.
+    Returns (job_id, ticket_data, attempts, lane) or None.
+    """
+    if not lanes:
+        return None
+    now = time.time()
+    lane_filter = f"lane IN ({', '.join('?' * len(lanes))})"
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        dead = _dead_letter_expired(conn, now)
+        # Best queued job and best expired lease, then the better of the two. The planner would
+        # otherwise pick jobs_claim_idx, which matches every due job and needs a sort.
+        row = conn.execute(
+            "SELECT * FROM ("
+            "  SELECT id, payload, attempts, lane, created_at, available_at, claim_rank FROM jobs INDEXED BY jobs_rank_idx "
+            f" WHERE status = 'queued' AND {lane_filter} AND available_at <= ? "
+            "  ORDER BY claim_rank DESC, id LIMIT 1) "
+            "UNION ALL SELECT * FROM ("
+            "  SELECT id, payload, attempts, lane, created_at, available_at, claim_rank FROM jobs "
+            f" WHERE status = 'leased' AND {lane_filter} AND lease_expires_at < ? "
+            "  ORDER BY claim_rank DESC, id LIMIT 1) "
+            "ORDER BY claim_rank DESC, id LIMIT 1",
+            (*lanes, now, *lanes, now),
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            _log_dead_lettered(dead)
+            return None
+        attempts = row["attempts"] + 1
+        conn.execute(
+            "UPDATE jobs SET status = 'leased', attempts = ?, lease_owner = ?, "
+            "lease_expires_at = ?, updated_at = ? WHERE id = ?",
+            (attempts, worker_id, now + JOB_LEASE_SECONDS, now, row["id"]),
+        )
+        conn.execute("COMMIT")
+        _log_dead_lettered(dead)
+        JOB_WAIT_SECONDS.observe(now - (row["created_at"] if attempts == 1 else row["available_at"]), lane=row["lane"])
+        return row["id"], json.loads(row["payload"]), attempts, row["lane"]
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def _log_dead_lettered(dead):
+    if not dead:
+        return
+    from database import log_action
+
+    for ticket_id, attempts in dead:
+        print(f"❌ Job for {ticket_id} dead-lettered: lease expired on attempt {attempts}.")
+        try:
+            log_action(ticket_id, "AI Analysis Error",
+                       f"Analysis abandoned after {attempts} attempts: the worker stopped responding each time.")
+        except Exception as e:
+            print(f"⚠️ Failed to log dead-lettered job for {ticket_id}: {e}")
+
+
+def renew_leases(job_ids, worker_id):
+    if not job_ids:
+        return
+    now = time.time()
+    conn = _connect()
+    try:
+        conn.executemany(
+            "UPDATE jobs SET lease_expires_at = ?, updated_at = ? "
+            "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+            [(now + JOB_LEASE_SECONDS, now, job_id, worker_id) for job_id in job_ids],
+        )
+    finally:
+        conn.close()
+
+
+def complete_job(job_id, worker_id):
+    """
+    Marks the job done if this worker still holds its lease. Returns False if
+    the lease expired and another worker has reclaimed the job.
+    """
+    conn = _connect()
+    try:
+        cursor = conn.execute(
+            "UPDATE jobs SET status = 'done', lease_owner = NULL, lease_expires_at = NULL, "
+            "updated_at = ? WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+            (time.time(), job_id, worker_id),
+        )
+        return cursor.rowcount == 1
+    finally:
+        conn.close()
+
+
+def fail_job(job_id, worker_id, attempts, error):
+    """
+    Puts a failed job back on the queue with exponential backoff, or marks it
+    as 'failed' once JOB_MAX_ATTEMPTS is reached. Returns True if dead-lettered,
+    False if queued for retry and None if this worker no longer holds the lease.
+    """
+    now = time.time()
+    dead = attempts >= JOB_MAX_ATTEMPTS
+    conn = _connect()
+    try:
+        if dead:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'failed', lease_owner = NULL, lease_expires_at = NULL, "
+                "last_error = ?, updated_at = ? WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (error, now, job_id, worker_id),
+            )
+        else:
+            delay = JOB_RETRY_BACKOFF_SECONDS * (2 ** (attempts - 1))
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued', lease_owner = NULL, lease_expires_at = NULL, "
+                "available_at = ?, last_error = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (now + delay, error, now, job_id, worker_id),
+            )
+        return dead if cursor.rowcount == 1 else None
+    finally:
+        conn.close()
+
+
+def purge_finished_jobs(retention_days=JOB_RETENTION_DAYS):
+    """
+    Deletes done jobs older than the retention period. Returns how many were deleted.
+    """
+    conn = _connect()
+    try:
+        cursor = conn.execute(
+            "DELETE FROM jobs WHERE status = 'done' AND updated_at < ?",
+            (time.time() - retention_days * 86400,),
+        )
+        return cursor.rowcount
+    finally:
+        conn.close()
+
+
+def get_queue_stats():
+    conn = _connect()
+    try:
+        rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+    finally:
+        conn.close()
+
+
+def get_lane_depths():
+    conn = _connect()
+    try:
+        rows = conn.execute("SELECT lane, COUNT(*) AS n FROM jobs WHERE status = 'queued' GROUP BY lane").fetchall()
+        return {row["lane"]: row["n"] for row in rows}
+    finally:
+        conn.close()
+
+
+metrics.gauge("job_queue_jobs", "Triage jobs by status (queued = queue depth)", ("status",), collect=get_queue_stats)
+metrics.gauge("job_queue_lane_depth", "Queued triage jobs per priority lane", ("lane",), collect=get_lane_depths)
+
+
+def _has_local_job(ticket_id):
+    conn = _connect()
+    try:
+        row = conn.execute(
+            "SELECT 1 FROM jobs WHERE ticket_id = ? AND status IN ('queued', 'leased', 'failed') LIMIT 1",
+            (ticket_id,),
+        ).fetchone()
+        return row is not None
+    finally:
+        conn.close()
+
+
+def recover_stalled_tickets():
+    """
+    Re-enqueues tickets that are still 'Open' with an "AI Analysis Started"
+    log but no "AI Analysis Completed" log, e.g. because the process that was
+    analyzing them was restarted.
+    """
+    from database import get_stalled_tickets, log_action
+
+    recovered = 0
+    for ticket in get_stalled_tickets():
+        if _has_local_job(ticket["ticket_id"]):
+            continue
+        if enqueue_ticket(ticket):
+            log_action(ticket["ticket_id"], "AI Analysis Requeued", "Recovered after an interrupted analysis.")
+            recovered += 1
+    return recovered
+
+
+class WorkerPool:
+    """
+    Fixed-size pool of daemon threads pulling jobs from the persistent queue,
+    highest priority first, with at most lane_limits[lane] workers per lane
+    and at most non_high_capacity(size) on normal and low work combined.
+    Runs independently of the Streamlit script rerun cycle.
+    """
+
+    def __init__(self, size=WORKER_POOL_SIZE, handler=None, lane_limits=None):
+        self.size = size
+        self.handler = handler
+        self.lane_limits = lane_limits or parse_lane_limits(size)
+        self.non_high_limit = non_high_capacity(size)
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._active = set()
+        self._lane_active = dict.fromkeys(LANES, 0)
+        self._active_lock = threading.Lock()
+        self._claim_lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.size):
+            thread = threading.Thread(target=self._run, name=f"ticket-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        heartbeat = threading.Thread(target=self._heartbeat, name="ticket-worker-heartbeat", daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _handle(self, ticket_data):
+        if self.handler is None:
+            from ticket_processor import process_ticket
+            self.handler = process_ticket
+        return self.handler(ticket_data)
+
+    def _heartbeat(self):
+        # Keep leases alive for long-running crews so they are not picked up twice
+        purged_at = 0.0
+        while not self._stop.wait(JOB_LEASE_SECONDS / 3):
+            with self._active_lock:
+                job_ids = list(self._active)
+            try:
+                renew_leases(job_ids, self.worker_id)
+            except Exception as e:
+                print(f"⚠️ Failed to renew job leases: {e}")
+            if time.monotonic() - purged_at >= JOB_PURGE_INTERVAL:
+                purged_at = time.monotonic()
+                try:
+                    purged = purge_finished_jobs()
+                    if purged:
+                        print(f"♻️ Purged {purged} finished jobs older than {JOB_RETENTION_DAYS:g} days.")
+                except Exception as e:
+                    print(f"⚠️ Failed to purge finished jobs: {e}")
+
+    def _claim(self):
+        # One claim at a time so two workers cannot both take a lane's last slot. The
+        # counts are only read and updated under _active_lock, which is never held
+        # across the database transaction, so finishing jobs and the heartbeat
+        # don't wait on a busy queue file.
+        with self._claim_lock:
+            with self._active_lock:
+                non_high = sum(n for lane, n in self._lane_active.items() if lane != "high")
+                lanes = [lane for lane in LANES if self._lane_active[lane] < self.lane_limits[lane]
+                         and (lane == "high" or non_high < self.non_high_limit)]
+            job = claim_job(self.worker_id, lanes)
+            if job is not None:
+                with self._active_lock:
+                    self._active.add(job[0])
+                    self._lane_active[job[3]] += 1
+            return job
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                job = self._claim()
+            except Exception as e:
+                print(f"⚠️ Failed to claim job: {e}")
+                job = None
+            if job is None:
+                self._stop.wait(JOB_POLL_INTERVAL)
+                continue
+
+            job_id, ticket_data, attempts, lane = job
+            try:
+                self._handle(ticket_data)
+                if not complete_job(job_id, self.worker_id):
+                    print(f"⚠️ Job {job_id} for {ticket_data['ticket_id']} finished after its lease was taken over; "
+                          "leaving it to the new owner.")
+            except Exception as e:
+                dead = fail_job(job_id, self.worker_id, attempts, str(e))
+                if dead:
+                    from database import log_action
+                    log_action(ticket_data["ticket_id"], "AI Analysis Error", f"Analysis failed after {attempts} attempts: {e}")
+                if dead is None:
+                    print(f"⚠️ Job {job_id} for {ticket_data['ticket_id']} failed after its lease was taken over: {e}")
+                else:
+                    print(f"❌ Job {job_id} for {ticket_data['ticket_id']} failed (attempt {attempts}): {e}")
+            finally:
+                with self._active_lock:
+                    self._active.discard(job_id)
+                    self._lane_active[lane] -= 1
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def start_workers(size=None):
+    """
+    Starts the process-wide worker pool once and runs the recovery sweep.
+    Safe to call on every Streamlit rerun.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            try:
+                recovered = recover_stalled_tickets()
+                if recovered:
+                    print(f"♻️ Re-enqueued {recovered} stalled ticket(s).")
+            except Exception as e:
+                print(f"⚠️ Error recovering stalled tickets: {e}")
+            _pool = WorkerPool(size or WORKER_POOL_SIZE)
+            _pool.start()
+        return _pool
@@ -1,19 +1,444 @@
 import os
-import subprocess
+import csv
+import json
+import time
+import argparse
+from datetime import datetime, timezone
 from database import init_db
+from ticket_ids import allocate_ticket_ids
 
-def main():
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "500"))
+IMPORT_CONCURRENCY = int(os.getenv("IMPORT_CONCURRENCY", "4"))
+
+# Accepted column names in the legacy export -> our column
+FIELD_ALIASES = {
+    "ticket_id": ("ticket_id", "id", "ticket"),
+    "title": ("title", "subject", "summary"),
+    "description": ("description", "body", "details"),
+    "email": ("email", "user_email", "requester_email"),
+    "name": ("name", "user_name", "requester"),
+    "phone": ("phone", "user_phone"),
+    "category": ("category",),
+    "severity": ("severity",),
+    "priority": ("priority",),
+    "status": ("status",),
+    "assigned_to": ("assigned_to", "manager_id"),
+    "created_at": ("created_at", "created"),
+    "resolved_at": ("resolved_at", "resolved"),
+    "resolution_notes": ("resolution_notes", "resolution"),
+}
+
+
+# Legacy spellings -> values allowed by the tickets check constraints (migrations/0002)
+STATUS_VALUES = {
+    "open": "Open", "new": "Open", "pending": "Open", "reopened": "Open",
+    "assigned": "Assigned", "in progress": "Assigned", "in_progress": "Assigned", "on hold": "Assigned",
+    "resolved": "Resolved", "closed": "Resolved", "done": "Resolved", "fixed": "Resolved", "solved": "Resolved",
+}
+SEVERITY_VALUES = {
+    "p0": "P0", "sev0": "P0", "sev 0": "P0", "critical": "P0", "blocker": "P0",
+    "p1": "P1", "sev1": "P1", "sev 1": "P1", "major": "P1", "high": "P1",
+    "p2": "P2", "sev2": "P2", "sev 2": "P2", "minor": "P2", "low": "P2", "normal": "P2",
+}
+PRIORITY_VALUES = {
+    "high": "High", "urgent": "High", "critical": "High", "p1": "High",
+    "medium": "Medium", "normal": "Medium", "med": "Medium", "p2": "Medium",
+    "low": "Low", "p3": "Low",
+}
+
+
+def init():
     print("🚀 Initializing AI Ticket Resolution System...")
-    
+
     # 1. Initialize Database
     print("📦 Setting up database...")
     init_db()
-    
+
     print("\n✅ System initialized!")
     print("\nTo run the application, use:")
     print("uv run streamlit run app.py")
-    
+
     print("\nNote: Make sure to update your .env file with your OPENAI_API_KEY.")
 
+
+def read_rows(path, fmt=None):
+    """
+    Streams rows from a CSV or JSONL file without loading it into memory.
+    """
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+    with open(path, encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _normalize(value, allowed, field, issues):
+    if value is None:
+        return None
+    normalized = allowed.get(str(value).strip().lower())
+    if normalized is None:
+        issues.append(f"unknown {field} '{value}' set to NULL")
+    return normalized
+
+
+def _timestamp(value, field):
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).isoformat()
+    except ValueError:
+        raise ValueError(f"unreadable {field} '{value}'")
+
+
+def to_records(row, manager_ids=None):
+    """
+    Maps one legacy row to (user, ticket, issues). Known spellings of status,
+    severity and priority are normalized; unknown severities, priorities and
+    managers become NULL and are listed in issues. Raises ValueError for rows
+    that cannot be imported (unknown status, unreadable dates). ticket_id is
+    None when the row has no id of its own; import_tickets fills those from
+    an ID block, so their IDs encode the import time rather than created_at.
+    """
+    lowered = {str(k).strip().lower(): v for k, v in row.items()}
+    values = {}
+    for field, aliases in FIELD_ALIASES.items():
+        value = next((lowered[a] for a in aliases if lowered.get(a) not in (None, "")), None)
+        values[field] = value.strip() if isinstance(value, str) else value
+
+    issues = []
+    assigned_to = values["assigned_to"]
+    if assigned_to is not None:
+        try:
+            assigned_to = int(assigned_to)
+        except (TypeError, ValueError):
+            issues.append(f"non-numeric assigned_to '{assigned_to}' set to NULL")
+            assigned_to = None
+        else:
+            if manager_ids is not None and assigned_to not in manager_ids:
+                issues.append(f"unknown manager '{assigned_to}' set to NULL")
+                assigned_to = None
+
+    if values["status"] is None:
+        status = "Assigned" if assigned_to else "Open"
+    else:
+        status = STATUS_VALUES.get(values["status"].lower())
+        if status is None:
+            raise ValueError(f"unknown status '{values['status']}'")
+    if status == "Assigned" and assigned_to is None:
+        status = "Open"
+
+    user_id = values["email"] or "legacy-import"
+    user = {"id": user_id, "name": values["name"], "email": values["email"], "phone": values["phone"]}
+    ticket = {
+        "ticket_id": str(values["ticket_id"]) if values["ticket_id"] is not None else None,
+        "user_id": user_id,
+        "title": values["title"] or "(no title)",
+        "description": values["description"] or "",
+        "category": values["category"],
+        "severity": _normalize(values["severity"], SEVERITY_VALUES, "severity", issues),
+        "priority": _normalize(values["priority"], PRIORITY_VALUES, "priority", issues),
+        "status": status,
+        "assigned_to": assigned_to,
+        "resolution_notes": values["resolution_notes"],
+        "resolved_at": _timestamp(values["resolved_at"], "resolved_at"),
+        # Bulk inserts null out missing columns instead of applying defaults
+        "created_at": _timestamp(values["created_at"], "created_at") or datetime.now(timezone.utc).isoformat(),
+    }
+    return user, ticket, issues
+
+
+class ImportReport:
+    """
+    Rows skipped or changed during an import. Rejected rows are appended to
+    `<file>.rejected.jsonl` with their row number and reason.
+    """
+
+    def __init__(self, path, examples=10, earlier_rejected=0):
+        self.path = path
+        self.examples = examples
+        self.earlier_rejected = earlier_rejected
+        self.rejected = 0
+        self.adjusted = 0
+        self.reasons = {}
+        self.samples = []
+
+    def reject(self, row_number, row, reason):
+        self.rejected += 1
+        self._count(reason)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"row": row_number, "reason": reason, "data": row}, default=str) + "\n")
+
+    def adjust(self, row_number, issues):
+        if issues:
+            self.adjusted += 1
+            for issue in issues:
+                self._count(issue)
+                if len(self.samples) < self.examples:
+                    self.samples.append(f"row {row_number}: {issue}")
+
+    def _count(self, reason):
+        # Group by the kind of problem rather than the offending value
+        kind = reason.split(" '")[0].split(" set to")[0]
+        self.reasons[kind] = self.reasons.get(kind, 0) + 1
+
+    def print_summary(self):
+        if not self.rejected and not self.adjusted and not self.earlier_rejected:
+            return
+        earlier = f" (plus {self.earlier_rejected} in earlier runs)" if self.earlier_rejected else ""
+        print(f"⚠️ {self.rejected} rows rejected{earlier}, {self.adjusted} rows imported with NULLed values.")
+        for kind, count in sorted(self.reasons.items(), key=lambda item: -item[1]):
+            print(f"   {count:>6}  {kind}")
+        for sample in self.samples:
+            print(f"   {sample}")
+        if self.rejected or self.earlier_rejected:
+            print(f"   Rejected rows written to {self.path}")
+
+
+class ImportCheckpoint:
+    """
+    Remembers how many rows of a source file have been committed, so an
+    interrupted import resumes after the last finished chunk. Also records how
+    far rejected rows have been written, so a retried chunk does not report
+    them again.
+    """
+
+    def __init__(self, path, source):
+        self.path = path
+        self.source = os.path.abspath(source)
+        self.size = os.path.getsize(source)
+        self.rows_done = 0
+        self.pending_ids = []
+        self.rejected_through = 0
+        self.rejected = 0
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("source") == self.source and state.get("size") == self.size:
+                self.rows_done = state.get("rows_done", 0)
+                self.pending_ids = state.get("pending_ids", [])
+                self.rejected_through = state.get("rejected_through", 0)
+                self.rejected = state.get("rejected", 0)
+            else:
+                print(f"⚠️ Checkpoint {path} belongs to a different file; starting from the top.")
+
+    def save(self, rows_done, pending_ids=None, rejected_through=None, rejected=0):
+        """
+        pending_ids are the IDs reserved for the chunk starting at rows_done,
+        so a retried chunk gets the same IDs and its rows are not duplicated.
+        rejected_through is the last row number whose rejection has been
+        written; `rejected` rows were added to the rejected file since the last save.
+        """
+        self.rows_done = rows_done
+        self.pending_ids = pending_ids or []
+        if rejected_through is not None:
+            self.rejected_through = rejected_through
+        self.rejected += rejected
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"source": self.source, "size": self.size, "rows_done": rows_done,
+                       "pending_ids": self.pending_ids, "rejected_through": self.rejected_through,
+                       "rejected": self.rejected}, f)
+        os.replace(tmp_path, self.path)
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _reinsert_id_clashes(generated, inserted_ids, attempts=3):
+    """
+    Generated IDs that were not inserted are either this import's own rows from an
+    interrupted run, or IDs another process already used (shared TICKET_ID_NODE).
+    The latter are inserted again under new IDs. Returns the rows inserted.
+    """
+    from database import bulk_import_tickets, get_tickets_by_ids
+
+    inserted = []
+    pending = [t for t in generated if t["ticket_id"] not in inserted_ids]
+    for _ in range(attempts):
+        if not pending:
+            break
+        existing = {row["ticket_id"]: row for row in get_tickets_by_ids([t["ticket_id"] for t in pending])}
+        pending = [t for t in pending
+                   if (existing.get(t["ticket_id"], {}).get("user_id"), existing.get(t["ticket_id"], {}).get("title"))
+                   != (t["user_id"], t["title"])]
+        if not pending:
+            break
+        print(f"⚠️ {len(pending)} generated ticket ID(s) already taken by another process; retrying with new IDs.")
+        for ticket, ticket_id in zip(pending, allocate_ticket_ids(len(pending))):
+            ticket["ticket_id"] = ticket_id
+        rows = bulk_import_tickets([], pending)
+        inserted += rows
+        done = {t["ticket_id"] for t in rows}
+        pending = [t for t in pending if t["ticket_id"] not in done]
+    return inserted
+
+
+def import_tickets(path, fmt=None, chunk_size=IMPORT_CHUNK_SIZE, checkpoint_path=None, classify=False):
+    from database import bulk_import_tickets, get_manager_ids
+    from job_queue import enqueue_tickets
+
+    checkpoint = ImportCheckpoint(checkpoint_path or path + ".checkpoint.json", path)
+    if checkpoint.rows_done:
+        print(f"♻️ Resuming {path} after row {checkpoint.rows_done}.")
+
+    rows = read_rows(path, fmt)
+    for _ in range(checkpoint.rows_done):
+        next(rows, None)
+
+    manager_ids = get_manager_ids()
+    report = ImportReport(path + ".rejected.jsonl", earlier_rejected=checkpoint.rejected)
+    started_at = time.perf_counter()
+    resumed_at = rows_done = checkpoint.rows_done
+    inserted_total = queued_total = 0
+    for chunk in _chunks(rows, chunk_size):
+        records = []
+        rejected = 0
+        for row_number, row in enumerate(chunk, start=rows_done + 1):
+            try:
+                user, ticket, issues = to_records(row, manager_ids)
+            except ValueError as e:
+                # A retried chunk already wrote its rejections before the interruption
+                if row_number > checkpoint.rejected_through:
+                    report.reject(row_number, row, str(e))
+                    rejected += 1
+                continue
+            report.adjust(row_number, issues)
+            records.append((user, ticket))
+        missing = [t for _, t in records if t["ticket_id"] is None]
+        ids = []
+        if missing:
+            ids = checkpoint.pending_ids[:len(missing)]
+            ids += allocate_ticket_ids(len(missing) - len(ids))
+            for ticket, ticket_id in zip(missing, ids):
+                ticket["ticket_id"] = ticket_id
+        if missing or rejected:
+            checkpoint.save(rows_done, pending_ids=ids, rejected_through=rows_done + len(chunk), rejected=rejected)
+        users = list({u["id"]: u for u, _ in records}.values())
+        inserted = bulk_import_tickets(users, [t for _, t in records]) if records else []
+        if missing:
+            inserted += _reinsert_id_clashes(missing, {t["ticket_id"] for t in inserted})
+        inserted_total += len(inserted)
+        if classify:
+            queued_total += enqueue_tickets([
+                {"ticket_id": t["ticket_id"], "user_id": t["user_id"], "title": t["title"], "description": t["description"]}
+                for t in inserted if t.get("status") == "Open" and t.get("assigned_to") is None
+            ])
+
+        rows_done += len(chunk)
+        checkpoint.save(rows_done)
+        elapsed = time.perf_counter() - started_at
+        print(f"📦 {rows_done} rows read, {inserted_total} tickets inserted "
+              f"({(rows_done - resumed_at) / elapsed:.0f} rows/s)")
+
+    elapsed = time.perf_counter() - started_at
+    print(f"✅ Imported {inserted_total} tickets from {rows_done - resumed_at} rows in {elapsed:.1f}s.")
+    report.print_summary()
+    return queued_total
+
+
+def queue_backlog():
+    """
+    Queues every open, unassigned ticket for classification.
+    """
+    from database import get_unassigned_tickets
+    from job_queue import enqueue_tickets
+
+    queued = 0
+    for batch in _chunks(get_unassigned_tickets(), 1000):
+        queued += enqueue_tickets(batch)
+    return queued
+
+
+def _token_usage():
+    from agents import get_llm
+
+    usage = get_llm().get_token_usage_summary()
+    return usage.prompt_tokens, usage.completion_tokens, usage.total_tokens
+
+
+def classify_backlog(concurrency=IMPORT_CONCURRENCY, report_every=10):
+    """
+    Drains the job queue with a dedicated worker pool. Progress lives in the
+    persistent queue, so an interrupted run picks up the remaining tickets.
+    """
+    from database import flush_audit_log
+    from job_queue import WorkerPool, get_queue_stats
+
+    stats = get_queue_stats()
+    done_before, failed_before = stats.get("done", 0), stats.get("failed", 0)
+    tokens_before = _token_usage()
+    pool = WorkerPool(size=concurrency)
+    started_at = time.perf_counter()
+    last_report = 0.0
+    pool.start()
+    print(f"🤖 Classifying with {concurrency} workers...")
+    try:
+        while True:
+            stats = get_queue_stats()
+            pending = stats.get("queued", 0) + stats.get("leased", 0)
+            elapsed = time.perf_counter() - started_at
+            if pending == 0 or elapsed - last_report >= report_every:
+                done = stats.get("done", 0) - done_before
+                print(f"   {done} classified, {pending} pending ({done / max(elapsed, 1e-9):.2f} tickets/s)")
+                last_report = elapsed
+            if pending == 0:
+                break
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\n⏸️ Interrupted; remaining tickets stay queued for the next run.")
+    finally:
+        pool.stop(timeout=5)
+        flush_audit_log()
+
+    elapsed = time.perf_counter() - started_at
+    stats = get_queue_stats()
+    done = stats.get("done", 0) - done_before
+    failed = stats.get("failed", 0) - failed_before
+    prompt, completion, total = (after - before for after, before in zip(_token_usage(), tokens_before))
+    print(f"✅ Classified {done} tickets ({failed} failed) in {elapsed:.1f}s "
+          f"= {done / max(elapsed, 1e-9):.2f} tickets/s")
+    print(f"💰 LLM tokens: {total} total ({prompt} prompt, {completion} completion), "
+          f"{total / done if done else 0:.0f} per ticket")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI Ticket Resolution System setup and bulk tools.")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("init", help="Seed the database (default)")
+
+    import_parser = subparsers.add_parser("import", help="Bulk-load tickets from a CSV/JSONL export")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--format", choices=["csv", "jsonl"])
+    import_parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    import_parser.add_argument("--checkpoint", help="Checkpoint file (default: <path>.checkpoint.json)")
+    import_parser.add_argument("--classify", action="store_true", help="Classify imported open tickets afterwards")
+    import_parser.add_argument("--concurrency", type=int, default=IMPORT_CONCURRENCY)
+
+    classify_parser = subparsers.add_parser("classify", help="Run AI classification over unassigned open tickets")
+    classify_parser.add_argument("--concurrency", type=int, default=IMPORT_CONCURRENCY)
+
+    args = parser.parse_args()
+    if args.command in (None, "init"):
+        init()
+    elif args.command == "import":
+        import_tickets(args.path, args.format, args.chunk_size, args.checkpoint, classify=args.classify)
+        if args.classify:
+            classify_backlog(args.concurrency)
+    elif args.command == "classify":
+        print(f"📥 Queued {queue_backlog()} unassigned tickets.")
+        classify_backlog(args.concurrency)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,351 @@
+import os
+import re
+import json
+import time
+import random
+import sqlite3
+import hashlib
+import threading
+from crewai.llms.base_llm import BaseLLM
+import metrics
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini").lower()  # "gemini" or "fake" (offline)
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini/gemini-3-flash-preview")
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.7"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "1.0"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "30"))
+LLM_STREAM = os.getenv("LLM_STREAM", "false").lower() == "true"  # emit token chunks as progress events
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.db")
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "100"))
+# Provider list prices, used for the llm_cost_usd_total metric
+LLM_COST_PER_1K_PROMPT_TOKENS = float(os.getenv("LLM_COST_PER_1K_PROMPT_TOKENS", "0"))
+LLM_COST_PER_1K_COMPLETION_TOKENS = float(os.getenv("LLM_COST_PER_1K_COMPLETION_TOKENS", "0"))
+
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "0"))
+FAKE_LLM_LATENCY_JITTER_MS = float(os.getenv("FAKE_LLM_LATENCY_JITTER_MS", "0"))
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+
+LLM_REQUESTS = metrics.counter("llm_requests_total", "LLM calls by agent role and outcome", ("agent", "outcome"))
+LLM_REQUEST_SECONDS = metrics.histogram("llm_request_seconds", "LLM call latency including retries", ("agent",))
+LLM_TOKENS = metrics.counter("llm_tokens_total", "LLM tokens by agent role", ("agent", "kind"))
+LLM_COST = metrics.counter("llm_cost_usd_total", "Estimated LLM spend in USD by agent role", ("agent",))
+
+_TRANSIENT_MARKERS = ("429", "503", "rate limit", "quota", "resource_exhausted", "unavailable",
+                      "overloaded", "timeout", "timed out", "temporarily")
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket; acquire() blocks until a request slot is free.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or max(1.0, rate_per_minute / 6)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class ResponseCache:
+    """
+    Disk-backed prompt -> response cache (SQLite) trimmed by least recent use
+    once it grows past max_bytes.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, max_bytes=int(LLM_CACHE_MAX_MB * 1024 * 1024)):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_access_idx ON llm_cache (last_access)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, key):
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT response FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+                return row[0]
+            return None
+
+    def set(self, key, response):
+        size = len(response.encode("utf-8"))
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?)", (key, response, size, time.time()))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+            while total > self.max_bytes:
+                oldest = conn.execute("SELECT key, size FROM llm_cache ORDER BY last_access LIMIT 100").fetchall()
+                if not oldest:
+                    break
+                for old_key, old_size in oldest:
+                    conn.execute("DELETE FROM llm_cache WHERE key = ?", (old_key,))
+                    total -= old_size
+                    if total <= self.max_bytes:
+                        break
+
+
+def cache_key(model, temperature, messages, stop=None, response_model=None):
+    payload = json.dumps(
+        {"model": model, "temperature": temperature, "messages": messages, "stop": stop,
+         "response_model": getattr(response_model, "__name__", None)},
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_transient(error):
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if status in (429, 500, 502, 503, 504):
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in _TRANSIENT_MARKERS)
+
+
+class ResilientLLM(BaseLLM):
+    """
+    Wraps a CrewAI LLM with a response cache, a shared rate limiter and
+    retries with exponential backoff and full jitter on transient errors.
+    Anything not overridden here is delegated to the wrapped LLM.
+    """
+
+    def __init__(self, inner, cache=None, rate_limiter=None, max_retries=LLM_MAX_RETRIES):
+        self.inner = inner
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self._calling = threading.local()
+        super().__init__(model=inner.model, temperature=inner.temperature, provider=getattr(inner, "provider", None))
+        # The wrapped LLM reports each response's usage here; attribute it to the calling agent
+        track_usage = inner._track_token_usage_internal
+
+        def track_and_record(usage_data):
+            track_usage(usage_data)
+            self._record_usage(usage_data)
+        inner._track_token_usage_internal = track_and_record
+
+    # CrewAI agents set stop words on the LLM they are given; keep them on the wrapped LLM
+    @property
+    def stop(self):
+        return self.inner.stop
+
+    @stop.setter
+    def stop(self, value):
+        self.inner.stop = value
+
+    def __getattr__(self, name):
+        if name == "inner":
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+    def supports_function_calling(self):
+        return self.inner.supports_function_calling()
+
+    def supports_stop_words(self):
+        return self.inner.supports_stop_words()
+
+    def supports_multimodal(self):
+        return self.inner.supports_multimodal()
+
+    def get_context_window_size(self):
+        return self.inner.get_context_window_size()
+
+    def get_token_usage_summary(self):
+        return self.inner.get_token_usage_summary()
+
+    def _record_usage(self, usage_data):
+        agent = getattr(self._calling, "agent", None) or "unknown"
+        prompt = usage_data.get("prompt_tokens") or usage_data.get("prompt_token_count") \
+            or usage_data.get("input_tokens") or 0
+        completion = usage_data.get("completion_tokens") or usage_data.get("candidates_token_count") \
+            or usage_data.get("output_tokens") or 0
+        LLM_TOKENS.inc(prompt, agent=agent, kind="prompt")
+        LLM_TOKENS.inc(completion, agent=agent, kind="completion")
+        LLM_COST.inc(prompt / 1000 * LLM_COST_PER_1K_PROMPT_TOKENS
+                     + completion / 1000 * LLM_COST_PER_1K_COMPLETION_TOKENS, agent=agent)
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None, **kwargs):
+        agent = getattr(from_agent, "role", None) or "unknown"
+        self._calling.agent = agent
+        started = time.perf_counter()
+        try:
+            result = self._call(messages, tools, callbacks, available_functions,
+                                from_task, from_agent, response_model, **kwargs)
+        except Exception:
+            LLM_REQUESTS.inc(agent=agent, outcome="error")
+            raise
+        finally:
+            self._calling.agent = None
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, agent=agent)
+        return result
+
+    def _call(self, messages, tools, callbacks, available_functions, from_task, from_agent, response_model, **kwargs):
+        agent = self._calling.agent
+        # Tool-calling turns can have side effects, so only plain completions are cached
+        key = None
+        if self.cache is not None and not tools and not available_functions:
+            key = cache_key(self.model, self.temperature, messages, self.stop, response_model)
+            cached = self.cache.get(key)
+            if cached is not None:
+                LLM_REQUESTS.inc(agent=agent, outcome="cached")
+                return cached
+
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                result = self.inner.call(
+                    messages, tools=tools, callbacks=callbacks, available_functions=available_functions,
+                    from_task=from_task, from_agent=from_agent, response_model=response_model, **kwargs
+                )
+                LLM_REQUESTS.inc(agent=agent, outcome="ok")
+                break
+            except Exception as e:
+                attempt += 1
+                if attempt > self.max_retries or not is_transient(e):
+                    raise
+                LLM_REQUESTS.inc(agent=agent, outcome="retry")
+                delay = random.uniform(0, min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * 2 ** attempt))
+                print(f"⚠️ LLM call failed ({e}); retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+        if key is not None and isinstance(result, str):
+            self.cache.set(key, result)
+        return result
+
+
+class FakeLLM(BaseLLM):
+    """
+    Deterministic offline stand-in for tests and benchmarks. Responses depend
+    only on the prompt; latency and transient errors are drawn from the
+    FAKE_LLM_* settings.
+    """
+
+    CATEGORY_RULES = [
+        ("Payments", 1, ("payment", "refund", "charged", "billing", "invoice")),
+        ("Access", 5, ("password", "login", "locked", "2fa", "account access")),
+        ("Infrastructure", 4, ("buffer", "timeout", "slow", "outage", "video", "server error", "infrastructure")),
+        ("Technical", 3, ("error", "not saving", "bug", "api", "crash")),
+    ]
+
+    def __init__(self, model="fake/triage", temperature=0.0, latency_ms=FAKE_LLM_LATENCY_MS,
+                 jitter_ms=FAKE_LLM_LATENCY_JITTER_MS, error_rate=FAKE_LLM_ERROR_RATE, stream=False, **kwargs):
+        super().__init__(model=model, temperature=temperature, provider="fake", **kwargs)
+        self.stream = stream
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._rng = random.Random()
+
+    def supports_function_calling(self):
+        return False
+
+    def _prompt_text(self, messages):
+        if isinstance(messages, str):
+            return messages
+        return "\n".join(str(m.get("content", "")) for m in messages)
+
+    def _ticket_text(self, text):
+        # Classify the ticket itself (or the upstream reports), not the instructions around it
+        match = re.search(r"Title:(.*)", text) or re.search(r"context you're working with:(.*)", text, re.DOTALL)
+        return (match.group(1) if match else text).lower()
+
+    def _classify(self, text):
+        ticket_text = self._ticket_text(text)
+        scores = [(sum(ticket_text.count(k) for k in keywords), category, manager_id)
+                  for category, manager_id, keywords in self.CATEGORY_RULES]
+        score, category, manager_id = max(scores, key=lambda s: s[0])
+        return (category, manager_id) if score else ("General", 1)
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None, **kwargs):
+        delay = max(0.0, self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+        if delay:
+            time.sleep(delay)
+        if self._rng.random() < self.error_rate:
+            raise RuntimeError("429 rate limit exceeded (fake)")
+
+        text = self._prompt_text(messages)
+        digest = int(hashlib.sha256(text.encode("utf-8")).hexdigest(), 16)
+        category, manager_id = self._classify(text)
+        self._track_token_usage_internal({
+            "prompt_tokens": len(text) // 4,
+            "completion_tokens": 60,
+            "total_tokens": len(text) // 4 + 60,
+        })
+
+        if re.search(r"manager_id", text):
+            answer = json.dumps({
+                "category": category,
+                "severity": ("P0", "P1", "P2")[digest % 3],
+                "priority": ("High", "Medium", "Low")[digest % 3],
+                "manager_id": manager_id,
+                "reason": f"Fake triage routed this {category} ticket to manager {manager_id}.",
+            })
+        else:
+            answer = f"{category} issue; urgency {('high', 'medium', 'low')[digest % 3]}."
+        response = f"Thought: I now know the final answer\nFinal Answer: {answer}"
+        if self.stream:
+            for chunk in re.findall(r"\S+\s*", response):
+                self._emit_stream_chunk_event(chunk, from_task=from_task, from_agent=from_agent)
+        return response
+
+
+_rate_limiter = TokenBucket(LLM_REQUESTS_PER_MINUTE)
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    global _response_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache()
+        return _response_cache
+
+
+def build_llm():
+    """
+    Builds the configured provider wrapped with caching, rate limiting and retries.
+    """
+    if LLM_PROVIDER == "fake":
+        inner = FakeLLM(stream=LLM_STREAM)
+    else:
+        from crewai import LLM
+        inner = LLM(
+            model=LLM_MODEL,
+            api_key=os.getenv("GEMINI_API_KEY"),
+            temperature=LLM_TEMPERATURE,
+            stream=LLM_STREAM,
+            client_params={"http_options": {"timeout": int(LLM_TIMEOUT_SECONDS * 1000)}}
+        )
+    return ResilientLLM(inner, cache=get_response_cache(), rate_limiter=_rate_limiter)
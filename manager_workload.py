@@ -0,0 +1,172 @@
+import os
+import time
+import threading
+from dotenv import load_dotenv
+import metrics
+
+load_dotenv()
+
+WORKLOAD_BALANCING = os.getenv("WORKLOAD_BALANCING", "true").lower() == "true"
+# The recommended manager keeps the ticket unless a peer in the same skill group
+# has more than this many fewer open tickets
+WORKLOAD_IMBALANCE_THRESHOLD = int(os.getenv("WORKLOAD_IMBALANCE_THRESHOLD", "2"))
+# Full reload of the roster and open counts. In between, the index follows this process's
+# own assignments, resolutions and re-opens; the reload picks up everyone else's.
+WORKLOAD_REFRESH_SECONDS = float(os.getenv("WORKLOAD_REFRESH_SECONDS", "60"))
+
+REBALANCED = metrics.counter(
+    "assignments_rebalanced_total", "AI assignments moved to a less-loaded manager in the same skill group",
+    ("skill_group",))
+
+
+class ManagerLoadIndex:
+    """
+    Active managers and their open-ticket counts, held in memory so every
+    assignment can be balanced without a query. Counts are exact for this
+    process's changes and catch up with other processes on each reload.
+    """
+
+    def __init__(self, refresh_seconds=WORKLOAD_REFRESH_SECONDS, threshold=WORKLOAD_IMBALANCE_THRESHOLD):
+        self.refresh_seconds = refresh_seconds
+        self.threshold = threshold
+        self._managers = {}
+        self._open = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def refresh(self):
+        from database import get_manager_workload
+
+        rows = get_manager_workload()
+        managers = {}
+        for row in rows:
+            row["skill_group"] = row.get("skill_group") or row.get("department") or row.get("role")
+            managers[row["manager_id"]] = row
+        with self._lock:
+            self._managers = managers
+            self._open = {manager_id: row["open_tickets"] or 0 for manager_id, row in managers.items()}
+            self._loaded_at = time.monotonic()
+
+    def _is_fresh(self):
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.refresh_seconds
+
+    def _ensure_fresh(self):
+        if self._is_fresh():
+            return
+        with self._refresh_lock:
+            if self._is_fresh():
+                return
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"⚠️ Could not load manager workload, keeping recommended assignments: {e}")
+                # Try again after the next interval rather than on every ticket
+                self._loaded_at = time.monotonic()
+
+    def roster(self):
+        """
+        Active managers (manager_id, name, role, skill_group, expertise, ...) by id.
+        """
+        self._ensure_fresh()
+        with self._lock:
+            return [dict(self._managers[m], open_tickets=self._open[m]) for m in sorted(self._managers)]
+
+    def least_loaded(self, skill_group):
+        """
+        The active manager in the skill group with the fewest open tickets, or None.
+        """
+        self._ensure_fresh()
+        with self._lock:
+            peers = [m for m, info in self._managers.items() if info["skill_group"] == skill_group]
+            return min(peers, key=lambda m: (self._open[m], m)) if peers else None
+
+    def assign(self, recommended_id):
+        """
+        Picks the manager for a new assignment and counts the ticket against them
+        straight away, so concurrent workers see it. Returns (manager_id, recommended_load,
+        chosen_load) where the loads are open tickets before this one.
+        """
+        self._ensure_fresh()
+        with self._lock:
+            manager = self._managers.get(recommended_id)
+            if manager is None:
+                return recommended_id, None, None
+            chosen = recommended_id
+            if WORKLOAD_BALANCING:
+                peers = [m for m, info in self._managers.items() if info["skill_group"] == manager["skill_group"]]
+                least = min(peers, key=lambda m: (self._open[m], m))
+                if self._open[recommended_id] - self._open[least] > self.threshold:
+                    chosen = least
+                    REBALANCED.inc(skill_group=manager["skill_group"])
+            loads = self._open[recommended_id], self._open[chosen]
+            self._open[chosen] += 1
+            return chosen, *loads
+
+    def adjust(self, manager_id, delta):
+        with self._lock:
+            if manager_id in self._open:
+                self._open[manager_id] = max(0, self._open[manager_id] + delta)
+
+    def open_counts(self):
+        with self._lock:
+            return {str(m): n for m, n in self._open.items()}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_load_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = ManagerLoadIndex()
+    return _index
+
+
+metrics.gauge("manager_open_tickets", "Open tickets per active manager, from the load index", ("manager_id",),
+              collect=lambda: get_load_index().open_counts())
+
+
+def balance_assignment(recommended_id):
+    """
+    Returns (manager_id, note): the recommended manager, or the least-loaded peer
+    in its skill group when the recommended manager is more than
+    WORKLOAD_IMBALANCE_THRESHOLD open tickets busier. note explains a move and is
+    None otherwise; the caller logs it once the assignment is saved.
+    """
+    chosen, recommended_load, chosen_load = get_load_index().assign(recommended_id)
+    if chosen == recommended_id:
+        return chosen, None
+    return chosen, (f"Recommended manager {recommended_id} has {recommended_load} open tickets; "
+                    f"assigned to manager {chosen} ({chosen_load} open) in the same skill group.")
+
+
+def ticket_released(manager_id):
+    """
+    A ticket no longer counts against the manager: it was resolved, or the
+    assignment chosen by balance_assignment() could not be saved.
+    """
+    get_load_index().adjust(manager_id, -1)
+
+
+def ticket_reopened(manager_id):
+    get_load_index().adjust(manager_id, 1)
+
+
+def format_roster(indent="        "):
+    """
+    The active managers as a numbered list for the Tech Lead's assignment task.
+    Falls back to the seed roster if the managers table cannot be read.
+    """
+    managers = get_load_index().roster()
+    if not managers:
+        from database import DEFAULT_MANAGERS
+
+        managers = [dict(m, manager_id=m["id"]) for m in DEFAULT_MANAGERS]
+    return "\n".join(
+        f"{indent}{m['manager_id']}. {m['name']} ({m['role']}) - {m.get('expertise') or m.get('department') or 'General'}"
+        for m in managers
+    )
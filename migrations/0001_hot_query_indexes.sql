@@ -0,0 +1,27 @@
+-- 0001: Indexes for the hot read paths.
+-- Safe to re-run. On a large live table, run each statement separately with
+-- CREATE INDEX CONCURRENTLY instead.
+
+-- get_ticket_details / ticket timeline: WHERE ticket_id = ? ORDER BY timestamp DESC (dropped again in 0007)
+CREATE INDEX IF NOT EXISTS ticket_logs_ticket_id_timestamp_idx
+    ON ticket_logs (ticket_id, "timestamp" DESC);
+
+-- Dashboard status filter + newest-first listing, and the stalled-ticket recovery sweep
+CREATE INDEX IF NOT EXISTS tickets_status_created_at_idx
+    ON tickets (status, created_at DESC);
+
+-- Keyset pagination in query_tickets: ORDER BY created_at DESC, ticket_id DESC
+CREATE INDEX IF NOT EXISTS tickets_created_at_ticket_id_idx
+    ON tickets (created_at DESC, ticket_id DESC);
+
+-- Severity filter
+CREATE INDEX IF NOT EXISTS tickets_severity_created_at_idx
+    ON tickets (severity, created_at DESC);
+
+-- Manager filter and open-tickets-per-manager counts
+CREATE INDEX IF NOT EXISTS tickets_assigned_to_status_idx
+    ON tickets (assigned_to, status);
+
+-- Analytics replica sync watermark on resolved_at
+CREATE INDEX IF NOT EXISTS tickets_resolved_at_idx
+    ON tickets (resolved_at) WHERE resolved_at IS NOT NULL;
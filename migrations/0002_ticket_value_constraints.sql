@@ -0,0 +1,26 @@
+-- 0002: Restrict status/severity/priority to the values the app writes.
+-- Constraints are added NOT VALID (no table scan, no long lock) and then
+-- validated separately. Safe to re-run.
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'tickets_status_check') THEN
+        ALTER TABLE tickets ADD CONSTRAINT tickets_status_check
+            CHECK (status IN ('Open', 'Assigned', 'Resolved')) NOT VALID;
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'tickets_severity_check') THEN
+        ALTER TABLE tickets ADD CONSTRAINT tickets_severity_check
+            CHECK (severity IS NULL OR severity IN ('P0', 'P1', 'P2')) NOT VALID;
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'tickets_priority_check') THEN
+        ALTER TABLE tickets ADD CONSTRAINT tickets_priority_check
+            CHECK (priority IS NULL OR priority IN ('High', 'Medium', 'Low')) NOT VALID;
+    END IF;
+END;
+$$;
+
+ALTER TABLE tickets VALIDATE CONSTRAINT tickets_status_check;
+ALTER TABLE tickets VALIDATE CONSTRAINT tickets_severity_check;
+ALTER TABLE tickets VALIDATE CONSTRAINT tickets_priority_check;
+
+ALTER TABLE tickets ALTER COLUMN status SET NOT NULL;
@@ -0,0 +1,25 @@
+-- 0003: Publish ticket and ticket_logs changes on the 'ticket_events' channel
+-- so app processes can LISTEN instead of polling. Safe to re-run.
+
+CREATE OR REPLACE FUNCTION notify_ticket_event() RETURNS TRIGGER LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_notify(
+        'ticket_events',
+        json_build_object(
+            'ticket_id', NEW.ticket_id,
+            'kind', CASE WHEN TG_TABLE_NAME = 'ticket_logs' THEN 'log' ELSE 'ticket' END
+        )::TEXT
+    );
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS tickets_notify_event ON tickets;
+CREATE TRIGGER tickets_notify_event
+    AFTER INSERT OR UPDATE ON tickets
+    FOR EACH ROW EXECUTE FUNCTION notify_ticket_event();
+
+DROP TRIGGER IF EXISTS ticket_logs_notify_event ON ticket_logs;
+CREATE TRIGGER ticket_logs_notify_event
+    AFTER INSERT ON ticket_logs
+    FOR EACH ROW EXECUTE FUNCTION notify_ticket_event();
@@ -0,0 +1,6 @@
+-- 0004: Keyset paging of a ticket's activity log by id (get_ticket_logs):
+--   WHERE ticket_id = ? AND id > ? ORDER BY id        (new entries since the last poll)
+--   WHERE ticket_id = ? AND id < ? ORDER BY id DESC   (older pages on demand)
+-- Safe to re-run. On a large live table, use CREATE INDEX CONCURRENTLY instead.
+CREATE INDEX IF NOT EXISTS ticket_logs_ticket_id_id_idx
+    ON ticket_logs (ticket_id, id DESC);
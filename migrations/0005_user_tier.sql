@@ -0,0 +1,3 @@
+-- 0005: Customer tier, used to prioritize AI triage (triage_priority.py).
+-- Values: enterprise | premium | pro | standard | free. Safe to re-run.
+ALTER TABLE users ADD COLUMN IF NOT EXISTS tier TEXT NOT NULL DEFAULT 'standard';
@@ -0,0 +1,62 @@
+-- 0006: Workload-aware assignment (manager_workload.py).
+-- Managers get a skill group (peers the balancer may move tickets between) and an
+-- expertise blurb for the Tech Lead prompt; the load view exposes both.
+-- resolve/reopen return the assignee whose open-ticket count changed. Safe to re-run.
+ALTER TABLE managers ADD COLUMN IF NOT EXISTS skill_group TEXT;
+ALTER TABLE managers ADD COLUMN IF NOT EXISTS expertise TEXT;
+
+UPDATE managers SET skill_group = 'support',  expertise = COALESCE(expertise, 'General queries, billing')
+    WHERE role = 'Support Lead' AND skill_group IS NULL;
+UPDATE managers SET skill_group = 'qa',       expertise = COALESCE(expertise, 'Bugs, UI issues')
+    WHERE role = 'QA Lead' AND skill_group IS NULL;
+UPDATE managers SET skill_group = 'backend',  expertise = COALESCE(expertise, 'Server logic, DB issues')
+    WHERE role = 'Backend Lead' AND skill_group IS NULL;
+UPDATE managers SET skill_group = 'sre',      expertise = COALESCE(expertise, 'Infrastructure, performance, video playback')
+    WHERE role = 'SRE Lead' AND skill_group IS NULL;
+UPDATE managers SET skill_group = 'security', expertise = COALESCE(expertise, 'Access, data privacy')
+    WHERE role = 'Security Lead' AND skill_group IS NULL;
+
+CREATE OR REPLACE VIEW manager_open_ticket_counts AS
+SELECT m.id AS manager_id, m.name, m.role,
+       COUNT(t.ticket_id) FILTER (WHERE t.status <> 'Resolved')::INT AS open_tickets,
+       m.department, COALESCE(m.skill_group, m.department) AS skill_group, m.expertise
+FROM managers m
+LEFT JOIN tickets t ON t.assigned_to = m.id
+WHERE m.is_active
+GROUP BY m.id;
+
+DROP FUNCTION IF EXISTS resolve_ticket_tx(TEXT, TEXT);
+CREATE FUNCTION resolve_ticket_tx(p_ticket_id TEXT, p_notes TEXT) RETURNS INTEGER LANGUAGE plpgsql AS $$
+DECLARE
+    v_released INTEGER;
+BEGIN
+    SELECT assigned_to INTO v_released FROM tickets
+    WHERE ticket_id = p_ticket_id AND status <> 'Resolved'
+    FOR UPDATE;
+
+    UPDATE tickets
+    SET status = 'Resolved', resolved_at = NOW(), resolution_notes = p_notes
+    WHERE ticket_id = p_ticket_id;
+
+    INSERT INTO ticket_logs (ticket_id, action, details)
+    VALUES (p_ticket_id, 'Ticket Resolved', p_notes);
+    RETURN v_released;
+END;
+$$;
+
+DROP FUNCTION IF EXISTS reopen_ticket_tx(TEXT);
+CREATE FUNCTION reopen_ticket_tx(p_ticket_id TEXT) RETURNS INTEGER LANGUAGE plpgsql AS $$
+DECLARE
+    v_reclaimed INTEGER;
+BEGIN
+    SELECT assigned_to INTO v_reclaimed FROM tickets
+    WHERE ticket_id = p_ticket_id AND status = 'Resolved'
+    FOR UPDATE;
+
+    UPDATE tickets SET status = 'Open' WHERE ticket_id = p_ticket_id;
+
+    INSERT INTO ticket_logs (ticket_id, action, details)
+    VALUES (p_ticket_id, 'Ticket Re-opened', 'User re-opened the ticket.');
+    RETURN v_reclaimed;
+END;
+$$;
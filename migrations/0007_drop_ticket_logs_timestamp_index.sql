@@ -0,0 +1,3 @@
+-- 0007: The timeline pages ticket_logs by id (0004) and orders entries by timestamp in the
+-- client, so the (ticket_id, timestamp) index from 0001 is no longer read. Safe to re-run.
+DROP INDEX IF EXISTS ticket_logs_ticket_id_timestamp_idx;
@@ -0,0 +1,20 @@
+-- 0008: Re-opening a ticket clears resolved_at, so an open ticket no longer counts as
+-- resolved in the daily-volume view or the analytics MTTR. Also clears the stale
+-- resolved_at of tickets re-opened before this migration. Safe to re-run.
+CREATE OR REPLACE FUNCTION reopen_ticket_tx(p_ticket_id TEXT) RETURNS INTEGER LANGUAGE plpgsql AS $$
+DECLARE
+    v_reclaimed INTEGER;
+BEGIN
+    SELECT assigned_to INTO v_reclaimed FROM tickets
+    WHERE ticket_id = p_ticket_id AND status = 'Resolved'
+    FOR UPDATE;
+
+    UPDATE tickets SET status = 'Open', resolved_at = NULL WHERE ticket_id = p_ticket_id;
+
+    INSERT INTO ticket_logs (ticket_id, action, details)
+    VALUES (p_ticket_id, 'Ticket Re-opened', 'User re-opened the ticket.');
+    RETURN v_reclaimed;
+END;
+$$;
+
+UPDATE tickets SET resolved_at = NULL WHERE status <> 'Resolved' AND resolved_at IS NOT NULL;
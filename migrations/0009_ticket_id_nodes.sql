@@ -0,0 +1,9 @@
+-- 0009: Ticket ID nodes (ticket_ids.py). A process without TICKET_ID_NODE claims the next
+-- node from this sequence at startup, so concurrent processes get distinct nodes instead of
+-- a hostname + pid hash that two of them can share. The sequence wraps after 999; a node is
+-- only reused after 1000 later process starts. Safe to re-run.
+CREATE SEQUENCE IF NOT EXISTS ticket_id_node_seq MINVALUE 0 MAXVALUE 999 START 0 CYCLE;
+
+CREATE OR REPLACE FUNCTION claim_ticket_id_node() RETURNS INTEGER LANGUAGE sql AS $$
+    SELECT nextval('ticket_id_node_seq')::INTEGER;
+$$;
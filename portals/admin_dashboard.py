@@ -1,7 +1,19 @@
 import streamlit as st
 import pandas as pd
-from database import get_all_tickets, get_ticket_details, resolve_ticket, get_managers
+from database import (
+    get_ticket, resolve_ticket, query_tickets, get_status_counts, get_category_severity_counts,
+    get_open_tickets_by_manager, get_daily_ticket_volume, count_active_managers
+)
 import plotly.express as px
+import datetime
+import analytics_store
+from cache import get_cache_stats
+from dedup_cache import get_dedup_stats
+from ticket_timeline import get_timeline, render_timeline
+
+STATUS_OPTIONS = ["Open", "Assigned", "Resolved"]
+SEVERITY_OPTIONS = ["P0", "P1", "P2"]
+PAGE_SIZE = 25
 
 # Header
 st.markdown("<h1 style='text-align: center;'>🛡️ Support Admin Dashboard</h1>", unsafe_allow_html=True)
@@ -10,37 +22,68 @@ st.markdown("---")
 # Dashboard Content (Authentication is handled globally in app.py)
 # Sidebar Filters
 st.sidebar.header("Filters")
-tickets_df = get_all_tickets()
+status_counts = get_status_counts()
+total_tickets = sum(status_counts.values())
 
-if tickets_df.empty:
+if total_tickets == 0:
     st.info("No tickets found in the system.")
 else:
-    status_filter = st.sidebar.multiselect("Status", options=tickets_df['status'].unique(), default=tickets_df['status'].unique())
-    # Filter out None from severity options
-    severity_options = [s for s in tickets_df['severity'].unique().tolist() if s is not None]
-    severity_filter = st.sidebar.multiselect("Severity", options=severity_options, default=severity_options)
-    
-    filtered_df = tickets_df[
-        (tickets_df['status'].isin(status_filter)) & 
-        (tickets_df['severity'].isin(severity_filter + [None]))
-    ]
+    status_filter = st.sidebar.multiselect("Status", options=STATUS_OPTIONS, default=STATUS_OPTIONS)
+    severity_filter = st.sidebar.multiselect("Severity", options=SEVERITY_OPTIONS, default=SEVERITY_OPTIONS)
+    manager_load_df = get_open_tickets_by_manager()
+    manager_names = dict(zip(manager_load_df['manager_id'], manager_load_df['name']))
+    manager_filter = st.sidebar.multiselect("Assigned To", options=list(manager_names.keys()), format_func=lambda m: manager_names[m])
+    date_range = st.sidebar.date_input("Created Between", value=())
+
+    created_from = created_to = None
+    if len(date_range) == 2:
+        created_from = date_range[0].isoformat()
+        created_to = (date_range[1] + datetime.timedelta(days=1)).isoformat()
+
+    # Reset pagination whenever the filters change
+    filter_key = (tuple(status_filter), tuple(severity_filter), tuple(manager_filter), created_from, created_to)
+    if st.session_state.get("ticket_filter_key") != filter_key:
+        st.session_state.ticket_filter_key = filter_key
+        st.session_state.ticket_page_cursors = [None]
 
     # Top Metrics
     m1, m2, m3, m4 = st.columns(4)
-    m1.metric("Total Tickets", len(tickets_df))
-    m2.metric("Open Tickets", len(tickets_df[tickets_df['status'] == 'Open']))
-    m3.metric("Resolved Tickets", len(tickets_df[tickets_df['status'] == 'Resolved']))
-    m4.metric("Managers Active", len(get_managers()))
+    m1.metric("Total Tickets", total_tickets)
+    m2.metric("Open Tickets", status_counts.get('Open', 0))
+    m3.metric("Resolved Tickets", status_counts.get('Resolved', 0))
+    m4.metric("Managers Active", count_active_managers())
 
     st.markdown("### Ticket Overview")
-    st.dataframe(filtered_df[['ticket_id', 'title', 'status', 'severity', 'priority', 'manager_name', 'created_at']], width='stretch')
+    cursors = st.session_state.ticket_page_cursors
+    filtered_df, next_cursor = query_tickets(
+        statuses=status_filter,
+        severities=severity_filter,
+        manager_ids=manager_filter or None,
+        created_from=created_from,
+        created_to=created_to,
+        cursor=cursors[-1],
+        page_size=PAGE_SIZE
+    )
+    if filtered_df.empty:
+        st.info("No tickets match the selected filters.")
+    else:
+        st.dataframe(filtered_df[['ticket_id', 'title', 'status', 'severity', 'priority', 'manager_name', 'created_at']], width='stretch')
+
+    p1, p2, p3 = st.columns([1, 2, 1])
+    if p1.button("⬅️ Previous", disabled=len(cursors) == 1, use_container_width=True):
+        cursors.pop()
+        st.rerun()
+    p2.markdown(f"<p style='text-align: center;'>Page {len(cursors)}</p>", unsafe_allow_html=True)
+    if p3.button("Next ➡️", disabled=next_cursor is None, use_container_width=True):
+        cursors.append(next_cursor)
+        st.rerun()
 
     st.markdown("---")
     st.subheader("Ticket Action Center")
-    ticket_to_action = st.selectbox("Select Ticket to Manage", options=filtered_df['ticket_id'].tolist())
+    ticket_to_action = st.selectbox("Select Ticket to Manage", options=filtered_df['ticket_id'].tolist() if not filtered_df.empty else [])
     
     if ticket_to_action:
-        ticket, logs = get_ticket_details(ticket_to_action)
+        ticket = get_ticket(ticket_to_action)
         t = ticket.iloc[0]
         
         # Management Section
@@ -53,36 +96,81 @@ else:
             if t['status'] != 'Resolved':
                 notes = st.text_area("Resolution Notes")
                 if st.button("Mark as Resolved"):
-                    from email_service import send_resolution_email
+                    from email_service import queue_resolution_email
                     resolve_ticket(ticket_to_action, notes)
                     
-                    # Send Email Notification
-                    send_resolution_email(
+                    # Queue Email Notification (delivered by the background outbox sender)
+                    queue_resolution_email(
                         user_email=t['user_id'],
                         ticket_id=t['ticket_id'],
                         ticket_title=t['title'],
                         resolution_notes=notes
                     )
                     
-                    st.success("Ticket Resolved and User Notified!")
+                    st.success("Ticket Resolved and User Notification Queued!")
                     st.rerun()
             else:
                 st.success(f"Assigned Resolution: {t['resolution_notes']}")
         
         # Logs Section
         st.markdown("#### Activity Logs")
-        for _, log in logs.iterrows():
-            with st.container(border=True):
-                st.caption(f"{log['timestamp']} - {log['action']}")
-                st.write(log['details'])
+        render_timeline(get_timeline(ticket_to_action), table=True)
 
     # Visualization
     st.markdown("---")
     st.subheader("Analytics")
     c1, c2 = st.columns(2)
     with c1:
-        fig = px.pie(tickets_df, names='status', title='Tickets by Status')
+        status_df = pd.DataFrame(list(status_counts.items()), columns=['status', 'ticket_count'])
+        fig = px.pie(status_df, names='status', values='ticket_count', title='Tickets by Status')
         st.plotly_chart(fig)
     with c2:
-        fig = px.bar(tickets_df, x='category', color='severity', title='Tickets by Category and Severity')
+        fig = px.bar(get_category_severity_counts(), x='category', y='ticket_count', color='severity', title='Tickets by Category and Severity')
+        st.plotly_chart(fig)
+
+    c3, c4 = st.columns(2)
+    with c3:
+        fig = px.bar(manager_load_df, x='name', y='open_tickets', title='Open Tickets by Manager')
+        st.plotly_chart(fig)
+    with c4:
+        fig = px.line(get_daily_ticket_volume(), x='day', y=['created', 'resolved'], title='Daily Created vs Resolved (30 days)')
         st.plotly_chart(fig)
+
+    # Heavy aggregations from the local DuckDB replica (synced at most every ANALYTICS_SYNC_INTERVAL seconds)
+    st.markdown("---")
+    st.subheader("Advanced Analytics")
+    if st.button("🔄 Sync Analytics Replica"):
+        try:
+            analytics_store.sync_replica()
+        except Exception as e:
+            st.error(f"Analytics replica sync failed: {e}")
+    else:
+        try:
+            analytics_store.sync_if_stale()
+        except Exception as e:
+            st.warning(f"Analytics replica could not be refreshed: {e}")
+
+    # Lifecycle percentiles over the last 30 days
+    lifecycle = analytics_store.lifecycle_percentiles().set_index('stage')
+    lifecycle_cols = iter(st.columns(4))
+    for stage, label in (('Time to Assignment', 'Assign'), ('Time to Resolution', 'Resolve')):
+        for column in ('p50_hours', 'p95_hours'):
+            value = lifecycle.at[stage, column] if stage in lifecycle.index else None
+            next(lifecycle_cols).metric(f"{label} {column[:3]} (h)", "-" if value is None else f"{value:.2f}")
+
+    c5, c6 = st.columns(2)
+    with c5:
+        fig = px.bar(analytics_store.mttr_by_manager(), x='manager', y='mttr_hours', title='Mean Time to Resolve (hours)')
+        st.plotly_chart(fig)
+    with c6:
+        fig = px.bar(analytics_store.backlog_aging(), x='age_bucket', y='tickets', color='severity', title='Backlog Aging')
+        st.plotly_chart(fig)
+    fig = px.line(analytics_store.severity_trend(), x='month', y='tickets', color='severity', title='Severity Trend (12 months)')
+    st.plotly_chart(fig)
+
+# Read-cache and duplicate-ticket cache counters for this server process
+with st.expander("⚙️ Cache Statistics"):
+    st.dataframe(pd.DataFrame(get_cache_stats()), width='stretch', hide_index=True)
+    dedup = get_dedup_stats()
+    st.caption(f"Duplicate-ticket cache: {dedup['entries']} entries, {dedup['hits']} hits, "
+               f"{dedup['misses']} misses, hit rate {dedup['hit_rate']:.0%}")
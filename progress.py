@@ -0,0 +1,125 @@
+import os
+import re
+import time
+import threading
+from crewai.events import crewai_event_bus, TaskStartedEvent, LLMStreamChunkEvent
+import metrics
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# CrewAI's verbose console output is expensive on busy workers; turn it on for debugging only
+CREW_VERBOSE = os.getenv("CREW_VERBOSE", "false").lower() == "true"
+PROGRESS_EVENTS_ENABLED = os.getenv("PROGRESS_EVENTS_ENABLED", "true").lower() == "true"
+# Streamed tokens (LLM_STREAM=true) are coalesced into one log entry per this many chars / seconds
+PROGRESS_TOKEN_FLUSH_CHARS = int(os.getenv("PROGRESS_TOKEN_FLUSH_CHARS", "400"))
+PROGRESS_TOKEN_FLUSH_SECONDS = float(os.getenv("PROGRESS_TOKEN_FLUSH_SECONDS", "2.0"))
+PROGRESS_DETAIL_CHARS = 200
+
+CREW_TASK_SECONDS = metrics.histogram("crew_task_seconds", "Duration of each crew task by agent role", ("agent",))
+
+# task id -> reporter, so global CrewAI events can be routed to the right ticket
+_reporters = {}
+_reporters_lock = threading.Lock()
+
+
+def shorten(text, limit=PROGRESS_DETAIL_CHARS):
+    text = re.sub(r"\s+", " ", str(text or "")).strip()
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+class ProgressReporter:
+    """
+    Turns one crew run into compact ticket_logs entries: task start/finish,
+    agent steps and (when streaming) coalesced LLM output. Entries go through
+    log_action, so they are batched by the audit writer.
+    """
+
+    def __init__(self, ticket_id, log):
+        self.ticket_id = ticket_id
+        self.log = log
+        self.timings = []
+        self.started_at = time.perf_counter()
+        self._task_ids = []
+        self._task_started = {}
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def attach(self, crew):
+        with _reporters_lock:
+            for task in crew.tasks:
+                self._task_ids.append(str(task.id))
+                _reporters[str(task.id)] = self
+
+    def start(self):
+        self.started_at = time.perf_counter()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started_at
+
+    def _emit(self, action, details):
+        if PROGRESS_EVENTS_ENABLED:
+            self.log(self.ticket_id, action, details)
+
+    def task_started(self, task):
+        role = task.agent.role if task.agent else "Agent"
+        self._task_started[role] = time.perf_counter()
+        self._emit("AI Task Started", f"{role}: {shorten(task.name or task.description, 80)}")
+
+    def step(self, step):
+        # AgentAction carries tool use; final answers are reported by task_finished
+        tool = getattr(step, "tool", None)
+        if tool:
+            self._emit("AI Step", f"{tool}({shorten(getattr(step, 'tool_input', ''), 120)})")
+
+    def task_finished(self, output):
+        elapsed = self.elapsed()
+        self.timings.append((output.agent, elapsed))
+        # Parallel tasks overlap, so each one is timed from its own start rather than the previous finish
+        task_started = self._task_started.pop(output.agent, None)
+        if task_started is not None:
+            CREW_TASK_SECONDS.observe(time.perf_counter() - task_started, agent=output.agent)
+        self._flush_tokens(output.agent)
+        self._emit("AI Task Completed", f"{output.agent} +{elapsed:.1f}s: {shorten(output.raw)}")
+
+    def token(self, role, chunk):
+        with self._lock:
+            buffer = self._tokens.setdefault(role, {"text": [], "size": 0, "since": time.monotonic()})
+            buffer["text"].append(chunk)
+            buffer["size"] += len(chunk)
+            due = buffer["size"] >= PROGRESS_TOKEN_FLUSH_CHARS \
+                or time.monotonic() - buffer["since"] >= PROGRESS_TOKEN_FLUSH_SECONDS
+        if due:
+            self._flush_tokens(role)
+
+    def _flush_tokens(self, role):
+        with self._lock:
+            buffer = self._tokens.pop(role, None)
+        if buffer and buffer["size"]:
+            self._emit("AI Output", f"{role}: {shorten(''.join(buffer['text']), PROGRESS_TOKEN_FLUSH_CHARS + 100)}")
+
+    def close(self):
+        for role in list(self._tokens):
+            self._flush_tokens(role)
+        with _reporters_lock:
+            for task_id in self._task_ids:
+                _reporters.pop(task_id, None)
+
+
+def _reporter_for(task_id):
+    with _reporters_lock:
+        return _reporters.get(task_id)
+
+
+@crewai_event_bus.on(TaskStartedEvent)
+def _on_task_started(source, event):
+    reporter = _reporter_for(str(event.task.id)) if event.task is not None else None
+    if reporter:
+        reporter.task_started(event.task)
+
+
+@crewai_event_bus.on(LLMStreamChunkEvent)
+def _on_stream_chunk(source, event):
+    reporter = _reporter_for(event.task_id)
+    if reporter and event.tool_call is None:
+        reporter.token(event.agent_role or "Agent", event.chunk)
@@ -12,6 +12,8 @@ CREATE TABLE IF NOT EXISTS managers (
     name TEXT,
     role TEXT,
     department TEXT,
+    skill_group TEXT,  -- peers the workload balancer may move tickets between
+    expertise TEXT,    -- shown to the Tech Lead in the manager roster
     is_active BOOLEAN DEFAULT TRUE
 );
 
@@ -41,5 +43,126 @@ CREATE TABLE IF NOT EXISTS ticket_logs (
     timestamp TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- 5. Analytics views (aggregated server-side for the admin dashboard)
+CREATE OR REPLACE VIEW ticket_status_counts AS
+SELECT status, COUNT(*)::INT AS ticket_count
+FROM tickets
+GROUP BY status;
+
+CREATE OR REPLACE VIEW ticket_category_severity_counts AS
+SELECT category, severity, COUNT(*)::INT AS ticket_count
+FROM tickets
+GROUP BY category, severity;
+
+CREATE OR REPLACE VIEW manager_open_ticket_counts AS
+SELECT m.id AS manager_id, m.name, m.role,
+       COUNT(t.ticket_id) FILTER (WHERE t.status <> 'Resolved')::INT AS open_tickets,
+       m.department, COALESCE(m.skill_group, m.department) AS skill_group, m.expertise
+FROM managers m
+LEFT JOIN tickets t ON t.assigned_to = m.id
+WHERE m.is_active
+GROUP BY m.id;
+
+CREATE OR REPLACE VIEW ticket_daily_volume AS
+SELECT day, SUM(created)::INT AS created, SUM(resolved)::INT AS resolved
+FROM (
+    SELECT created_at::DATE AS day, 1 AS created, 0 AS resolved FROM tickets
+    UNION ALL
+    SELECT resolved_at::DATE AS day, 0 AS created, 1 AS resolved FROM tickets WHERE resolved_at IS NOT NULL
+) events
+GROUP BY day;
+
+-- 6. Transactional state transitions (ticket change + audit row in one round-trip)
+CREATE OR REPLACE FUNCTION create_ticket_tx(
+    p_ticket_id TEXT,
+    p_user_id TEXT,
+    p_title TEXT,
+    p_description TEXT,
+    p_category TEXT DEFAULT NULL,
+    p_user_name TEXT DEFAULT NULL,
+    p_user_email TEXT DEFAULT NULL,
+    p_user_phone TEXT DEFAULT NULL
+) RETURNS VOID LANGUAGE plpgsql AS $$
+BEGIN
+    IF p_user_name IS NOT NULL OR p_user_email IS NOT NULL THEN
+        INSERT INTO users (id, name, email, phone)
+        VALUES (p_user_id, p_user_name, p_user_email, p_user_phone)
+        ON CONFLICT (id) DO UPDATE
+        SET name = EXCLUDED.name, email = EXCLUDED.email, phone = EXCLUDED.phone;
+    END IF;
+
+    INSERT INTO tickets (ticket_id, user_id, title, description, category, status)
+    VALUES (p_ticket_id, p_user_id, p_title, p_description, p_category, 'Open');
+
+    INSERT INTO ticket_logs (ticket_id, action, details)
+    VALUES (p_ticket_id, 'Ticket Created', 'Ticket raised by user ' || p_user_id);
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION assign_ticket_tx(
+    p_ticket_id TEXT,
+    p_category TEXT,
+    p_severity TEXT,
+    p_priority TEXT,
+    p_assigned_to INTEGER,
+    p_reason TEXT
+) RETURNS VOID LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE tickets
+    SET category = p_category, severity = p_severity, priority = p_priority,
+        assigned_to = p_assigned_to, assignment_reason = p_reason, status = 'Assigned'
+    WHERE ticket_id = p_ticket_id;
+
+    INSERT INTO ticket_logs (ticket_id, action, details)
+    VALUES (p_ticket_id, 'Ticket Assigned',
+            'Assigned to manager ID ' || COALESCE(p_assigned_to::TEXT, 'none')
+            || '. Reason: ' || LEFT(COALESCE(p_reason, ''), 100) || '...');
+END;
+$$;
+
+-- Return the assignee whose open-ticket count changed (manager_workload.py)
+DROP FUNCTION IF EXISTS resolve_ticket_tx(TEXT, TEXT);
+CREATE FUNCTION resolve_ticket_tx(p_ticket_id TEXT, p_notes TEXT) RETURNS INTEGER LANGUAGE plpgsql AS $$
+DECLARE
+    v_released INTEGER;
+BEGIN
+    SELECT assigned_to INTO v_released FROM tickets
+    WHERE ticket_id = p_ticket_id AND status <> 'Resolved'
+    FOR UPDATE;
+
+    UPDATE tickets
+    SET status = 'Resolved', resolved_at = NOW(), resolution_notes = p_notes
+    WHERE ticket_id = p_ticket_id;
+
+    INSERT INTO ticket_logs (ticket_id, action, details)
+    VALUES (p_ticket_id, 'Ticket Resolved', p_notes);
+    RETURN v_released;
+END;
+$$;
+
+DROP FUNCTION IF EXISTS reopen_ticket_tx(TEXT);
+CREATE FUNCTION reopen_ticket_tx(p_ticket_id TEXT) RETURNS INTEGER LANGUAGE plpgsql AS $$
+DECLARE
+    v_reclaimed INTEGER;
+BEGIN
+    SELECT assigned_to INTO v_reclaimed FROM tickets
+    WHERE ticket_id = p_ticket_id AND status = 'Resolved'
+    FOR UPDATE;
+
+    UPDATE tickets SET status = 'Open', resolved_at = NULL WHERE ticket_id = p_ticket_id;
+
+    INSERT INTO ticket_logs (ticket_id, action, details)
+    VALUES (p_ticket_id, 'Ticket Re-opened', 'User re-opened the ticket.');
+    RETURN v_reclaimed;
+END;
+$$;
+
+-- 7. Ticket ID nodes, claimed by processes that run without TICKET_ID_NODE (ticket_ids.py)
+CREATE SEQUENCE IF NOT EXISTS ticket_id_node_seq MINVALUE 0 MAXVALUE 999 START 0 CYCLE;
+
+CREATE OR REPLACE FUNCTION claim_ticket_id_node() RETURNS INTEGER LANGUAGE sql AS $$
+    SELECT nextval('ticket_id_node_seq')::INTEGER;
+$$;
+
 -- Note: Enable Row Level Security (RLS) if needed, 
 -- or disable it for testing in the Supabase Dashboard.
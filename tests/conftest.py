@@ -0,0 +1,15 @@
+import pytest
+import database
+from postgrest_stub import start_stub_server
+
+
+@pytest.fixture
+def supabase(monkeypatch):
+    """A fresh PostgREST stub with database.py pointed at it. Yields the stub server."""
+    server, url = start_stub_server()
+    monkeypatch.setattr(database, "SUPABASE_URL", url)
+    monkeypatch.setattr(database, "SUPABASE_KEY", "test-key")
+    monkeypatch.setattr(database, "AUDIT_LOG_ASYNC", False)
+    monkeypatch.setattr(database, "_client", None)
+    yield server
+    server.shutdown()
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+import analytics_store
+import database
+
+
+@pytest.fixture
+def replica(supabase, tmp_path, monkeypatch):
+    monkeypatch.setattr(analytics_store, "ANALYTICS_DB_PATH", str(tmp_path / "analytics.duckdb"))
+    monkeypatch.setattr(analytics_store, "_conn", None)
+    return supabase
+
+
+def _count(table):
+    return analytics_store.get_connection().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_picks_up_rows_that_commit_behind_the_watermark(replica):
+    for i in range(3):
+        database.create_ticket(f"T{i}", "u1", f"Ticket {i}", "")
+    # T1's transaction took its id and created_at first but has not committed yet
+    in_flight = {table: [row for row in replica.store[table] if row["ticket_id"] == "T1"]
+                 for table in ("tickets", "ticket_logs")}
+    for table, rows in in_flight.items():
+        replica.store[table] = [row for row in replica.store[table] if row not in rows]
+    analytics_store.sync_replica()
+    assert (_count("tickets"), _count("ticket_logs")) == (2, 2)
+
+    for table, rows in in_flight.items():
+        replica.store[table].extend(rows)
+    analytics_store.sync_replica()
+    assert (_count("tickets"), _count("ticket_logs")) == (3, 3)
+
+
+def test_full_sync_reaches_past_the_overlap(replica, monkeypatch):
+    monkeypatch.setattr(analytics_store, "ANALYTICS_SYNC_OVERLAP_IDS", 0)
+    monkeypatch.setattr(analytics_store, "ANALYTICS_SYNC_OVERLAP_SECONDS", 0)
+    database.create_ticket("T1", "u1", "Ticket", "")
+    analytics_store.sync_replica()
+
+    old = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+    replica.store["tickets"].append({"ticket_id": "OLD", "user_id": "u1", "title": "Old", "created_at": old})
+    analytics_store.sync_replica()
+    assert _count("tickets") == 1
+
+    monkeypatch.setattr(analytics_store, "ANALYTICS_FULL_SYNC_HOURS", 0)
+    analytics_store.sync_replica()
+    assert _count("tickets") == 2
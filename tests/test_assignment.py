@@ -0,0 +1,36 @@
+import pytest
+from assignment import parse_assignment, extract_json_objects
+
+ASSIGNMENT = '{"category": "Payments", "severity": "P1", "priority": "High", "manager_id": 1, "reason": "Refund issue"}'
+
+
+def test_parses_json_inside_prose():
+    text = f"Thought: I now know the final answer\nFinal Answer: Here is the assignment: {ASSIGNMENT} Let me know."
+    assignment = parse_assignment(text)
+    assert assignment.category == "Payments"
+    assert assignment.manager_id == 1
+
+
+def test_parses_fenced_json():
+    text = f"The ticket is a billing problem.\n```json\n{ASSIGNMENT}\n```\n"
+    assert parse_assignment(text).priority == "High"
+
+
+def test_uses_last_valid_object():
+    draft = ASSIGNMENT.replace('"manager_id": 1', '"manager_id": 4')
+    assert parse_assignment(f"Draft: {draft}\nFinal: {ASSIGNMENT}").manager_id == 1
+    assert parse_assignment(f"Final: {ASSIGNMENT}\nSchema: {{\"type\": \"object\"}}").manager_id == 1
+
+
+def test_rejects_unknown_manager():
+    with pytest.raises(ValueError):
+        parse_assignment(ASSIGNMENT, manager_ids={2, 3})
+
+
+def test_rejects_text_without_json():
+    with pytest.raises(ValueError, match="No JSON object"):
+        parse_assignment("I could not decide on a manager.")
+
+
+def test_stray_braces_do_not_hide_the_answer():
+    assert len(extract_json_objects("{" * 10000 + ASSIGNMENT)) == 1
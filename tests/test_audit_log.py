@@ -0,0 +1,75 @@
+import threading
+import httpx
+import pytest
+from postgrest.exceptions import APIError
+from audit_log import AuditWriter, is_rejection
+
+
+class FakeTable:
+    """insert_rows stand-in: rejects rows for unknown tickets, can be taken offline."""
+
+    def __init__(self):
+        self.rows = []
+        self.online = True
+
+    def insert(self, rows):
+        if not self.online:
+            raise httpx.ConnectError("connection refused")
+        if any(row["ticket_id"] == "DELETED" for row in rows):
+            raise APIError({"code": "23503", "message": "violates foreign key constraint"})
+        self.rows.extend(rows)
+
+
+@pytest.fixture
+def table():
+    return FakeTable()
+
+
+@pytest.fixture
+def writer(table, tmp_path):
+    return AuditWriter(table.insert, batch_size=4, spool_path=str(tmp_path / "spool.jsonl"),
+                       dead_letter_path=str(tmp_path / "rejected.jsonl"))
+
+
+def _entries(*ticket_ids):
+    return [{"ticket_id": t, "action": "Note", "details": "", "timestamp": f"2026-01-01T00:00:0{i}"}
+            for i, t in enumerate(ticket_ids)]
+
+
+def test_classifies_errors():
+    assert is_rejection(APIError({"code": "23503", "message": "fk"}))
+    assert is_rejection(APIError({"code": "22P05", "message": "unsupported Unicode escape"}))
+    assert not is_rejection(APIError({"code": "PGRST000", "message": "could not connect"}))
+    assert not is_rejection(httpx.ConnectError("refused"))
+
+
+def test_rejected_row_is_dead_lettered_and_the_rest_written(writer, table, tmp_path):
+    writer._flush_batch(_entries("T1", "T2", "DELETED", "T3", "T4"))
+    assert [row["ticket_id"] for row in table.rows] == ["T1", "T2", "T3", "T4"]
+    assert "DELETED" in (tmp_path / "rejected.jsonl").read_text()
+    assert not (tmp_path / "spool.jsonl").exists()
+
+
+def test_connection_error_spools_and_replays_in_order(writer, table, tmp_path):
+    table.online = False
+    writer._flush_batch(_entries("T1", "T2"))
+    assert len(writer._read_spool()) == 2
+    table.online = True
+    writer._flush_batch(_entries("T3"))
+    assert [row["ticket_id"] for row in table.rows] == ["T1", "T2", "T3"]
+    assert not (tmp_path / "spool.jsonl").exists()
+
+
+def test_writers_sharing_a_spool_do_not_lose_entries(table, tmp_path):
+    # Two writers stand in for the app and `launcher classify` spooling to the same file
+    paths = dict(spool_path=str(tmp_path / "spool.jsonl"), dead_letter_path=str(tmp_path / "rejected.jsonl"))
+    writers = [AuditWriter(table.insert, **paths), AuditWriter(table.insert, **paths)]
+    table.online = False
+    threads = [threading.Thread(target=writers[i % 2]._flush_batch, args=(_entries(f"T{i}"),)) for i in range(40)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    table.online = True
+    writers[0]._flush_batch([])
+    assert sorted(row["ticket_id"] for row in table.rows) == sorted(f"T{i}" for i in range(40))
@@ -0,0 +1,59 @@
+import pytest
+from postgrest.exceptions import APIError
+import database
+import launcher
+
+
+def test_creates_ticket_with_log(supabase):
+    ticket_id = database.create_ticket_with_new_id("u1", "Login", "Cannot log in", name="Ana", email="ana@example.com")
+    ticket = database.get_ticket(ticket_id)
+    assert ticket.iloc[0]["title"] == "Login"
+    assert [log["action"] for log in database.get_ticket_logs(ticket_id)] == ["Ticket Created"]
+
+
+def test_reopen_clears_resolved_at(supabase):
+    ticket_id = database.create_ticket_with_new_id("u1", "Login", "Cannot log in")
+    database.resolve_ticket(ticket_id, "Reset the password")
+    assert database.get_ticket(ticket_id).iloc[0]["resolved_at"] is not None
+    database.reopen_ticket(ticket_id)
+    ticket = database.get_ticket(ticket_id).iloc[0]
+    assert ticket["status"] == "Open"
+    assert ticket["resolved_at"] is None
+
+
+def test_retries_with_new_id_on_duplicate(supabase, monkeypatch):
+    create_ticket = database.create_ticket
+    attempts = []
+
+    def clashing_create(ticket_id, *args):
+        attempts.append(ticket_id)
+        if len(attempts) == 1:
+            raise APIError({"code": "23505", "message": "duplicate key value violates unique constraint"})
+        return create_ticket(ticket_id, *args)
+
+    monkeypatch.setattr(database, "create_ticket", clashing_create)
+    ticket_id = database.create_ticket_with_new_id("u1", "Login", "Cannot log in")
+    assert len(attempts) == 2
+    assert ticket_id == attempts[1] != attempts[0]
+
+
+def test_other_errors_are_not_retried(supabase, monkeypatch):
+    def failing_create(*args):
+        raise APIError({"code": "23503", "message": "foreign key violation"})
+
+    monkeypatch.setattr(database, "create_ticket", failing_create)
+    with pytest.raises(APIError):
+        database.create_ticket_with_new_id("u1", "Login", "Cannot log in")
+
+
+def test_import_moves_clashing_ids_but_not_its_own_rows(supabase, monkeypatch):
+    client = database.get_supabase_client()
+    client.table("tickets").insert({"ticket_id": "TKT-1", "user_id": "other", "title": "Someone else's"}).execute()
+    client.table("tickets").insert({"ticket_id": "TKT-2", "user_id": "u1", "title": "Mine"}).execute()
+    monkeypatch.setattr(launcher, "allocate_ticket_ids", lambda n: ["TKT-3"][:n])
+
+    generated = [{"ticket_id": "TKT-1", "user_id": "u1", "title": "Clash"},
+                 {"ticket_id": "TKT-2", "user_id": "u1", "title": "Mine"}]
+    inserted = launcher._reinsert_id_clashes(generated, set())
+    assert [t["ticket_id"] for t in inserted] == ["TKT-3"]
+    assert database.get_tickets_by_ids(["TKT-3"])[0]["title"] == "Clash"
@@ -0,0 +1,92 @@
+import socket
+import pytest
+import email_service
+from email_service import EmailSender, SMTPSender, claim_emails, queue_email, get_outbox_stats
+from smtp_stub import start_smtp_stub
+
+
+@pytest.fixture
+def outbox(tmp_path, monkeypatch):
+    monkeypatch.setattr(email_service, "EMAIL_OUTBOX_PATH", str(tmp_path / "outbox.db"))
+    monkeypatch.setattr(email_service, "_schema_ready", False)
+
+
+@pytest.fixture
+def smtp():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    controller, handler = start_smtp_stub(port, refuse={"missing@example.com"})
+    yield handler, SMTPSender(host="127.0.0.1", port=port, user="", password="", starttls=False)
+    controller.stop()
+
+
+def _queue(recipient):
+    return queue_email(recipient, "ticket_resolved", {"ticket_id": "T-1", "ticket_title": "Login",
+                                                      "resolution_notes": "Reset"}, ticket_id="T-1")
+
+
+def test_sends_batch_over_one_session(outbox, smtp):
+    handler, sender = smtp
+    for i in range(3):
+        _queue(f"user{i}@example.com")
+    assert EmailSender(smtp=sender).send_batch() == 3
+    sender.close()
+    assert len(handler.messages) == 3
+    assert handler.sessions == 1
+    assert get_outbox_stats() == {"sent": 3}
+
+
+def test_leased_email_is_not_claimed_twice(outbox):
+    _queue("user@example.com")
+    assert len(claim_emails("worker-a")) == 1
+    assert claim_emails("worker-b") == []
+
+
+def test_expired_lease_is_reclaimed(outbox, monkeypatch):
+    _queue("user@example.com")
+    monkeypatch.setattr(email_service, "EMAIL_LEASE_SECONDS", -1)
+    claim_emails("worker-a")
+    [email] = claim_emails("worker-b")
+    assert email["attempts"] == 2
+    # worker-a lost the lease, so it cannot renew it
+    assert email_service.renew_leases("worker-a", [email["id"]]) == set()
+
+
+def test_refused_recipient_is_dead_lettered_immediately(outbox, smtp):
+    handler, sender = smtp
+    _queue("missing@example.com")
+    _queue("user@example.com")
+    EmailSender(smtp=sender).send_batch()
+    sender.close()
+    assert get_outbox_stats() == {"dead": 1, "sent": 1}
+
+
+def test_transient_failure_retries_then_dead_letters(outbox, monkeypatch):
+    class Unreachable:
+        last_used = 0.0
+
+        def send(self, msg):
+            raise ConnectionRefusedError("connection refused")
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(email_service, "EMAIL_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(email_service, "EMAIL_RETRY_BACKOFF_SECONDS", 0)
+    _queue("user@example.com")
+    sender = EmailSender(smtp=Unreachable())
+    sender.send_batch()
+    assert get_outbox_stats() == {"queued": 1}
+    sender.send_batch()
+    assert get_outbox_stats() == {"dead": 1}
+
+
+def test_purges_old_sent_emails(outbox, smtp):
+    handler, sender = smtp
+    _queue("user@example.com")
+    EmailSender(smtp=sender).send_batch()
+    sender.close()
+    assert email_service.purge_sent(retention_days=1) == 0
+    assert email_service.purge_sent(retention_days=-1) == 1
+    assert get_outbox_stats() == {}
@@ -0,0 +1,42 @@
+import itertools
+import pandas as pd
+import pytest
+import fast_path
+from fast_path import FastPathClassifier, evaluate
+
+SKILL_GROUPS = {1: "support", 6: "support", 4: "sre", 5: "security"}
+HISTORY = pd.DataFrame([
+    {"title": "Charged twice", "description": "I need a refund for the double charge", "assigned_to": 1},
+    {"title": "Refund", "description": "payment failed but I was charged", "assigned_to": 6},
+    {"title": "Site is down", "description": "503 server error everywhere", "assigned_to": 4},
+    {"title": "Question", "description": "How do I change my display name?", "assigned_to": 1},
+])
+
+
+class RotatingIndex:
+    """Load index stand-in whose least-loaded manager changes on every call."""
+
+    def __init__(self, members):
+        self.members = {group: itertools.cycle(ids) for group, ids in members.items()}
+
+    def least_loaded(self, skill_group):
+        return next(self.members[skill_group]) if skill_group in self.members else None
+
+
+@pytest.fixture
+def rotating_load(monkeypatch):
+    monkeypatch.setattr(fast_path, "get_load_index", lambda: RotatingIndex({"support": [6, 1], "sre": [4]}))
+
+
+def test_rules_need_two_signals(rotating_load):
+    classifier = FastPathClassifier(model=None)
+    assert classifier.rules.classify("How do I request a refund?", "") is None
+    assert classifier.classify("Charged twice", "I need a refund") is not None
+
+
+def test_evaluation_scores_skill_groups_not_current_load(rotating_load):
+    classifier = FastPathClassifier(model=None)
+    first, second = evaluate(classifier, HISTORY, SKILL_GROUPS), evaluate(classifier, HISTORY, SKILL_GROUPS)
+    assert first["precision"] == second["precision"] == 1.0
+    assert first["coverage"] == 0.75
+    assert first["per_skill_group"]["support"]["recall"] == pytest.approx(2 / 3)
@@ -0,0 +1,135 @@
+import time
+import threading
+import pytest
+import job_queue
+from job_queue import (WorkerPool, claim_job, complete_job, enqueue_ticket, enqueue_tickets, fail_job,
+                       get_queue_stats, non_high_capacity, parse_lane_limits)
+
+HIGH = {"title": "Production outage", "description": "Payments are down for everyone, urgent"}
+NORMAL = {"title": "Login", "description": "cannot log in"}
+LOW = {"title": "Typo", "description": "dark mode suggestion"}
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_QUEUE_PATH", str(tmp_path / "jobs.db"))
+    monkeypatch.setattr(job_queue, "_schema_ready", False)
+    monkeypatch.setattr(job_queue, "JOB_POLL_INTERVAL", 0.01)
+
+
+def _tickets(prefix, template, n):
+    return [dict(template, ticket_id=f"{prefix}{i}") for i in range(n)]
+
+
+def test_one_active_job_per_ticket(queue):
+    assert enqueue_ticket(dict(NORMAL, ticket_id="T1"))
+    assert not enqueue_ticket(dict(NORMAL, ticket_id="T1"))
+    assert enqueue_tickets(_tickets("T", NORMAL, 3)) == 2
+
+
+def test_claim_leases_and_completes(queue):
+    enqueue_ticket(dict(NORMAL, ticket_id="T1"))
+    job_id, ticket, attempts, lane = claim_job("worker")
+    assert (ticket["ticket_id"], attempts) == ("T1", 1)
+    assert claim_job("other") is None
+    assert complete_job(job_id, "worker")
+    assert get_queue_stats() == {"done": 1}
+
+
+def test_failed_job_retries_then_dead_letters(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(job_queue, "JOB_RETRY_BACKOFF_SECONDS", 0)
+    enqueue_ticket(dict(NORMAL, ticket_id="T1"))
+    job_id, _, attempts, _ = claim_job("worker")
+    assert fail_job(job_id, "worker", attempts, "boom") is False
+    job_id, _, attempts, _ = claim_job("worker")
+    assert attempts == 2
+    assert fail_job(job_id, "worker", attempts, "boom") is True
+    assert get_queue_stats() == {"failed": 1}
+
+
+def test_expired_lease_is_reclaimed(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", -1)
+    enqueue_ticket(dict(NORMAL, ticket_id="T1"))
+    claim_job("crashed-worker")
+    assert claim_job("worker")[2] == 2
+
+
+def test_stale_worker_cannot_finish_a_reclaimed_job(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", -1)
+    enqueue_ticket(dict(NORMAL, ticket_id="T1"))
+    job_id = claim_job("slow-worker")[0]
+    claim_job("worker")
+    assert not complete_job(job_id, "slow-worker")
+    assert fail_job(job_id, "slow-worker", 1, "late failure") is None
+    assert get_queue_stats() == {"leased": 1}
+    assert complete_job(job_id, "worker")
+
+
+def test_expired_lease_on_last_attempt_is_dead_lettered(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_MAX_ATTEMPTS", 1)
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", -1)
+    monkeypatch.setattr(job_queue, "_log_dead_lettered", lambda dead: None)
+    enqueue_tickets(_tickets("N", NORMAL, 1))
+    assert claim_job("worker") is not None
+    assert claim_job("worker") is None
+    assert get_queue_stats() == {"failed": 1}
+
+
+def test_purges_only_old_done_jobs(queue):
+    enqueue_tickets(_tickets("T", NORMAL, 2))
+    complete_job(claim_job("worker")[0], "worker")
+    assert job_queue.purge_finished_jobs(retention_days=1) == 0
+    assert job_queue.purge_finished_jobs(retention_days=-1) == 1
+    assert get_queue_stats() == {"queued": 1}
+
+
+def test_lane_limit_defaults_and_overrides():
+    assert parse_lane_limits(4, "") == {"high": 4, "normal": 3, "low": 1}
+    assert parse_lane_limits(4, "normal:2, low:2") == {"high": 4, "normal": 2, "low": 2}
+    with pytest.raises(ValueError):
+        parse_lane_limits(4, "urgent:1")
+    assert non_high_capacity(4) == 3
+    assert non_high_capacity(1) == 1
+
+
+def test_claims_high_lane_first(queue):
+    enqueue_tickets(_tickets("L", LOW, 2) + _tickets("N", NORMAL, 2) + _tickets("H", HIGH, 1))
+    lanes = []
+    while job := claim_job("worker"):
+        lanes.append(job[3])
+    assert lanes == ["high", "normal", "normal", "low", "low"]
+
+
+def test_claim_skips_lanes_not_offered(queue):
+    enqueue_tickets(_tickets("N", NORMAL, 1))
+    assert claim_job("worker", ["high"]) is None
+    assert claim_job("worker", ["high", "normal"])[3] == "normal"
+
+
+def test_pool_keeps_a_worker_free_for_high(queue):
+    enqueue_tickets(_tickets("N", NORMAL, 6) + _tickets("L", LOW, 6))
+    running = {"now": 0, "peak": 0, "low_peak": 0, "low": 0}
+    lock = threading.Lock()
+
+    def handler(ticket):
+        low = ticket["ticket_id"].startswith("L")
+        with lock:
+            running["now"] += 1
+            running["low"] += low
+            running["peak"] = max(running["peak"], running["now"])
+            running["low_peak"] = max(running["low_peak"], running["low"])
+        time.sleep(0.05)
+        with lock:
+            running["now"] -= 1
+            running["low"] -= low
+
+    pool = WorkerPool(size=4, handler=handler)
+    pool.start()
+    deadline = time.monotonic() + 10
+    while get_queue_stats().get("done", 0) < 12 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    pool.stop(1)
+    assert get_queue_stats() == {"done": 12}
+    assert running["peak"] == 3
+    assert running["low_peak"] == 1
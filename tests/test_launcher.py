@@ -0,0 +1,32 @@
+import json
+import pytest
+import database
+import launcher
+
+
+class Interrupted(Exception):
+    pass
+
+
+def test_resumed_chunk_does_not_reject_rows_again(supabase, monkeypatch, tmp_path, capsys):
+    source = tmp_path / "legacy.jsonl"
+    source.write_text("\n".join(json.dumps(row) for row in [
+        {"title": "Login", "description": "Cannot log in", "user_id": "u1"},
+        {"title": "Broken", "description": "Bad status", "user_id": "u2", "status": "archived"},
+        {"title": "VPN", "description": "VPN drops", "user_id": "u3"},
+    ]))
+    bulk_import = database.bulk_import_tickets
+
+    def interrupted_import(users, tickets):
+        raise Interrupted()
+
+    monkeypatch.setattr(database, "bulk_import_tickets", interrupted_import)
+    with pytest.raises(Interrupted):
+        launcher.import_tickets(str(source))
+    monkeypatch.setattr(database, "bulk_import_tickets", bulk_import)
+    launcher.import_tickets(str(source))
+
+    rejected = (tmp_path / "legacy.jsonl.rejected.jsonl").read_text().splitlines()
+    assert [json.loads(line)["row"] for line in rejected] == [2]
+    assert "0 rows rejected (plus 1 in earlier runs)" in capsys.readouterr().out
+    assert sorted(t["title"] for t in supabase.store["tickets"]) == ["Login", "VPN"]
@@ -0,0 +1,70 @@
+import pytest
+import llm_provider
+from llm_provider import FakeLLM, ResilientLLM, ResponseCache
+from assignment import parse_assignment
+
+PROMPT = "Title: I was charged twice for my refund. Reply with the manager_id."
+
+
+class FlakyLLM(FakeLLM):
+    """FakeLLM that raises the given errors before answering."""
+
+    def __init__(self, errors, **kwargs):
+        super().__init__(**kwargs)
+        self.errors = list(errors)
+        self.calls = 0
+
+    def call(self, messages, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return super().call(messages, **kwargs)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(llm_provider.time, "sleep", delays.append)
+    return delays
+
+
+def test_fake_llm_is_deterministic_and_parseable():
+    first, second = FakeLLM().call(PROMPT), FakeLLM().call(PROMPT)
+    assert first == second
+    assignment = parse_assignment(first)
+    assert (assignment.category, assignment.manager_id) == ("Payments", 1)
+
+
+def test_retries_transient_errors_with_bounded_backoff(sleeps, monkeypatch):
+    monkeypatch.setattr(llm_provider, "LLM_BACKOFF_BASE_SECONDS", 1.0)
+    monkeypatch.setattr(llm_provider, "LLM_BACKOFF_MAX_SECONDS", 3.0)
+    inner = FlakyLLM([RuntimeError("429 rate limit exceeded")] * 3)
+    llm = ResilientLLM(inner, max_retries=5)
+
+    assert "Final Answer" in llm.call(PROMPT)
+    assert inner.calls == 4
+    assert len(sleeps) == 3
+    # Full jitter: each delay is drawn from [0, min(max, base * 2 ** attempt)]
+    assert all(0 <= delay <= bound for delay, bound in zip(sleeps, (2.0, 3.0, 3.0)))
+
+
+def test_gives_up_after_max_retries(sleeps):
+    inner = FlakyLLM([RuntimeError("503 unavailable")] * 5)
+    with pytest.raises(RuntimeError, match="503"):
+        ResilientLLM(inner, max_retries=2).call(PROMPT)
+    assert inner.calls == 3
+
+
+def test_does_not_retry_permanent_errors(sleeps):
+    inner = FlakyLLM([ValueError("invalid api key")])
+    with pytest.raises(ValueError):
+        ResilientLLM(inner, max_retries=5).call(PROMPT)
+    assert inner.calls == 1
+    assert sleeps == []
+
+
+def test_cached_response_skips_the_model(tmp_path):
+    inner = FlakyLLM([])
+    llm = ResilientLLM(inner, cache=ResponseCache(str(tmp_path / "llm_cache.db")))
+    assert llm.call(PROMPT) == llm.call(PROMPT)
+    assert inner.calls == 1
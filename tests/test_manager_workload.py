@@ -0,0 +1,36 @@
+import pytest
+import database
+from manager_workload import ManagerLoadIndex
+
+
+def _manager(manager_id, skill_group, open_tickets):
+    return {"manager_id": manager_id, "name": f"Manager {manager_id}", "role": "Lead",
+            "skill_group": skill_group, "open_tickets": open_tickets}
+
+
+@pytest.fixture
+def index(monkeypatch):
+    roster = [_manager(1, "support", 6), _manager(2, "support", 1), _manager(4, "sre", 9)]
+    monkeypatch.setattr(database, "get_manager_workload", lambda: [dict(m) for m in roster])
+    return ManagerLoadIndex(refresh_seconds=60, threshold=2)
+
+
+def test_moves_ticket_to_less_loaded_peer(index):
+    assert index.assign(1) == (2, 6, 1)
+    assert index.open_counts() == {"1": 6, "2": 2, "4": 9}
+
+
+def test_single_member_group_keeps_its_tickets(index):
+    assert index.assign(4) == (4, 9, 9)
+    assert index.least_loaded("sre") == 4
+
+
+def test_least_loaded_in_group(index):
+    assert index.least_loaded("support") == 2
+    assert index.least_loaded("billing") is None
+
+
+def test_release_undoes_a_failed_assignment(index):
+    chosen, _, _ = index.assign(1)
+    index.adjust(chosen, -1)
+    assert index.open_counts()["2"] == 1
@@ -0,0 +1,25 @@
+import database
+import ticket_ids
+from ticket_ids import TicketIdGenerator, parse_ticket_id
+
+
+def test_processes_without_a_node_claim_distinct_ones(supabase, monkeypatch):
+    monkeypatch.setattr(ticket_ids, "TICKET_ID_NODE", None)
+    first, second = TicketIdGenerator(), TicketIdGenerator()
+    assert first.node != second.node
+    assert parse_ticket_id(first.next_id())[1] == first.node
+
+
+def test_falls_back_to_host_and_pid_without_a_database(monkeypatch, capsys):
+    def unavailable():
+        raise ConnectionError("no database")
+
+    monkeypatch.setattr(ticket_ids, "TICKET_ID_NODE", None)
+    monkeypatch.setattr(database, "claim_ticket_id_node", unavailable)
+    assert 0 <= TicketIdGenerator().node <= ticket_ids.MAX_NODE
+    assert "set TICKET_ID_NODE" in capsys.readouterr().out
+
+
+def test_configured_node_is_used(monkeypatch):
+    monkeypatch.setattr(ticket_ids, "TICKET_ID_NODE", "42")
+    assert TicketIdGenerator().node == 42
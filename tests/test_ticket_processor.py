@@ -0,0 +1,60 @@
+import pytest
+import ticket_processor
+
+DECISION = {"category": "Payments", "severity": "p1", "priority": "high", "manager_id": 9,
+            "reason": "Refund issue", "source": "rule", "confidence": 0.95}
+
+
+class CrewStarted(Exception):
+    pass
+
+
+@pytest.fixture
+def logs(monkeypatch):
+    logs = []
+    monkeypatch.setattr(ticket_processor, "log_action", lambda ticket_id, action, details: logs.append(action))
+    monkeypatch.setattr(ticket_processor, "active_manager_ids", lambda: {1, 2})
+    monkeypatch.setattr(ticket_processor, "find_similar", lambda title, description: None)
+    return logs
+
+
+def _start_crew():
+    raise CrewStarted()
+
+
+def test_fast_path_decision_for_inactive_manager_goes_to_crew(logs, monkeypatch):
+    monkeypatch.setattr(ticket_processor, "fast_classify", lambda title, description: dict(DECISION))
+    monkeypatch.setattr(ticket_processor, "get_agents", _start_crew)
+    with pytest.raises(CrewStarted):
+        ticket_processor.process_ticket({"ticket_id": "T1", "title": "Refund", "description": "Charged twice"})
+    assert logs == ["AI Assignment Rejected"]
+
+
+def test_fast_path_decision_is_saved_normalized(logs, monkeypatch):
+    saved = []
+    monkeypatch.setattr(ticket_processor, "fast_classify", lambda title, description: dict(DECISION, manager_id=1))
+    monkeypatch.setattr(ticket_processor, "balance_assignment", lambda manager_id: (manager_id, None))
+    monkeypatch.setattr(ticket_processor, "update_ticket_assignment", lambda **kwargs: saved.append(kwargs))
+    monkeypatch.setattr(ticket_processor, "remember", lambda *args: None)
+    ticket_processor.process_ticket({"ticket_id": "T1", "title": "Refund", "description": "Charged twice"})
+    assert (saved[0]["severity"], saved[0]["priority"], saved[0]["assigned_to_id"]) == ("P1", "High", 1)
+    assert logs == ["AI Fast-Path Assigned"]
+
+
+def test_rebalance_is_logged_only_after_the_assignment_is_saved(logs, monkeypatch):
+    released = []
+
+    def failing_update(**kwargs):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(ticket_processor, "balance_assignment", lambda manager_id: (2, "moved to manager 2"))
+    monkeypatch.setattr(ticket_processor, "update_ticket_assignment", failing_update)
+    monkeypatch.setattr(ticket_processor, "ticket_released", released.append)
+    with pytest.raises(RuntimeError):
+        ticket_processor._save_assignment("T1", dict(DECISION, manager_id=1))
+    assert released == [2]
+    assert logs == []
+
+    monkeypatch.setattr(ticket_processor, "update_ticket_assignment", lambda **kwargs: None)
+    ticket_processor._save_assignment("T1", dict(DECISION, manager_id=1))
+    assert logs == ["Assignment Rebalanced"]
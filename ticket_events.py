@@ -0,0 +1,86 @@
+import os
+import json
+import time
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Direct Postgres connection string (Supabase: Settings -> Database -> Connection string).
+# When set, a single LISTEN connection per process receives changes made by other processes.
+DATABASE_URL = os.getenv("DATABASE_URL")
+NOTIFY_CHANNEL = "ticket_events"
+
+_versions = {}
+_versions_lock = threading.Lock()
+_subscribers = []
+
+
+def publish(ticket_id, kind="changed"):
+    """
+    Records a change to a ticket and notifies the subscribers.
+    """
+    with _versions_lock:
+        _versions[ticket_id] = _versions.get(ticket_id, 0) + 1
+    for callback in list(_subscribers):
+        try:
+            callback(ticket_id, kind)
+        except Exception as e:
+            print(f"⚠️ Ticket event subscriber failed: {e}")
+
+
+def subscribe(callback):
+    """
+    Registers callback(ticket_id, kind) for every published change.
+    """
+    _subscribers.append(callback)
+
+
+def get_version(ticket_id):
+    with _versions_lock:
+        return _versions.get(ticket_id, 0)
+
+
+def _listen_forever():
+    import psycopg
+
+    backoff = 1
+    while True:
+        try:
+            with psycopg.connect(DATABASE_URL, autocommit=True) as conn:
+                conn.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                backoff = 1
+                for notify in conn.notifies():
+                    try:
+                        event = json.loads(notify.payload)
+                        publish(event["ticket_id"], event.get("kind", "changed"))
+                    except (ValueError, KeyError) as e:
+                        print(f"⚠️ Ignoring malformed ticket event {notify.payload!r}: {e}")
+        except Exception as e:
+            print(f"⚠️ Ticket event listener disconnected, retrying in {backoff}s: {e}")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def start_listener():
+    """
+    Starts the shared LISTEN/NOTIFY subscriber once per process. Without
+    DATABASE_URL (or psycopg) only changes made by this process are seen.
+    """
+    global _listener
+    if not DATABASE_URL:
+        return None
+    with _listener_lock:
+        if _listener is None:
+            try:
+                import psycopg  # noqa: F401
+            except ImportError:
+                print("⚠️ psycopg is not installed; realtime ticket updates are limited to this process.")
+                return None
+            _listener = threading.Thread(target=_listen_forever, name="ticket-events-listener", daemon=True)
+            _listener.start()
+        return _listener
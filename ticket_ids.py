@@ -0,0 +1,122 @@
+import os
+import re
+import time
+import socket
+import zlib
+import threading
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TICKET_ID_PREFIX = "TRU"
+# Each process that creates tickets needs its own node (0-999) so concurrent processes never
+# generate the same ID. Unset, the node is claimed from a database sequence at startup
+# (migrations/0009_ticket_id_nodes.sql); only if that fails is it derived from hostname + pid,
+# which two processes can share. The tickets primary key catches a clash either way and the
+# ticket is retried under a new ID (database.create_ticket_with_new_id, launcher.import_tickets).
+TICKET_ID_NODE = os.getenv("TICKET_ID_NODE")
+
+MAX_NODE = 999
+MAX_SEQUENCE = 9999
+
+# TRU-<UTC yyyymmddHHMMSSmmm>-<node:3><sequence:4>
+_ID_PATTERN = re.compile(r"^(?P<prefix>[A-Z]+)-(?P<ts>\d{17})-(?P<node>\d{3})(?P<seq>\d{4})$")
+
+
+def default_node():
+    if TICKET_ID_NODE is not None:
+        return int(TICKET_ID_NODE) % (MAX_NODE + 1)
+    try:
+        from database import claim_ticket_id_node
+
+        return int(claim_ticket_id_node()) % (MAX_NODE + 1)
+    except Exception as e:
+        print(f"⚠️ Could not claim a ticket ID node, deriving it from host and pid (set TICKET_ID_NODE): {e}")
+        return zlib.crc32(f"{socket.gethostname()}:{os.getpid()}".encode()) % (MAX_NODE + 1)
+
+
+def format_ticket_id(millis, node, sequence, prefix=TICKET_ID_PREFIX):
+    stamp = datetime.fromtimestamp(millis // 1000, timezone.utc).strftime("%Y%m%d%H%M%S")
+    return f"{prefix}-{stamp}{millis % 1000:03d}-{node:03d}{sequence:04d}"
+
+
+def parse_ticket_id(ticket_id):
+    """
+    Returns (created_at, node, sequence) for IDs from this generator, or None
+    for other formats (e.g. legacy TRU-YYYYMMDDHHMM-NNN IDs).
+    """
+    match = _ID_PATTERN.match(ticket_id)
+    if not match:
+        return None
+    created_at = datetime.strptime(match["ts"][:14], "%Y%m%d%H%M%S").replace(
+        microsecond=int(match["ts"][14:]) * 1000, tzinfo=timezone.utc)
+    return created_at, int(match["node"]), int(match["seq"])
+
+
+class TicketIdGenerator:
+    """
+    Snowflake-style ID source: UTC milliseconds, a node number and a per-millisecond
+    sequence, rendered as fixed-width digits so string order is creation order.
+    The timestamp is when the ID was generated: bulk-imported tickets carry the
+    import time, not their original created_at.
+    IDs from one generator are strictly increasing even if the wall clock steps
+    back or more than MAX_SEQUENCE IDs are needed in one millisecond (the
+    timestamp then runs slightly ahead until the clock catches up).
+    Because new IDs sort after existing ones, inserts land at the right edge
+    of the tickets primary-key index.
+    """
+
+    def __init__(self, node=None, prefix=TICKET_ID_PREFIX, clock=time.time):
+        self.node = default_node() if node is None else node
+        if not 0 <= self.node <= MAX_NODE:
+            raise ValueError(f"Ticket ID node must be between 0 and {MAX_NODE}")
+        self.prefix = prefix
+        self.clock = clock
+        self._last_millis = -1
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def _next_slot(self):
+        millis = int(self.clock() * 1000)
+        if millis > self._last_millis:
+            self._last_millis, self._sequence = millis, 0
+        elif self._sequence < MAX_SEQUENCE:
+            self._sequence += 1
+        else:
+            self._last_millis, self._sequence = self._last_millis + 1, 0
+        return self._last_millis, self._sequence
+
+    def next_id(self):
+        with self._lock:
+            millis, sequence = self._next_slot()
+        return format_ticket_id(millis, self.node, sequence, self.prefix)
+
+    def allocate_block(self, count):
+        """
+        Reserves `count` consecutive IDs in one step, e.g. for a bulk import chunk.
+        """
+        with self._lock:
+            slots = [self._next_slot() for _ in range(count)]
+        return [format_ticket_id(millis, self.node, sequence, self.prefix) for millis, sequence in slots]
+
+
+_generator = None
+_generator_lock = threading.Lock()
+
+
+def get_generator():
+    global _generator
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                _generator = TicketIdGenerator()
+    return _generator
+
+
+def next_ticket_id():
+    return get_generator().next_id()
+
+
+def allocate_ticket_ids(count):
+    return get_generator().allocate_block(count)
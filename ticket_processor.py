@@ -1,98 +1,249 @@
 from crewai import Task, Crew, Process
-from agents import create_agents
+from agents import get_agents
 from database import update_ticket_assignment, log_action
-import json
-import re
+from dedup_cache import find_similar, remember
+from fast_path import classify as fast_classify
+from assignment import (TicketAssignment, ASSIGNMENT_REPAIR_ATTEMPTS, validate_assignment_output,
+                        parse_assignment, validate_assignment, active_manager_ids)
+from progress import ProgressReporter, CREW_VERBOSE
+from manager_workload import balance_assignment, ticket_released, format_roster
+from ticket_ids import parse_ticket_id
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+import metrics
+import time
+import os
 
-def process_ticket(ticket_data):
-    """
-    ticket_data: dictionary with ticket_id, title, description
-    """
-    ticket_id = ticket_data['ticket_id']
-    title = ticket_data['title']
-    description = ticket_data['description']
-    
-    agents = create_agents()
+load_dotenv()
+
+# "sequential": five chained LLM calls (original behaviour)
+# "parallel":   triage + analyst tasks fan out concurrently, then the Tech Lead joins them
+# "fast":       a single structured-output call by the Tech Lead
+PIPELINE_MODES = ("sequential", "parallel", "fast")
+PIPELINE_MODE = os.getenv("TRIAGE_PIPELINE_MODE", "parallel").lower()
+
+ASSIGNMENT_OUTPUT_FORMAT = """
+        Provide the output in JSON format:
+        {
+            "category": "...",
+            "severity": "...",
+            "priority": "...",
+            "manager_id": 1,
+            "reason": "..."
+        }
+        """
+
+def _assignment_instructions():
+    # Built per ticket so managers added or deactivated in the table show up without a restart
+    return f"""
+        1. Final Category
+        2. Severity (P0, P1, P2)
+        3. Priority (High, Medium, Low)
+        4. Assigned Manager ID (one of the available managers below)
+        5. Reason for assignment
+
+        Available Managers:
+{format_roster()}
+        """ + ASSIGNMENT_OUTPUT_FORMAT
+
+TICKETS_PROCESSED = metrics.counter(
+    "tickets_processed_total", "Tickets triaged, by the path that assigned them", ("path", "outcome"))
+PROCESSING_SECONDS = metrics.histogram("ticket_processing_seconds", "Time to triage one ticket", ("path",))
+TIME_TO_ASSIGNMENT = metrics.histogram(
+    "ticket_time_to_assignment_seconds", "Ticket creation to AI assignment", ("path",),
+    buckets=metrics.TICKET_AGE_BUCKETS)
+
+def _build_full_tasks(agents, title, description, parallel):
     triage_lead, support_analyst, sre_analyst, backend_analyst, tech_lead = agents
-    
-    # Define Tasks
+    ticket_text = f"Title: {title}, Description: {description}."
+
     triage_task = Task(
-        description=f"Analyze this ticket: Title: {title}, Description: {description}. Provide a concise summary and urgency assessment.",
+        description=f"Analyze this ticket: {ticket_text} Provide a concise summary and urgency assessment.",
         agent=triage_lead,
-        expected_output="A summary of the ticket and urgency level."
+        expected_output="A summary of the ticket and urgency level.",
+        async_execution=parallel
     )
-    
+
+    # In parallel mode the analysts read the ticket directly instead of waiting for the triage summary
+    classification_source = f"this ticket ({ticket_text})" if parallel else "the triage summary"
     classification_task = Task(
-        description="Based on the triage summary, classify this ticket into one of: Payments, Technical, Access, Infrastructure, or General.",
+        description=f"Based on {classification_source}, classify this ticket into one of: Payments, Technical, Access, Infrastructure, or General.",
         agent=support_analyst,
-        expected_output="The classification category."
+        expected_output="The classification category.",
+        async_execution=parallel
     )
-    
+
     sre_task = Task(
-        description="Analyze if this is an SRE/Infra issue. If so, explain why.",
+        description="Analyze if this is an SRE/Infra issue. If so, explain why." + (f" Ticket: {ticket_text}" if parallel else ""),
         agent=sre_analyst,
-        expected_output="Analysis of infra implications."
+        expected_output="Analysis of infra implications.",
+        async_execution=parallel
     )
-    
+
     backend_task = Task(
-        description="Analyze if this is a backend logic or database issue.",
+        description="Analyze if this is a backend logic or database issue." + (f" Ticket: {ticket_text}" if parallel else ""),
         agent=backend_analyst,
-        expected_output="Analysis of backend implications."
+        expected_output="Analysis of backend implications.",
+        async_execution=parallel
     )
-    
+
     assignment_task = Task(
-        description="""Synthesize all previous reports. 
-        Determine:
-        1. Final Category
-        2. Severity (P0, P1, P2)
-        3. Priority (High, Medium, Low)
-        4. Assigned Manager ID (1-5)
-        5. Reason for assignment
-        
-        Provide the output in JSON format:
-        {
-            "category": "...",
-            "severity": "...",
-            "priority": "...",
-            "manager_id": 1,
-            "reason": "..."
-        }
-        """,
+        description="""Synthesize all previous reports.
+        Determine:""" + _assignment_instructions(),
         agent=tech_lead,
         context=[triage_task, classification_task, sre_task, backend_task],
-        expected_output="A JSON object containing assignment details."
+        expected_output="A JSON object containing assignment details.",
+        response_model=TicketAssignment,
+        guardrail=validate_assignment_output,
+        guardrail_max_retries=ASSIGNMENT_REPAIR_ATTEMPTS
+    )
+
+    return agents, [triage_task, classification_task, sre_task, backend_task, assignment_task]
+
+def _build_fast_tasks(agents, title, description):
+    tech_lead = agents[-1]
+
+    triage_task = Task(
+        description=f"""Triage this ticket in a single pass: Title: {title}, Description: {description}.
+        Summarize the issue, classify it into one of: Payments, Technical, Access, Infrastructure, or General,
+        consider infrastructure and backend implications, and then determine:""" + _assignment_instructions(),
+        agent=tech_lead,
+        expected_output="A JSON object containing assignment details.",
+        response_model=TicketAssignment,
+        guardrail=validate_assignment_output,
+        guardrail_max_retries=ASSIGNMENT_REPAIR_ATTEMPTS
     )
-    
-    # Create Crew
-    crew = Crew(
-        agents=agents,
-        tasks=[triage_task, classification_task, sre_task, backend_task, assignment_task],
+
+    return [tech_lead], [triage_task]
+
+def build_crew(agents, title, description, mode=PIPELINE_MODE, task_callback=None, step_callback=None):
+    if mode not in PIPELINE_MODES:
+        raise ValueError(f"Unknown pipeline mode '{mode}'. Expected one of {PIPELINE_MODES}.")
+
+    if mode == "fast":
+        crew_agents, tasks = _build_fast_tasks(agents, title, description)
+    else:
+        crew_agents, tasks = _build_full_tasks(agents, title, description, parallel=(mode == "parallel"))
+
+    return Crew(
+        agents=crew_agents,
+        tasks=tasks,
         process=Process.sequential,
-        verbose=True
+        task_callback=task_callback,
+        step_callback=step_callback,
+        verbose=CREW_VERBOSE
     )
-    
+
+def _format_timings(mode, timings, total):
+    stages = ", ".join(f"{agent} +{elapsed:.1f}s" for agent, elapsed in timings)
+    return f"mode={mode} | {stages} | total {total:.1f}s"
+
+def _record_assignment(ticket_id, path, started):
+    TICKETS_PROCESSED.inc(path=path, outcome="assigned")
+    PROCESSING_SECONDS.observe(time.perf_counter() - started, path=path)
+    # Creation time (import time for imported tickets) is encoded in the ticket ID; legacy IDs are skipped
+    parsed = parse_ticket_id(ticket_id)
+    if parsed:
+        TIME_TO_ASSIGNMENT.observe((datetime.now(timezone.utc) - parsed[0]).total_seconds(), path=path)
+
+def _checked(ticket_id, data, source):
+    """
+    Validates a decision made without the crew like the Tech Lead's answer,
+    including the active-manager check. Returns it normalized, or None after
+    logging why the crew has to decide instead.
+    """
+    try:
+        return validate_assignment(data, active_manager_ids()).model_dump()
+    except ValueError as e:
+        log_action(ticket_id, "AI Assignment Rejected", f"{source} decision is invalid ({e}); running the crew.")
+        return None
+
+def _save_assignment(ticket_id, data):
+    manager_id, rebalanced = balance_assignment(data.get('manager_id'))
+    try:
+        update_ticket_assignment(
+            ticket_id=ticket_id,
+            category=data.get('category'),
+            severity=data.get('severity'),
+            priority=data.get('priority'),
+            assigned_to_id=manager_id,
+            reason=data.get('reason')
+        )
+    except Exception:
+        # The load index already counted this ticket against the manager
+        ticket_released(manager_id)
+        raise
+    if rebalanced:
+        log_action(ticket_id, "Assignment Rebalanced", rebalanced)
+
+def process_ticket(ticket_data, mode=None):
+    """
+    ticket_data: dictionary with ticket_id, title, description
+    mode: pipeline mode override, defaults to TRIAGE_PIPELINE_MODE
+    """
+    ticket_id = ticket_data['ticket_id']
+    title = ticket_data['title']
+    description = ticket_data['description']
+    mode = (mode or PIPELINE_MODE).lower()
+    started = time.perf_counter()
+
+    # Near-identical tickets (e.g. during an outage) reuse a recent assignment instead of running the crew
+    match = find_similar(title, description)
+    data = match and _checked(ticket_id, match[1], "Reused")
+    if data:
+        source_ticket_id, _, score = match
+        _save_assignment(ticket_id, data)
+        log_action(ticket_id, "AI Assignment Reused", f"Reused from {source_ticket_id} (similarity {score:.2f}).")
+        _record_assignment(ticket_id, "dedup", started)
+        return data
+
+    # Obvious tickets are assigned locally; only ambiguous ones go to the agents
+    decision = fast_classify(title, description)
+    assignment = decision and _checked(ticket_id, decision, "Fast-path")
+    if assignment:
+        _save_assignment(ticket_id, assignment)
+        remember(ticket_id, title, description, assignment)
+        log_action(ticket_id, "AI Fast-Path Assigned",
+                   f"Assigned by {decision['source']} (confidence {decision['confidence']:.2f}); crew skipped.")
+        _record_assignment(ticket_id, "fast_path", started)
+        return decision
+
+    agents = get_agents()
+
+    # Task start/finish, agent steps and streamed output become ticket_logs entries as the crew runs
+    progress = ProgressReporter(ticket_id, log_action)
+    crew = build_crew(agents, title, description, mode=mode,
+                      task_callback=progress.task_finished, step_callback=progress.step)
+    progress.attach(crew)
+
     # Execute
     log_action(ticket_id, "AI Analysis Started", "CrewAI agents are analyzing the ticket.")
-    result = crew.kickoff()
-    
-    # Parse JSON result (Cleaning up if LLM adds markdown)
-    raw_result = str(result)
-    json_match = re.search(r'\{.*\}', raw_result, re.DOTALL)
-    if json_match:
+    progress.start()
+    try:
+        result = crew.kickoff()
+    except Exception as e:
+        # Includes the assignment guardrail giving up after its repair attempts
+        log_action(ticket_id, "AI Analysis Error", f"Crew run failed: {e}")
+        TICKETS_PROCESSED.inc(path="crew", outcome="error")
+        raise
+    finally:
+        progress.close()
+    log_action(ticket_id, "AI Stage Timings", _format_timings(mode, progress.timings, progress.elapsed()))
+
+    # The guardrail has already validated (and if needed repaired) the Tech Lead's answer
+    assignment = result.pydantic
+    if not isinstance(assignment, TicketAssignment):
         try:
-            data = json.loads(json_match.group())
-            update_ticket_assignment(
-                ticket_id=ticket_id,
-                category=data.get('category'),
-                severity=data.get('severity'),
-                priority=data.get('priority'),
-                assigned_to_id=data.get('manager_id'),
-                reason=data.get('reason')
-            )
-            log_action(ticket_id, "AI Analysis Completed", "Ticket has been successfully assigned.")
-        except Exception as e:
-            log_action(ticket_id, "AI Analysis Error", f"Error parsing AI result: {str(e)}")
-    else:
-        log_action(ticket_id, "AI Analysis Error", "AI failed to produce a structured assignment.")
-    
+            assignment = parse_assignment(str(result), active_manager_ids())
+        except ValueError as e:
+            log_action(ticket_id, "AI Analysis Error", f"Error parsing AI result: {e}")
+            TICKETS_PROCESSED.inc(path="crew", outcome="error")
+            return result
+
+    data = assignment.model_dump()
+    _save_assignment(ticket_id, data)
+    remember(ticket_id, title, description, data)
+    log_action(ticket_id, "AI Analysis Completed", "Ticket has been successfully assigned.")
+    _record_assignment(ticket_id, "crew", started)
+
     return result
@@ -0,0 +1,136 @@
+import html
+from collections import OrderedDict
+from datetime import datetime
+import pandas as pd
+import streamlit as st
+from database import get_ticket_logs, TICKET_LOG_PAGE_SIZE
+from ticket_events import get_version
+
+# Log ids come from the sequence shared by all tickets, so an insert that commits late can become
+# visible with an id below one already seen. Refreshes re-read from this many of the ticket's own
+# newest entries back (rows already cached are just overwritten).
+CURSOR_OVERLAP_ENTRIES = 10
+MAX_SESSION_TIMELINES = 20
+
+
+class LogTimeline:
+    """
+    One ticket's activity log as seen by a browser session. The newest page is
+    loaded first; later refreshes only fetch entries past the newest id seen
+    and older pages are fetched when the user asks for them. Ids are only the
+    fetch cursor: buffered audit entries are inserted after synchronous ones
+    logged later, so entries are shown in timestamp order.
+    """
+
+    def __init__(self, ticket_id, page_size=TICKET_LOG_PAGE_SIZE):
+        self.ticket_id = ticket_id
+        self.page_size = page_size
+        self.visible = page_size
+        self.has_older = True
+        self.version = None
+        self._entries = {}
+        self._ordered = None
+
+    def _add(self, rows):
+        for row in rows:
+            self._entries[row['id']] = row
+        if rows:
+            self._ordered = None
+
+    def sync(self):
+        """
+        Fetches new entries if this process has seen a change to the ticket since the last sync.
+        """
+        version = get_version(self.ticket_id)
+        if version != self.version:
+            self.refresh()
+            self.version = version
+
+    def refresh(self):
+        if not self._entries:
+            page = get_ticket_logs(self.ticket_id, limit=self.page_size)
+            self._add(page)
+            self.has_older = len(page) == self.page_size
+            return
+        ids = sorted(self._entries)
+        after_id = ids[-min(CURSOR_OVERLAP_ENTRIES, len(ids))] - 1
+        while True:
+            page = get_ticket_logs(self.ticket_id, after_id=after_id, limit=self.page_size)
+            self._add(page)
+            if len(page) < self.page_size:
+                return
+            after_id = page[-1]['id']
+
+    def show_older(self):
+        """
+        Reveals the next page of older entries, fetching it if it is not cached yet.
+        """
+        self.visible += self.page_size
+        if self.has_older and len(self._entries) < self.visible:
+            page = get_ticket_logs(self.ticket_id, before_id=min(self._entries), limit=self.page_size)
+            self._add(page)
+            self.has_older = len(page) == self.page_size
+
+    def newest_first(self):
+        if self._ordered is None:
+            self._ordered = sorted(self._entries.values(), key=_event_order, reverse=True)
+        return self._ordered[:self.visible]
+
+    def can_show_older(self):
+        return self.has_older or len(self._entries) > self.visible
+
+
+def _event_order(entry):
+    try:
+        timestamp = datetime.fromisoformat(str(entry['timestamp']))
+    except ValueError:
+        timestamp = None
+    return (timestamp is not None, timestamp or datetime.min, entry['id'])
+
+
+def get_timeline(ticket_id):
+    """
+    Returns the session's timeline for a ticket, keeping the most recently viewed ones.
+    """
+    timelines = st.session_state.setdefault("log_timelines", OrderedDict())
+    timeline = timelines.get(ticket_id)
+    if timeline is None:
+        timeline = timelines[ticket_id] = LogTimeline(ticket_id)
+        while len(timelines) > MAX_SESSION_TIMELINES:
+            timelines.popitem(last=False)
+    timelines.move_to_end(ticket_id)
+    timeline.sync()
+    return timeline
+
+
+def _format_timestamp(value):
+    return str(value).replace("T", " ").split(".")[0].split("+")[0]
+
+
+def render_timeline(timeline, table=False):
+    """
+    Renders the visible entries as one element (an HTML list, or a scrollable
+    table when `table` is set) rather than one container per entry.
+    """
+    entries = timeline.newest_first()
+    if not entries:
+        st.caption("No activity yet.")
+    elif table:
+        st.dataframe(
+            pd.DataFrame([{"Time": _format_timestamp(e['timestamp']), "Action": e['action'], "Details": e['details']}
+                          for e in entries]),
+            width='stretch', hide_index=True,
+        )
+    else:
+        # Single-line blocks: a blank line inside the HTML would end it and turn the rest into Markdown
+        st.markdown("".join(
+            '<div style="border: 1px solid #333; border-radius: 8px; padding: 10px 14px; margin-bottom: 8px;">'
+            f'<strong>{html.escape(str(e["action"]))}</strong><br>'
+            f'<span style="color: #888; font-size: 0.85em;">{_format_timestamp(e["timestamp"])}</span>'
+            f'<div>{html.escape(str(e["details"] or "")).replace(chr(10), "<br>")}</div></div>'
+            for e in entries
+        ), unsafe_allow_html=True)
+
+    if timeline.can_show_older():
+        # on_click runs before the rerun, so the older entries render straight away
+        st.button("Show older activity", key=f"older_logs_{timeline.ticket_id}", on_click=timeline.show_older)
@@ -0,0 +1,65 @@
+import os
+import re
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Lanes in scheduling order. Each lane gets its own worker limit (see job_queue.py).
+LANES = ("high", "normal", "low")
+PRIORITY_HIGH_SCORE = float(os.getenv("PRIORITY_HIGH_SCORE", "3"))
+PRIORITY_LOW_SCORE = float(os.getenv("PRIORITY_LOW_SCORE", "-1"))
+DEFAULT_TIER = "standard"
+
+# Phrase -> points. Positive phrases suggest broad impact or money/security at stake,
+# negative ones how-to questions and cosmetic requests.
+PRIORITY_KEYWORDS = {
+    "everyone": 3, "all users": 3, "all customers": 3, "outage": 3, "is down": 3, "site down": 3,
+    "data loss": 3, "breach": 3, "hacked": 3, "security": 2, "fraud": 2,
+    "payment failed": 2, "payments failing": 3, "charged twice": 2, "charged": 1, "refund": 1,
+    "cannot log in": 2, "can't log in": 2, "locked out": 2, "server error": 2, "timeout": 1,
+    "urgent": 1, "asap": 1, "production": 1, "not working": 1, "crash": 1,
+    "how do i": -2, "how to": -1, "question": -1, "feature request": -2, "suggestion": -2,
+    "avatar": -2, "profile picture": -2, "dark mode": -2, "typo": -2, "just wondering": -2,
+}
+
+# users.tier -> points (migrations/0005_user_tier.sql)
+TIER_WEIGHTS = {"enterprise": 3, "premium": 2, "pro": 1, DEFAULT_TIER: 0, "free": -1}
+
+_KEYWORD_PATTERNS = [(re.compile(r"\b" + re.escape(k) + r"\b"), w) for k, w in PRIORITY_KEYWORDS.items()]
+
+
+def score_ticket(title, description, tier=None):
+    """
+    Cheap pre-score used to order the triage queue before any LLM has seen the ticket.
+    """
+    text = f"{title} {description}".lower()
+    score = sum(weight for pattern, weight in _KEYWORD_PATTERNS if pattern.search(text))
+    return score + TIER_WEIGHTS.get((tier or DEFAULT_TIER).lower(), 0)
+
+
+def lane_for(score):
+    if score >= PRIORITY_HIGH_SCORE:
+        return "high"
+    if score <= PRIORITY_LOW_SCORE:
+        return "low"
+    return "normal"
+
+
+def prioritize(tickets):
+    """
+    Returns (lane, score) for each ticket dict, looking up customer tiers in one query.
+    A failed lookup only loses the tier bonus; it never blocks queueing.
+    """
+    user_ids = {t["user_id"] for t in tickets if t.get("user_id")}
+    tiers = {}
+    if user_ids:
+        try:
+            from database import get_user_tiers
+            tiers = get_user_tiers(user_ids)
+        except Exception as e:
+            print(f"⚠️ Could not load customer tiers for prioritization: {e}")
+    results = []
+    for t in tickets:
+        score = score_ticket(t.get("title", ""), t.get("description", ""), tiers.get(t.get("user_id")))
+        results.append((lane_for(score), score))
+    return results